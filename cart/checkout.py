@@ -0,0 +1,119 @@
+# cart/checkout.py
+# Checkout del lado del servidor: carrito activo -> Venta + DetalleVenta,
+# descuento de stock y cierre del carrito, todo en una transacción.
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+
+from products.pricing import tabla_precios
+from sucursales import stock_service
+from sucursales.models import Sucursal
+from tenants.quotas import verificar_cupo
+from ventas.models import DetalleVenta, Venta
+from ventas.serializers import PagoSerializer
+from .models import Cart
+
+
+def _venta_existente(empresa, usuario, clave):
+    # La clave es por usuario: la de otro cliente nunca devuelve su venta
+    if not clave:
+        return None
+    return Venta.objects.filter(empresa=empresa, usuario=usuario, clave_idempotencia=clave).first()
+
+
+def checkout(usuario, sucursal_id, clave_idempotencia=None, canal="WEB", pago_data=None):
+    """
+    Convierte el carrito activo del usuario en una venta.
+
+    Devuelve (venta, creada). Con la misma `clave_idempotencia` un reintento
+    devuelve la venta ya registrada sin volver a cobrar ni descontar stock.
+    """
+    empresa = usuario.empresa
+    clave = (clave_idempotencia or "").strip()[:64] or None
+
+    existente = _venta_existente(empresa, usuario, clave)
+    if existente:
+        return existente, False
+
+    verificar_cupo(empresa.id if empresa else None, "ventas")
+
+    sucursal = Sucursal.objects.filter(id=sucursal_id, empresa=empresa).first()
+    if sucursal is None:
+        raise ValidationError("Sucursal no encontrada o no pertenece a la empresa.")
+
+    try:
+        with transaction.atomic():
+            # Bloquea el carrito: dos checkouts del mismo carrito no corren a la vez
+            cart = (
+                Cart.objects.select_for_update()
+                .filter(usuario=usuario, estado="activo")
+                .order_by("id")
+                .first()
+            )
+            if cart is None:
+                raise NotFound("No hay un carrito activo.")
+
+            items = list(cart.items.select_related("producto"))
+            if not items:
+                raise ValidationError("El carrito está vacío.")
+
+            # El precio lo define el servidor (motor de precios de la sucursal), no el cliente
+            precios = tabla_precios(cart.empresa_id, sucursal.id, producto_ids=[item.producto_id for item in items])
+            lineas = []
+            for item in items:
+                producto = item.producto
+                precio = precios.get(producto.id)
+                if producto.empresa_id != cart.empresa_id or precio is None:
+                    raise ValidationError(f"El producto {producto.nombre} ya no está disponible.")
+                lineas.append((producto, item.cantidad, precio[1], item.cantidad * precio[1]))
+            total = sum(subtotal for *_, subtotal in lineas)
+
+            pago = None
+            if pago_data:
+                pago_serializer = PagoSerializer(data={**pago_data, "monto": total})
+                pago_serializer.is_valid(raise_exception=True)
+                pago = pago_serializer.save(empresa=empresa)
+
+            venta = Venta.objects.create(
+                empresa=empresa,
+                usuario=usuario,
+                sucursal=sucursal,
+                canal=canal,
+                pago=pago,
+                fecha=timezone.now(),
+                total=total,
+                estado="pendiente",
+                clave_idempotencia=clave,
+            )
+            DetalleVenta.objects.bulk_create([
+                DetalleVenta(
+                    empresa=empresa,
+                    venta=venta,
+                    producto=producto,
+                    cantidad=cantidad,
+                    precio_unitario=precio,
+                    subtotal=subtotal,
+                )
+                for producto, cantidad, precio, subtotal in lineas
+            ])
+
+            # Un UPDATE condicional para todas las líneas (consume las reservas del carrito)
+            stock_service.descontar_stock(
+                empresa.id if empresa else None,
+                sucursal.id,
+                [(producto.id, cantidad) for producto, cantidad, *_ in lineas],
+                cart=cart,
+            )
+
+            # El carrito queda cerrado; el próximo pedido usa uno nuevo
+            cart.estado = "confirmado"
+            cart.save(update_fields=["estado"])
+    except IntegrityError:
+        # Otro request con la misma clave ganó la carrera
+        existente = _venta_existente(empresa, usuario, clave)
+        if existente:
+            return existente, False
+        raise
+
+    return venta, True
@@ -1,7 +1,37 @@
 # cart/models.py
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
 
+# Segundos que vive el resumen cacheado (se invalida en cada cambio de CartItem)
+RESUMEN_TIMEOUT = 60 * 60
+
+
+def _agregado_items(prefijo=""):
+    """Sum(cantidad * precio) y Sum(cantidad) en SQL (con prefijo para joins)."""
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    subtotal = ExpressionWrapper(F(f"{prefijo}cantidad") * F(f"{prefijo}precio_unitario"), output_field=decimal)
+    return {
+        "total_calc": Coalesce(Sum(subtotal), Value(Decimal("0")), output_field=decimal),
+        "cantidad_calc": Coalesce(Sum(f"{prefijo}cantidad"), Value(0)),
+    }
+
+
+def clave_resumen_usuario(usuario_id):
+    return f"cart:resumen:usuario:{usuario_id}"
+
+
+class CartQuerySet(models.QuerySet):
+
+    def con_resumen(self):
+        """Anota total y cantidad de items con un solo agregado SQL."""
+        return self.annotate(**_agregado_items("items__"))
+
+
 class Cart(models.Model):
     empresa = models.ForeignKey('tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True)
     usuario = models.ForeignKey('users.User', on_delete=models.CASCADE)
@@ -13,6 +43,8 @@ class Cart(models.Model):
         ('inactivo', 'Inactivo'),
     ], default='activo')
 
+    objects = CartQuerySet.as_manager()
+
     class Meta:
         db_table = 'cart'
     
@@ -32,21 +64,57 @@ class Cart(models.Model):
         cart = cls.objects.create(usuario=usuario, empresa=empresa)
         return cart, True
     
+    def resumen(self):
+        """{'total', 'cantidad_items'} calculados en SQL (una consulta)."""
+        datos = self.items.aggregate(**_agregado_items())
+        return {"total": datos["total_calc"], "cantidad_items": datos["cantidad_calc"]}
+
+    @classmethod
+    def resumen_activo(cls, usuario):
+        """
+        Resumen del carrito activo del usuario (para el badge del carrito).
+        Cacheado por usuario; lo invalidan las señales de CartItem / Cart.
+        """
+        clave = clave_resumen_usuario(usuario.id)
+        datos = cache.get(clave)
+        if datos is None:
+            fila = (
+                cls.objects.filter(usuario=usuario, estado='activo')
+                .order_by('id')
+                .con_resumen()
+                .values('id', 'total_calc', 'cantidad_calc')
+                .first()
+            )
+            datos = {
+                "cart": fila["id"] if fila else None,
+                "total": fila["total_calc"] if fila else Decimal("0"),
+                "cantidad_items": fila["cantidad_calc"] if fila else 0,
+            }
+            cache.set(clave, datos, timeout=RESUMEN_TIMEOUT)
+        return datos
+
+    def _items_precargados(self):
+        return getattr(self, "_prefetched_objects_cache", {}).get("items")
+
     @property
     def total(self):
-        """Calcula el total del carrito automáticamente"""
-        try:
-            return sum(item.subtotal for item in self.item.all())
-        except:
-            return 0
-    
+        """Calcula el total del carrito (anotación > items precargados > SQL)"""
+        if hasattr(self, "total_calc"):
+            return self.total_calc
+        items = self._items_precargados()
+        if items is not None:
+            return sum((item.subtotal for item in items), Decimal("0"))
+        return self.resumen()["total"]
+
     @property
     def cantidad_items(self):
         """Cantidad total de productos en el carrito"""
-        try:
-            return sum(item.cantidad for item in self.item.all())
-        except:
-            return 0
+        if hasattr(self, "cantidad_calc"):
+            return self.cantidad_calc
+        items = self._items_precargados()
+        if items is not None:
+            return sum(item.cantidad for item in items)
+        return self.resumen()["cantidad_items"]
 
 
 class CartItem(models.Model):
@@ -0,0 +1,27 @@
+# cart/signals.py
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Cart, CartItem, clave_resumen_usuario
+
+
+def _invalidar_resumen(usuario_id):
+    transaction.on_commit(lambda: cache.delete(clave_resumen_usuario(usuario_id)))
+
+
+# ---
+# El resumen cacheado del carrito (badge) se recalcula en la próxima lectura
+# cuando cambian sus items o el estado del carrito.
+# ---
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidar_por_item(sender, instance, **kwargs):
+    _invalidar_resumen(instance.cart.usuario_id)
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def invalidar_por_cart(sender, instance, **kwargs):
+    _invalidar_resumen(instance.usuario_id)
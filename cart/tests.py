@@ -1,3 +1,169 @@
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from cart.models import Cart, CartItem
+from cart.serializers import CartSerializer
+from cart.views import CartViewSet
+from products.models import Producto
+from tenants.models import Empresa
+from users.models import User
+
+
+class CartResumenTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Cart", nit="CART-001")
+        cls.usuario = User.objects.create_user(email="cart@test.com", password="x", empresa=cls.empresa)
+        cls.tv = Producto.objects.create(empresa=cls.empresa, nombre="Tv", precio_venta=100)
+        cls.radio = Producto.objects.create(empresa=cls.empresa, nombre="Radio", precio_venta=Decimal("12.50"))
+
+    def setUp(self):
+        cache.clear()
+        self.cart = Cart.objects.create(empresa=self.empresa, usuario=self.usuario)
+        CartItem.objects.create(cart=self.cart, producto=self.tv, cantidad=2, precio_unitario=100)
+        CartItem.objects.create(cart=self.cart, producto=self.radio, cantidad=3, precio_unitario=Decimal("12.50"))
+
+    def test_totales_en_sql(self):
+        self.assertEqual(self.cart.total, Decimal("237.50"))
+        self.assertEqual(self.cart.cantidad_items, 5)
+
+    def test_serializer_con_queryset_del_viewset(self):
+        cart = CartViewSet.queryset.get(pk=self.cart.pk)
+        with self.assertNumQueries(0):
+            data = CartSerializer(cart).data
+        self.assertEqual(Decimal(data["total"]), Decimal("237.50"))
+        self.assertEqual(data["cantidad_items"], 5)
+        self.assertEqual(len(data["items"]), 2)
+
+    def test_resumen_cacheado_e_invalidado(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(Cart.resumen_activo(self.usuario)["cantidad_items"], 5)
+        with self.assertNumQueries(0):
+            Cart.resumen_activo(self.usuario)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CartItem.objects.filter(producto=self.radio).delete()
+        resumen = Cart.resumen_activo(self.usuario)
+        self.assertEqual(resumen["cantidad_items"], 2)
+        self.assertEqual(resumen["total"], Decimal("200"))
+
+
+class CheckoutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from sucursales.models import StockSucursal, Sucursal
+
+        cls.empresa = Empresa.objects.create(nombre="Empresa Checkout", nit="CHK-001")
+        cls.usuario = User.objects.create_user(email="chk@test.com", password="x", empresa=cls.empresa)
+        cls.sucursal = Sucursal.objects.create(empresa=cls.empresa, nombre="Central")
+        cls.tv = Producto.objects.create(empresa=cls.empresa, nombre="Tv", precio_venta=100)
+        cls.stock = StockSucursal.objects.create(
+            empresa=cls.empresa, sucursal=cls.sucursal, producto=cls.tv, stock=3
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.cart = Cart.objects.create(empresa=self.empresa, usuario=self.usuario)
+        # El precio enviado por el cliente se ignora en el checkout
+        CartItem.objects.create(cart=self.cart, producto=self.tv, cantidad=2, precio_unitario=1)
+
+    def test_checkout_idempotente(self):
+        from cart.checkout import checkout
+        from ventas.models import Venta
+
+        venta, creada = checkout(self.usuario, self.sucursal.id, clave_idempotencia="abc-1")
+        self.assertTrue(creada)
+        self.assertEqual(venta.total, Decimal("200"))
+        self.assertEqual(venta.detalles.get().precio_unitario, Decimal("100"))
+
+        repetida, creada = checkout(self.usuario, self.sucursal.id, clave_idempotencia="abc-1")
+        self.assertFalse(creada)
+        self.assertEqual(repetida.pk, venta.pk)
+
+        self.cart.refresh_from_db()
+        self.stock.refresh_from_db()
+        self.assertEqual(self.cart.estado, "confirmado")
+        self.assertEqual(self.stock.stock, 1)
+        self.assertEqual(Venta.objects.count(), 1)
+
+    def test_misma_clave_de_otro_usuario(self):
+        from cart.checkout import checkout
+
+        primera, _ = checkout(self.usuario, self.sucursal.id, clave_idempotencia="clave-comun")
+
+        otro = User.objects.create_user(email="chk2@test.com", password="x", empresa=self.empresa)
+        cart = Cart.objects.create(empresa=self.empresa, usuario=otro)
+        CartItem.objects.create(cart=cart, producto=self.tv, cantidad=1, precio_unitario=100)
+
+        venta, creada = checkout(otro, self.sucursal.id, clave_idempotencia="clave-comun")
+        self.assertTrue(creada)
+        self.assertNotEqual(venta.pk, primera.pk)
+        self.assertEqual(venta.usuario, otro)
+        cart.refresh_from_db()
+        self.assertEqual(cart.estado, "confirmado")
+
+    def test_sin_stock_no_crea_nada(self):
+        from cart.checkout import checkout
+        from utils.exceptions import StockInsuficienteException
+        from ventas.models import Venta
+
+        self.cart.items.update(cantidad=5)
+        with self.assertRaises(StockInsuficienteException):
+            checkout(self.usuario, self.sucursal.id, clave_idempotencia="abc-2")
+
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.estado, "activo")
+        self.assertFalse(Venta.objects.exists())
+
+
+class AgregarItemTests(TestCase):
+    """Agregar al carrito valida todo antes de reservar stock."""
+
+    @classmethod
+    def setUpTestData(cls):
+        from sucursales.models import StockSucursal, Sucursal
+        from users.models import Role
+
+        cls.empresa = Empresa.objects.create(nombre="Empresa Items", nit="ITEMS-001")
+        rol = Role.objects.create(empresa=cls.empresa, name="ADMIN")
+        cls.usuario = User.objects.create_user(email="items@test.com", password="x", empresa=cls.empresa, role=rol)
+        cls.sucursal = Sucursal.objects.create(empresa=cls.empresa, nombre="Central")
+        cls.tv = Producto.objects.create(empresa=cls.empresa, nombre="Tv", precio_venta=100)
+        cls.inactivo = Producto.objects.create(empresa=cls.empresa, nombre="Viejo", precio_venta=5, esta_activo=False)
+        for producto in (cls.tv, cls.inactivo):
+            StockSucursal.objects.create(empresa=cls.empresa, sucursal=cls.sucursal, producto=producto, stock=5)
+
+    def setUp(self):
+        cache.clear()
+        self.cart = Cart.objects.create(empresa=self.empresa, usuario=self.usuario)
+
+    def _agregar(self, **datos):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from cart.views import CartItemViewSet
+
+        datos = {"cart": self.cart.id, "sucursal": self.sucursal.id, **datos}
+        request = APIRequestFactory().post("/api/cart-items/", datos, format="json")
+        force_authenticate(request, user=self.usuario)
+        return CartItemViewSet.as_view({"post": "create"})(request)
+
+    def test_agrega_y_reserva(self):
+        from sucursales.models import ReservaStock
+
+        self.assertEqual(self._agregar(producto=self.tv.id, cantidad=2).status_code, 201)
+        self.assertEqual(self._agregar(producto=str(self.tv.id), cantidad="1").status_code, 200)
+        self.assertEqual(ReservaStock.objects.get(cart=self.cart).cantidad, 3)
+
+    def test_rechazos_no_dejan_reservas(self):
+        from sucursales.models import ReservaStock
+
+        self.assertEqual(self._agregar(producto=self.inactivo.id, cantidad=1).status_code, 400)
+        self.assertEqual(self._agregar(producto="tv", cantidad=1).status_code, 400)
+        self.assertEqual(self._agregar(producto=self.tv.id, cantidad="dos").status_code, 400)
+        self.assertEqual(self._agregar(producto=self.tv.id, cantidad=0).status_code, 400)
+        self.assertEqual(self._agregar(producto=self.tv.id, cantidad=-2).status_code, 400)
+        self.assertFalse(ReservaStock.objects.exists())
+        self.assertFalse(self.cart.items.exists())
@@ -3,16 +3,37 @@ from django.shortcuts import render
 from rest_framework import status
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Prefetch
 from utils.viewsets import SoftDeleteViewSet
+from utils.logging_utils import log_action
+from ventas.serializers import VentaSerializer
+from .checkout import checkout as checkout_cart
 from .models import Cart, CartItem
 from .serializers import CartSerializer, CartItemSerializer
 from rest_framework.decorators import action
+from sucursales import stock_service
+from products.pricing import tabla_precios
 
 class CartViewSet(SoftDeleteViewSet):
-    queryset = Cart.objects.all().order_by("-created_at")
+    # Totales con un agregado SQL e items precargados una sola vez
+    queryset = (
+        Cart.objects.con_resumen()
+        .select_related("usuario", "empresa")
+        .prefetch_related(Prefetch("items", queryset=CartItem.objects.select_related("producto")))
+        .order_by("-created_at")
+    )
     serializer_class = CartSerializer
     module_name = "Cart"
 
+    @action(detail=False, methods=["get"], url_path="resumen")
+    def resumen(self, request):
+        """
+        Total y cantidad del carrito activo (badge). Se sirve desde cache;
+        en un miss cuesta una sola consulta agregada.
+        """
+        return Response(Cart.resumen_activo(request.user))
+
     def create(self, request, *args, **kwargs):
         """
         En lugar de crear duplicados, retorna el carrito activo del usuario
@@ -24,6 +45,36 @@ class CartViewSet(SoftDeleteViewSet):
         serializer = self.get_serializer(cart)
         return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
     
+    @action(detail=False, methods=["post"], url_path="checkout")
+    def checkout(self, request):
+        """
+        Convierte el carrito activo en una venta (detalles, stock y cierre del
+        carrito en una sola transacción). Enviar el header `Idempotency-Key`
+        (o `clave_idempotencia`) para que los reintentos no dupliquen la venta.
+        Body: {"sucursal": id, "canal": "WEB", "pago": {"metodo": id, "referencia": ...}}
+        """
+        clave = request.headers.get("Idempotency-Key") or request.data.get("clave_idempotencia")
+        venta, creada = checkout_cart(
+            request.user,
+            request.data.get("sucursal"),
+            clave_idempotencia=clave,
+            canal=request.data.get("canal", "WEB"),
+            pago_data=request.data.get("pago"),
+        )
+
+        if creada:
+            log_action(
+                user=request.user,
+                modulo="Venta",
+                accion="CREAR",
+                descripcion=f"Checkout del carrito: venta #{venta.numero_nota} por un total de {venta.total}",
+                request=request,
+            )
+        return Response(
+            VentaSerializer(venta).data,
+            status=status.HTTP_201_CREATED if creada else status.HTTP_200_OK,
+        )
+
     @action(detail=False, methods=['post'], url_path='clear-active')
     def clear_active_cart(self, request, *args, **kwargs):
         """
@@ -63,7 +114,7 @@ class CartViewSet(SoftDeleteViewSet):
 
 
 class CartItemViewSet(SoftDeleteViewSet):
-    queryset = CartItem.objects.all()
+    queryset = CartItem.objects.select_related("producto")
     serializer_class = CartItemSerializer
     module_name = "CartItem"
 
@@ -83,25 +134,50 @@ class CartItemViewSet(SoftDeleteViewSet):
         if cart.usuario != user:
             return Response({"detail": "El carrito no pertenece al usuario."}, status=status.HTTP_403_FORBIDDEN)
 
-        producto_id = request.data.get("producto")
-        if not producto_id:
+        if not request.data.get("producto"):
             return Response({"detail": "producto es requerido"}, status=status.HTTP_400_BAD_REQUEST)
 
-        cantidad = int(request.data.get("cantidad", 1))
-
-        existing = CartItem.objects.filter(cart=cart, producto_id=producto_id).first()
-        if existing:
-            existing.cantidad = existing.cantidad + cantidad
-            precio_unitario = request.data.get("precio_unitario", None)
-            if precio_unitario is not None:
-                existing.precio_unitario = precio_unitario
-            existing.save()
-            serializer = self.get_serializer(existing)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-
-        data = request.data.copy()
-        data["cart"] = cart.id
-        serializer = self.get_serializer(data=data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        sucursal_id = request.data.get("sucursal")
+        try:
+            producto_id = int(request.data.get("producto"))
+            cantidad = int(request.data.get("cantidad", 1))
+            sucursal_id = int(sucursal_id) if sucursal_id else None
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "producto, cantidad y sucursal deben ser números enteros."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if cantidad < 1:
+            return Response({"detail": "La cantidad debe ser al menos 1."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # El precio lo fija el motor de precios (descuento vigente de la sucursal).
+        # Se valida todo ANTES de reservar: un 400 no debe dejar stock apartado.
+        precio = tabla_precios(cart.empresa_id, sucursal_id, producto_ids=[producto_id]).get(producto_id)
+        if precio is None:
+            return Response({"detail": "Producto no disponible."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            existing = CartItem.objects.select_for_update().filter(cart=cart, producto_id=producto_id).first()
+            if not existing:
+                data = request.data.copy()
+                data["cart"] = cart.id
+                data["producto"] = producto_id
+                data["cantidad"] = cantidad
+                data["precio_unitario"] = str(precio[1])
+                serializer = self.get_serializer(data=data)
+                serializer.is_valid(raise_exception=True)
+
+            # Si se indica la sucursal, se reserva el stock (lanza 400 si no alcanza)
+            if sucursal_id:
+                total = cantidad + (existing.cantidad if existing else 0)
+                stock_service.reservar(cart, sucursal_id, producto_id, total)
+
+            if existing:
+                existing.cantidad = existing.cantidad + cantidad
+                existing.precio_unitario = precio[1]
+                existing.save()
+                serializer = self.get_serializer(existing)
+                return Response(serializer.data, status=status.HTTP_200_OK)
+
+            self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
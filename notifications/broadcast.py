@@ -0,0 +1,106 @@
+# notifications/broadcast.py
+# Notificaciones masivas: un request crea la notificación para todos los
+# destinatarios (empresa completa, un rol o un segmento de clientes).
+#
+#  - Los destinatarios se recorren con .iterator() en lotes (id + player_id).
+#  - Cada lote es UN bulk_create de Notificacion.
+#  - Los player_ids se entregan al despachador de push por lotes cuando la
+#    transacción se confirma (notifications/push_dispatcher.py).
+#  - bulk_create no dispara post_save: cada lote se emite por websocket
+#    explícitamente (notifications/realtime.py).
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from users.models import User
+from .models import Notificacion
+from .push_dispatcher import encolar_push
+from .realtime import emitir_nuevas
+
+DESTINOS = ("empresa", "rol", "segmento")
+
+
+def _tamanio_lote():
+    return getattr(settings, "NOTIFICACION_LOTE", 1000)
+
+
+# ===========================================
+# 🔵 Destinatarios
+# ===========================================
+def destinatarios(empresa, destino="empresa", rol=None, segmento=None):
+    """
+    QuerySet de usuarios activos de la empresa según el destino:
+      - "empresa": todos
+      - "rol": los del rol (id o nombre, p. ej. "CUSTOMER", "SALES_AGENT")
+      - "segmento": clientes filtrados por sus compras
+        (segmento = {"rol", "compras_desde", "compras_minimas", "monto_minimo"})
+    """
+    qs = User.objects.filter(empresa=empresa, is_active=True, esta_activo=True)
+
+    if destino == "rol":
+        if str(rol).isdigit():
+            qs = qs.filter(role_id=int(rol))
+        else:
+            qs = qs.filter(role__name__iexact=rol)
+
+    elif destino == "segmento":
+        segmento = segmento or {}
+        qs = qs.filter(role__name__iexact=segmento.get("rol") or "CUSTOMER")
+
+        filtro_ventas = Q(ventas__empresa=empresa)
+        if segmento.get("compras_desde"):
+            filtro_ventas &= Q(ventas__fecha__date__gte=segmento["compras_desde"])
+
+        if segmento.get("compras_minimas") or segmento.get("monto_minimo"):
+            qs = qs.annotate(
+                n_compras=Count("ventas", filter=filtro_ventas),
+                monto_compras=Sum("ventas__total", filter=filtro_ventas),
+            )
+            if segmento.get("compras_minimas"):
+                qs = qs.filter(n_compras__gte=segmento["compras_minimas"])
+            if segmento.get("monto_minimo"):
+                qs = qs.filter(monto_compras__gte=segmento["monto_minimo"])
+        elif segmento.get("compras_desde"):
+            qs = qs.filter(filtro_ventas).distinct()
+
+    return qs
+
+
+# ===========================================
+# 🔵 Envío masivo
+# ===========================================
+def _guardar_lote(lote):
+    creadas = Notificacion.objects.bulk_create(lote)
+    transaction.on_commit(lambda: emitir_nuevas(creadas))
+    return len(creadas)
+
+
+def difundir(empresa, titulo, mensaje, usuarios, data=None, tamanio_lote=None):
+    """
+    Crea una Notificacion por usuario en lotes y encola los push.
+    Devuelve {"notificaciones": n, "push": m}.
+    """
+    tamanio = tamanio_lote or _tamanio_lote()
+    filas = usuarios.order_by("id").values_list("id", "onesignal_player_id")
+
+    creadas = 0
+    player_ids = []
+    lote = []
+
+    with transaction.atomic():
+        for usuario_id, player_id in filas.iterator(chunk_size=tamanio):
+            lote.append(Notificacion(empresa=empresa, usuario_id=usuario_id, titulo=titulo, mensaje=mensaje))
+            if player_id:
+                player_ids.append(player_id)
+            if len(lote) >= tamanio:
+                creadas += _guardar_lote(lote)
+                lote = []
+        if lote:
+            creadas += _guardar_lote(lote)
+
+        # El despachador corta en lotes de PUSH_LOTE por request a OneSignal
+        if player_ids:
+            transaction.on_commit(lambda: encolar_push(player_ids, titulo, mensaje, data))
+
+    return {"notificaciones": creadas, "push": len(player_ids)}
@@ -0,0 +1,62 @@
+# notifications/consumers.py
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .models import Notificacion
+from .realtime import contar_no_leidas, emitir_contador, grupo_usuario
+
+
+class NotificacionConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/notificaciones/?token=<access JWT>
+
+    Servidor -> cliente:
+      {"tipo": "notificacion", "notificacion": {...}, "no_leidas": n}
+      {"tipo": "contador", "no_leidas": n}
+    Cliente -> servidor:
+      {"accion": "marcar_leida", "id": <id>}
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.usuario_id = user.id
+        self.grupo = grupo_usuario(user.id)
+        await self.channel_layer.group_add(self.grupo, self.channel_name)
+        await self.accept()
+
+        # Estado inicial: el cliente ya no necesita consultar el contador por HTTP
+        conteos = await database_sync_to_async(contar_no_leidas)([self.usuario_id])
+        await self.send_json({"tipo": "contador", "no_leidas": conteos[self.usuario_id]})
+
+    async def disconnect(self, code):
+        if hasattr(self, "grupo"):
+            await self.channel_layer.group_discard(self.grupo, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get("accion") == "marcar_leida" and content.get("id"):
+            await self._marcar_leida(content["id"])
+
+    @database_sync_to_async
+    def _marcar_leida(self, notificacion_id):
+        actualizadas = Notificacion.objects.filter(
+            id=notificacion_id, usuario_id=self.usuario_id, leida=False
+        ).update(leida=True)
+        if actualizadas:
+            emitir_contador([self.usuario_id])
+
+    # ------------------------------------------------------------------
+    # 🔹 Eventos del channel layer (ver notifications/realtime.py)
+    # ------------------------------------------------------------------
+    async def notificacion_nueva(self, event):
+        await self.send_json({
+            "tipo": "notificacion",
+            "notificacion": event["notificacion"],
+            "no_leidas": event["no_leidas"],
+        })
+
+    async def notificacion_contador(self, event):
+        await self.send_json({"tipo": "contador", "no_leidas": event["no_leidas"]})
@@ -0,0 +1,73 @@
+# notifications/fake_onesignal.py
+# Servidor HTTP local que imita POST /api/v1/notifications de OneSignal.
+# Se usa en los tests y con `python manage.py fake_onesignal` para desarrollo
+# (ONESIGNAL_API_URL=http://127.0.0.1:8765/api/v1/notifications).
+
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(largo) or b"{}")
+        except ValueError:
+            payload = {}
+        self.server.recibidos.append(payload)
+        if self.server.al_recibir:
+            self.server.al_recibir(payload)
+
+        cuerpo = json.dumps({
+            "id": str(uuid.uuid4()),
+            "recipients": len(payload.get("include_player_ids", [])),
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class OneSignalFalso:
+    """
+    with OneSignalFalso() as fake:
+        ... settings.ONESIGNAL_API_URL = fake.url ...
+        fake.recibidos  # payloads recibidos
+    """
+
+    def __init__(self, host="127.0.0.1", puerto=0, al_recibir=None):
+        self.servidor = ThreadingHTTPServer((host, puerto), _Handler)
+        self.servidor.recibidos = []
+        self.servidor.al_recibir = al_recibir
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self.servidor.server_address[:2]
+        return f"http://{host}:{puerto}/api/v1/notifications"
+
+    @property
+    def recibidos(self):
+        return self.servidor.recibidos
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
@@ -11,6 +11,14 @@ class Notificacion(models.Model):
     usuario = models.ForeignKey('users.User',on_delete=models.CASCADE, related_name ='notificaciones')
     class Meta:
         db_table = 'notificacion'
+        indexes = [
+            # Índice parcial: solo las no leídas (contador del badge y marcar como leídas)
+            models.Index(
+                fields=['usuario', 'fecha_creada'],
+                name='notif_no_leidas_idx',
+                condition=models.Q(leida=False),
+            ),
+        ]
     
     def __str__(self):
         return f"Notificacion #{self.id} - {self.titulo}"
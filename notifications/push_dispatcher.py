@@ -0,0 +1,181 @@
+# notifications/push_dispatcher.py
+# Despacho de notificaciones push (OneSignal) fuera del request.
+#
+#  - encolar_push() solo agrega a una cola en memoria y retorna.
+#  - Un hilo de fondo junta lo encolado durante PUSH_VENTANA_SEGUNDOS, agrupa los
+#    destinatarios con el mismo contenido y envía lotes de hasta PUSH_LOTE player_ids
+#    por request (include_player_ids).
+#  - Las llamadas usan una requests.Session compartida (pool de conexiones) con
+#    timeouts y reintentos con backoff exponencial.
+#  - PUSH_MODO = "sync" envía en el mismo hilo (tests / scripts).
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+ONESIGNAL_URL_DEFAULT = "https://onesignal.com/api/v1/notifications"
+
+_cola = queue.Queue()
+_lock = threading.Lock()
+_hilo = None
+_sesion = None
+
+
+def _config(nombre, default):
+    return getattr(settings, nombre, default)
+
+
+# ===========================================
+# 🔵 Sesión HTTP compartida
+# ===========================================
+def obtener_sesion():
+    global _sesion
+    if _sesion is None:
+        with _lock:
+            if _sesion is None:
+                reintentos = Retry(
+                    total=_config("PUSH_REINTENTOS", 3),
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset({"POST"}),
+                    respect_retry_after_header=True,
+                )
+                sesion = requests.Session()
+                sesion.mount("https://", HTTPAdapter(max_retries=reintentos, pool_maxsize=10))
+                sesion.mount("http://", HTTPAdapter(max_retries=reintentos, pool_maxsize=10))
+                _sesion = sesion
+    return _sesion
+
+
+def enviar_lote(player_ids, titulo, mensaje, data=None):
+    """Una llamada a OneSignal para varios dispositivos. Devuelve el dict de resultado."""
+    api_key = settings.ONESIGNAL_REST_API_KEY
+    if not api_key:
+        logger.warning("[NOTIFICACIONES] No se encontró la clave REST API Key de OneSignal.")
+        return {"success": False, "error": "No OneSignal API key configured"}
+
+    payload = {
+        "app_id": settings.ONESIGNAL_APP_ID,
+        "include_player_ids": list(player_ids),
+        "headings": {"en": titulo},
+        "contents": {"en": mensaje},
+        "data": data or {},
+        "priority": "high",
+    }
+    try:
+        response = obtener_sesion().post(
+            _config("ONESIGNAL_API_URL", ONESIGNAL_URL_DEFAULT),
+            json=payload,
+            headers={"Authorization": f"Basic {api_key}"},
+            timeout=_config("PUSH_TIMEOUT", (3.05, 10)),
+        )
+    except requests.RequestException as e:
+        logger.error("[NOTIFICACIONES] Falló el envío a %s dispositivos: %s", len(payload["include_player_ids"]), e)
+        return {"success": False, "error": str(e)}
+
+    if response.status_code == 200:
+        logger.info("[NOTIFICACIONES] Lote enviado a %s dispositivos", len(payload["include_player_ids"]))
+        return {"success": True, "response": response.json()}
+    logger.error("[NOTIFICACIONES] Error de OneSignal (%s): %s", response.status_code, response.text)
+    return {"success": False, "response": response.text}
+
+
+# ===========================================
+# 🔵 Agrupación en lotes
+# ===========================================
+def _agrupar(pendientes):
+    """[(player_id, titulo, mensaje, data)] -> {(titulo, mensaje, data_json): [player_ids]}"""
+    grupos = {}
+    for player_id, titulo, mensaje, data in pendientes:
+        clave = (titulo, mensaje, json.dumps(data or {}, sort_keys=True, default=str))
+        ids = grupos.setdefault(clave, [])
+        if player_id not in ids:
+            ids.append(player_id)
+    return grupos
+
+
+def _despachar(pendientes):
+    tamanio = _config("PUSH_LOTE", 2000)
+    resultados = []
+    for (titulo, mensaje, data_json), ids in _agrupar(pendientes).items():
+        data = json.loads(data_json)
+        for i in range(0, len(ids), tamanio):
+            resultados.append(enviar_lote(ids[i:i + tamanio], titulo, mensaje, data))
+    return resultados
+
+
+def _trabajador():
+    ventana = _config("PUSH_VENTANA_SEGUNDOS", 0.5)
+    while True:
+        pendientes = [_cola.get()]
+        limite = time.monotonic() + ventana
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                pendientes.append(_cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        try:
+            _despachar(pendientes)
+        except Exception:
+            logger.exception("[NOTIFICACIONES] Error inesperado al despachar push")
+        finally:
+            for _ in pendientes:
+                _cola.task_done()
+
+
+def _iniciar_trabajador():
+    global _hilo
+    if _hilo is None or not _hilo.is_alive():
+        with _lock:
+            if _hilo is None or not _hilo.is_alive():
+                _hilo = threading.Thread(target=_trabajador, name="push-dispatcher", daemon=True)
+                _hilo.start()
+
+
+# ===========================================
+# 🔵 API pública
+# ===========================================
+def encolar_push(player_ids, titulo, mensaje, data=None):
+    """
+    Encola una notificación para uno o varios dispositivos (no bloquea).
+    En modo "sync" envía en el momento y devuelve los resultados.
+    """
+    player_ids = [pid for pid in player_ids if pid]
+    if not player_ids:
+        return []
+
+    pendientes = [(pid, titulo, mensaje, data) for pid in player_ids]
+    if _config("PUSH_MODO", "async") == "sync":
+        return _despachar(pendientes)
+
+    _iniciar_trabajador()
+    for item in pendientes:
+        _cola.put(item)
+    return []
+
+
+def vaciar_cola(timeout=None):
+    """Espera a que se envíe lo encolado (al apagar el proceso)."""
+    if _hilo is None or not _hilo.is_alive():
+        return
+    fin = time.monotonic() + timeout if timeout else None
+    while _cola.unfinished_tasks:
+        if fin and time.monotonic() > fin:
+            break
+        time.sleep(0.05)
+
+
+atexit.register(vaciar_cola, timeout=5)
@@ -1,7 +1,8 @@
 # utils/push_service.py
-import requests
 from django.conf import settings
 
+from .push_dispatcher import encolar_push
+
 def send_onesignal_notification(user, title, message, data_extra=None):
     """
     Envía una notificación push a un usuario específico mediante OneSignal.
@@ -13,7 +14,7 @@ def send_onesignal_notification(user, title, message, data_extra=None):
         data_extra (dict, opcional): Datos adicionales para el cliente móvil
 
     Returns:
-        dict: Resultado del envío
+        dict: Resultado del envío (o {"queued": True} si quedó en la cola)
     """
     # Obtener la REST API Key y App ID de OneSignal desde las configuraciones
     onesignal_api_key = settings.ONESIGNAL_REST_API_KEY
@@ -30,29 +31,9 @@ def send_onesignal_notification(user, title, message, data_extra=None):
         print(f"[⚠️ NOTIFICACIONES] El usuario {user.email} no tiene token OneSignal registrado.")
         return {"success": False, "error": "No OneSignal token for user"}
 
-    # Construir el payload de la notificación
-    payload = {
-        "app_id": onesignal_app_id,
-        "include_player_ids": [token],  # Token del dispositivo
-        "headings": {"en": title},
-        "contents": {"en": message},
-        "data": data_extra or {},
-        "priority": "high"
-    }
-
-    # Enviar la solicitud POST a OneSignal
-    url = "https://onesignal.com/api/v1/notifications"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Basic {onesignal_api_key}"
-    }
-
-    response = requests.post(url, json=payload, headers=headers)
-    result = response.json()
-
-    if response.status_code == 200:
-        print(f"[✅ NOTIFICACIONES] Notificación enviada a {user.email}")
-        return {"success": True, "response": result}
-    else:
-        print(f"[❌ NOTIFICACIONES] Error al enviar la notificación: {response.text}")
-        return {"success": False, "response": result}
+    # Se encola: el despachador agrupa destinatarios y envía fuera del request
+    # (ver notifications/push_dispatcher.py)
+    resultados = encolar_push([token], title, message, data_extra)
+    if resultados:
+        return resultados[0]
+    return {"success": True, "queued": True}
@@ -0,0 +1,76 @@
+# notifications/realtime.py
+# Entrega en tiempo real de notificaciones por websocket (Django Channels).
+#
+#  - Cada usuario conectado está en el grupo "notificaciones_<usuario_id>".
+#  - emitir_nuevas() manda la notificación y el contador de no leídas
+#    actualizado; varios usuarios (envío masivo) se resuelven con UNA consulta
+#    de contadores y un solo event loop para todos los group_send.
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db.models import Count
+
+from .models import Notificacion
+
+
+def grupo_usuario(usuario_id):
+    return f"notificaciones_{usuario_id}"
+
+
+def serializar(notificacion):
+    return {
+        "id": notificacion.id,
+        "titulo": notificacion.titulo,
+        "mensaje": notificacion.mensaje,
+        "fecha_creada": notificacion.fecha_creada.isoformat() if notificacion.fecha_creada else None,
+        "leida": notificacion.leida,
+    }
+
+
+def contar_no_leidas(usuario_ids):
+    """{usuario_id: no leídas} en una sola consulta."""
+    filas = (
+        Notificacion.objects.filter(usuario_id__in=list(usuario_ids), leida=False)
+        .values("usuario_id")
+        .annotate(total=Count("id"))
+        .values_list("usuario_id", "total")
+    )
+    conteos = {pk: 0 for pk in usuario_ids}
+    conteos.update(dict(filas))
+    return conteos
+
+
+def _enviar(mensajes):
+    """mensajes = [(usuario_id, evento)]"""
+    capa = get_channel_layer()
+    if capa is None or not mensajes:
+        return
+
+    async def _todos():
+        for usuario_id, evento in mensajes:
+            await capa.group_send(grupo_usuario(usuario_id), evento)
+
+    async_to_sync(_todos)()
+
+
+def emitir_nuevas(notificaciones):
+    """Envía cada notificación nueva a su usuario junto con su contador."""
+    notificaciones = list(notificaciones)
+    conteos = contar_no_leidas({n.usuario_id for n in notificaciones})
+    _enviar([
+        (n.usuario_id, {
+            "type": "notificacion.nueva",
+            "notificacion": serializar(n),
+            "no_leidas": conteos[n.usuario_id],
+        })
+        for n in notificaciones
+    ])
+
+
+def emitir_contador(usuario_ids):
+    """Envía solo el contador de no leídas (p. ej. después de marcar como leídas)."""
+    conteos = contar_no_leidas(set(usuario_ids))
+    _enviar([
+        (usuario_id, {"type": "notificacion.contador", "no_leidas": total})
+        for usuario_id, total in conteos.items()
+    ])
@@ -58,3 +58,25 @@ class NotificacionSerializer(serializers.ModelSerializer):
         #   send_push_notification(notificacion.usuario, notificacion.titulo, notificacion.mensaje)
 
         return notificacion
+
+
+class SegmentoSerializer(serializers.Serializer):
+    rol = serializers.CharField(required=False)
+    compras_desde = serializers.DateField(required=False)
+    compras_minimas = serializers.IntegerField(required=False, min_value=1)
+    monto_minimo = serializers.DecimalField(required=False, max_digits=12, decimal_places=2)
+
+
+class BroadcastSerializer(serializers.Serializer):
+    """Datos de una notificación masiva (ver notifications/broadcast.py)."""
+    titulo = serializers.CharField(max_length=255)
+    mensaje = serializers.CharField()
+    destino = serializers.ChoiceField(choices=["empresa", "rol", "segmento"], default="empresa")
+    rol = serializers.CharField(required=False)
+    segmento = SegmentoSerializer(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, data):
+        if data["destino"] == "rol" and not data.get("rol"):
+            raise serializers.ValidationError({"rol": "Indique el rol destinatario."})
+        return data
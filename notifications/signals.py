@@ -0,0 +1,16 @@
+# notifications/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Notificacion
+from .realtime import emitir_contador, emitir_nuevas
+
+
+@receiver(post_save, sender=Notificacion)
+def emitir_notificacion(sender, instance, created, **kwargs):
+    # Se emite después del commit: el cliente nunca recibe una fila revertida
+    if created:
+        transaction.on_commit(lambda: emitir_nuevas([instance]))
+    else:
+        transaction.on_commit(lambda: emitir_contador([instance.usuario_id]))
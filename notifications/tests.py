@@ -1,3 +1,177 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tenants.models import Empresa
+from users.models import Role, User
+from utils.channels_auth import JWTAuthMiddleware
+from ventas.models import Venta
+from .fake_onesignal import OneSignalFalso
+from .models import Notificacion
+from .push_dispatcher import encolar_push
+from .routing import websocket_urlpatterns
+from .views import NotificacionViewSet
+
+
+class PushDispatcherTests(TestCase):
+
+    def test_agrupa_destinatarios_en_lotes(self):
+        with OneSignalFalso() as fake:
+            with override_settings(ONESIGNAL_API_URL=fake.url, PUSH_MODO="sync", PUSH_LOTE=2000,
+                                   ONESIGNAL_REST_API_KEY="test"):
+                ids = [f"player-{i}" for i in range(4500)]
+                resultados = encolar_push(ids + ids[:10], "Oferta", "20% en todo", {"tipo": "promo"})
+
+        self.assertEqual(len(fake.recibidos), 3)
+        self.assertTrue(all(r["success"] for r in resultados))
+        self.assertEqual([len(p["include_player_ids"]) for p in fake.recibidos], [2000, 2000, 500])
+        self.assertEqual(fake.recibidos[0]["data"], {"tipo": "promo"})
+
+    def test_contenidos_distintos_van_en_requests_separados(self):
+        with OneSignalFalso() as fake:
+            with override_settings(ONESIGNAL_API_URL=fake.url, PUSH_MODO="sync",
+                                   ONESIGNAL_REST_API_KEY="test"):
+                encolar_push(["a"], "Hola", "uno")
+                encolar_push(["b", "c"], "Hola", "dos")
+
+        self.assertEqual(len(fake.recibidos), 2)
+
+
+class BroadcastTests(TestCase):
+    """Envío masivo: filas en lotes, push agrupado y una sola entrada de bitácora."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Push", nit="PUSH-001")
+        admin = Role.objects.create(empresa=cls.empresa, name="ADMIN")
+        cliente = Role.objects.create(empresa=cls.empresa, name="CUSTOMER")
+        cls.admin = User.objects.create_user(email="admin@push.com", password="x", empresa=cls.empresa, role=admin)
+        cls.clientes = [
+            User.objects.create_user(
+                email=f"c{i}@push.com", password="x", empresa=cls.empresa, role=cliente,
+                onesignal_player_id=f"player-{i}",
+            )
+            for i in range(7)
+        ]
+        Venta.objects.create(
+            empresa=cls.empresa, usuario=cls.clientes[0], fecha=timezone.now(), total=500,
+        )
+
+    def _broadcast(self, data):
+        request = APIRequestFactory().post("/api/notificaciones/broadcast/", data, format="json")
+        force_authenticate(request, user=self.admin)
+        return NotificacionViewSet.as_view({"post": "broadcast"})(request)
+
+    @override_settings(PUSH_MODO="sync", NOTIFICACION_LOTE=3, ONESIGNAL_REST_API_KEY="test")
+    def test_broadcast_por_rol(self):
+        with OneSignalFalso() as fake, override_settings(ONESIGNAL_API_URL=fake.url):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._broadcast({"titulo": "Hola", "mensaje": "Ofertas", "destino": "rol", "rol": "customer"})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {"notificaciones": 7, "push": 7})
+        self.assertEqual(Notificacion.objects.filter(empresa=self.empresa).count(), 7)
+        self.assertEqual(len(fake.recibidos), 1)
+
+    @override_settings(PUSH_MODO="sync", ONESIGNAL_REST_API_KEY="test")
+    def test_broadcast_por_segmento(self):
+        with OneSignalFalso() as fake, override_settings(ONESIGNAL_API_URL=fake.url):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._broadcast({
+                    "titulo": "VIP", "mensaje": "Gracias", "destino": "segmento",
+                    "segmento": {"monto_minimo": "100"},
+                })
+
+        self.assertEqual(response.data["notificaciones"], 1)
+        self.assertEqual(fake.recibidos[0]["include_player_ids"], ["player-0"])
+
+
+class NoLeidasTests(TestCase):
+    """Contador de no leídas y marcado masivo con un solo UPDATE."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Badge", nit="BADGE-001")
+        cls.usuario = User.objects.create_user(email="badge@test.com", password="x", empresa=cls.empresa)
+        otro = User.objects.create_user(email="otro@test.com", password="x", empresa=cls.empresa)
+        cls.notificaciones = Notificacion.objects.bulk_create([
+            Notificacion(empresa=cls.empresa, usuario=cls.usuario, titulo=f"N{i}", mensaje="-")
+            for i in range(4)
+        ] + [Notificacion(empresa=cls.empresa, usuario=otro, titulo="Otro", mensaje="-")])
+
+    def _llamar(self, metodo, accion, data=None):
+        factory = APIRequestFactory()
+        request = getattr(factory, metodo)("/api/notificaciones/", data, format="json")
+        force_authenticate(request, user=self.usuario)
+        # Como lo registra el router: con los permission_classes de la acción
+        vista = NotificacionViewSet.as_view({metodo: accion}, **getattr(NotificacionViewSet, accion).kwargs)
+        return vista(request)
+
+    def test_contador_y_marcar_por_ids(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self._llamar("get", "no_leidas").data, {"no_leidas": 4})
+
+        ids = [n.id for n in self.notificaciones[:2]]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._llamar("post", "marcar_leidas", {"ids": ids})
+        self.assertEqual(response.data, {"actualizadas": 2})
+        self.assertEqual(self._llamar("get", "no_leidas").data, {"no_leidas": 2})
+
+    def test_marcar_todas_no_toca_otros_usuarios(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._llamar("post", "marcar_leidas", {})
+        self.assertEqual(response.data, {"actualizadas": 4})
+        self.assertEqual(Notificacion.objects.filter(leida=False).count(), 1)
+
+        response = self._llamar("post", "marcar_leidas", {"antes_de": "no-es-fecha"})
+        self.assertEqual(response.status_code, 400)
+
+
+def _websocket(ruta):
+    path, _, query = ruta.partition("?")
+    return ApplicationCommunicator(
+        JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+        {"type": "websocket", "path": path, "query_string": query.encode(), "headers": []},
+    )
+
+
+async def _recibir(comunicador, timeout=2):
+    mensaje = await comunicador.receive_output(timeout)
+    return json.loads(mensaje["text"]) if "text" in mensaje else mensaje
+
+
+class NotificacionWebsocketTests(TransactionTestCase):
+    """El consumer autentica con el JWT de la API y recibe las notificaciones nuevas."""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Empresa WS", nit="WS-001")
+        self.usuario = User.objects.create_user(email="ws@test.com", password="x", empresa=self.empresa)
+        Notificacion.objects.create(empresa=self.empresa, usuario=self.usuario, titulo="Vieja", mensaje="-")
+
+    async def test_recibe_notificacion_y_contador(self):
+        token = str(AccessToken.for_user(self.usuario))
+        comunicador = _websocket(f"/ws/notificaciones/?token={token}")
+        await comunicador.send_input({"type": "websocket.connect"})
+        self.assertEqual((await _recibir(comunicador))["type"], "websocket.accept")
+        self.assertEqual(await _recibir(comunicador), {"tipo": "contador", "no_leidas": 1})
+
+        await database_sync_to_async(Notificacion.objects.create)(
+            empresa=self.empresa, usuario=self.usuario, titulo="Nueva", mensaje="Hola"
+        )
+        evento = await _recibir(comunicador)
+        self.assertEqual(evento["tipo"], "notificacion")
+        self.assertEqual(evento["notificacion"]["titulo"], "Nueva")
+        self.assertEqual(evento["no_leidas"], 2)
+        await comunicador.send_input({"type": "websocket.disconnect", "code": 1000})
+        await comunicador.wait(1)
+
+    async def test_rechaza_sin_token(self):
+        comunicador = _websocket("/ws/notificaciones/?token=malo")
+        await comunicador.send_input({"type": "websocket.connect"})
+        self.assertEqual(await _recibir(comunicador), {"type": "websocket.close", "code": 4401})
@@ -2,9 +2,18 @@
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
 from utils.viewsets import SoftDeleteViewSet
 from .models import Notificacion
-from .serializers import NotificacionSerializer
+from .serializers import BroadcastSerializer, NotificacionSerializer
+from . import broadcast
+from .realtime import emitir_contador
+from tenants.quotas import requiere_funcion
+from utils.permissions import ModulePermission
+from tenants.models import Empresa
+from utils.logging_utils import log_action
 from .push_service import send_onesignal_notification  # Asegúrate de que el servicio esté implementado
 from rest_framework.views import APIView
 class NotificacionTestView(APIView):
@@ -40,11 +49,82 @@ class NotificacionViewSet(SoftDeleteViewSet):
         empresa = getattr(user, "empresa", None)
         notificacion = serializer.save(empresa=empresa)
 
-        # Enviar notificación push con OneSignal
-        send_onesignal_notification(
+        # Enviar notificación push con OneSignal (encolada, después del commit)
+        transaction.on_commit(lambda: send_onesignal_notification(
             user=notificacion.usuario,
             title=notificacion.titulo,
             message=notificacion.mensaje,
-        )
+        ))
 
         return notificacion
+
+    # ===========================================
+    # 🔵 Envío masivo (empresa, rol o segmento)
+    # ===========================================
+    @action(detail=False, methods=["post"], url_path="broadcast",
+            permission_classes=[ModulePermission, requiere_funcion("permite_notificaciones_push")])
+    def broadcast(self, request):
+        serializer = BroadcastSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+
+        empresa = getattr(request.user, "empresa", None)
+        if empresa is None and request.data.get("empresa"):
+            empresa = Empresa.objects.filter(id=request.data.get("empresa")).first()
+        if empresa is None:
+            return Response({"detail": "Empresa no encontrada."}, status=status.HTTP_400_BAD_REQUEST)
+
+        usuarios = broadcast.destinatarios(
+            empresa, datos["destino"], rol=datos.get("rol"), segmento=datos.get("segmento")
+        )
+        resultado = broadcast.difundir(
+            empresa, datos["titulo"], datos["mensaje"], usuarios, data=datos.get("data")
+        )
+
+        log_action(
+            user=request.user,
+            modulo=self.module_name,
+            accion="CREAR",
+            descripcion=(
+                f"Envío masivo '{datos['titulo']}' ({datos['destino']}): "
+                f"{resultado['notificaciones']} notificaciones, {resultado['push']} push"
+            ),
+            request=request,
+        )
+        return Response(resultado, status=status.HTTP_201_CREATED)
+
+    # ===========================================
+    # 🔵 No leídas (índice parcial notif_no_leidas_idx)
+    # ===========================================
+    @action(detail=False, methods=["get"], url_path="no-leidas", permission_classes=[IsAuthenticated])
+    def no_leidas(self, request):
+        """Contador para el badge: un COUNT sobre el índice parcial del usuario.
+        Solo toca las notificaciones propias, por eso basta con estar autenticado."""
+        total = Notificacion.objects.filter(usuario=request.user, leida=False).count()
+        return Response({"no_leidas": total})
+
+    @action(detail=False, methods=["post"], url_path="marcar-leidas", permission_classes=[IsAuthenticated])
+    def marcar_leidas(self, request):
+        """
+        Marca como leídas las notificaciones del usuario con UN solo UPDATE.
+        Body: {"ids": [1, 2, 3]}  |  {"antes_de": "2025-01-31T23:59:59Z"}  |  {} (todas)
+        """
+        qs = Notificacion.objects.filter(usuario=request.user, leida=False)
+
+        ids = request.data.get("ids")
+        antes_de = request.data.get("antes_de")
+        if ids is not None:
+            if not isinstance(ids, list) or not all(str(i).isdigit() for i in ids):
+                return Response({"detail": "ids debe ser una lista de enteros."}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(id__in=[int(i) for i in ids])
+        if antes_de:
+            fecha = parse_datetime(str(antes_de))
+            if fecha is None:
+                return Response({"detail": "antes_de no es una fecha válida."}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(fecha_creada__lte=fecha)
+
+        actualizadas = qs.update(leida=True)
+        if actualizadas:
+            # update() no dispara post_save: se avisa el contador a los websockets
+            transaction.on_commit(lambda: emitir_contador([request.user.id]))
+        return Response({"actualizadas": actualizadas})
@@ -0,0 +1,180 @@
+# prediccion/comparativo.py
+# Analítica comparativa del dashboard en una sola llamada: periodo actual,
+# periodo anterior (misma duración, inmediatamente antes) y el mismo periodo
+# del año pasado, con tasas de crecimiento y desglose por sucursal, canal y
+# categoría.
+#
+#  - Agregación condicional: los tres periodos salen de UNA consulta por
+#    dimensión (SUM/COUNT ... FILTER (WHERE fecha >= ... AND fecha < ...)),
+#    leyendo solo las filas de los tres rangos: los límites son datetimes
+#    locales, así el índice (empresa, estado, fecha) sirve para el rango.
+#  - Categoría se calcula sobre detalle_venta (subtotal); la cantidad de
+#    ventas es COUNT(DISTINCT venta_id).
+#  - La respuesta se cachea por empresa, rango y opciones. Cada empresa tiene
+#    una versión de analítica que cambia cuando se guarda una venta
+#    (prediccion/signals.py), igual que el catálogo (products/cache.py).
+
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+
+from ventas.models import DetalleVenta, Venta
+from .timeseries import rango_datetime
+
+PERIODOS = ("actual", "anterior", "anio_anterior")
+DESGLOSES = {
+    "sucursal": "sucursal__nombre",
+    "canal": "canal",
+    "categoria": "producto__subcategoria__categoria__nombre",
+}
+ESTADO_VALIDO = "entregado"
+
+
+# ===========================================
+# 🔵 Versión de analítica (invalidación)
+# ===========================================
+def _version_key(empresa_id):
+    return f"analitica:version:{empresa_id}"
+
+
+def obtener_version(empresa_id):
+    version = cache.get(_version_key(empresa_id))
+    if version is None:
+        cache.add(_version_key(empresa_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(empresa_id))
+    return version
+
+
+def invalidar_analitica(empresa_id):
+    if empresa_id:
+        cache.set(_version_key(empresa_id), time.time_ns(), timeout=None)
+
+
+# ===========================================
+# 🔵 Rangos y métricas
+# ===========================================
+def _restar_anio(fecha):
+    try:
+        return fecha.replace(year=fecha.year - 1)
+    except ValueError:  # 29 de febrero
+        return fecha.replace(year=fecha.year - 1, day=28)
+
+
+def rangos_comparacion(inicio, fin):
+    """{"actual": (inicio, fin), "anterior": (...), "anio_anterior": (...)}"""
+    dias = (fin - inicio).days + 1
+    anterior_fin = inicio - timedelta(days=1)
+    return {
+        "actual": (inicio, fin),
+        "anterior": (anterior_fin - timedelta(days=dias - 1), anterior_fin),
+        "anio_anterior": (_restar_anio(inicio), _restar_anio(fin)),
+    }
+
+
+def _agregados(rangos, campo_fecha, campo_total, campo_venta):
+    """SUM/COUNT condicionales: una pareja de columnas por periodo."""
+    distinct = campo_venta != "id"
+    agregados = {}
+    for periodo, (inicio, fin) in rangos.items():
+        filtro = _en_rango(inicio, fin, campo_fecha)
+        agregados[f"{periodo}_total"] = Sum(campo_total, filter=filtro, default=0)
+        agregados[f"{periodo}_numero"] = Count(campo_venta, filter=filtro, distinct=distinct)
+    return agregados
+
+
+def _en_rango(inicio, fin, campo_fecha):
+    desde, hasta = rango_datetime(inicio, fin)
+    return Q(**{f"{campo_fecha}__gte": desde, f"{campo_fecha}__lt": hasta})
+
+
+def _en_rangos(rangos, campo_fecha):
+    filtro = Q()
+    for inicio, fin in rangos.values():
+        filtro |= _en_rango(inicio, fin, campo_fecha)
+    return filtro
+
+
+def crecimiento(actual, base):
+    """Variación porcentual; None si la base es 0."""
+    if not base:
+        return None
+    return round((actual - base) / base * 100, 2)
+
+
+def _formatear(fila):
+    datos = {}
+    for periodo in PERIODOS:
+        total = float(fila[f"{periodo}_total"] or 0)
+        numero = fila[f"{periodo}_numero"] or 0
+        datos[periodo] = {
+            "total": round(total, 2),
+            "numero_ventas": numero,
+            "ticket_promedio": round(total / numero, 2) if numero else 0.0,
+        }
+    datos["crecimiento"] = {
+        f"vs_{base}": {
+            "total": crecimiento(datos["actual"]["total"], datos[base]["total"]),
+            "numero_ventas": crecimiento(datos["actual"]["numero_ventas"], datos[base]["numero_ventas"]),
+        }
+        for base in ("anterior", "anio_anterior")
+    }
+    return datos
+
+
+# ===========================================
+# 🔵 Consulta
+# ===========================================
+def comparativo(empresa_id, inicio, fin, desgloses=tuple(DESGLOSES), using="default"):
+    rangos = rangos_comparacion(inicio, fin)
+
+    ventas = Venta.objects.using(using).filter(
+        _en_rangos(rangos, "fecha"), empresa_id=empresa_id, estado=ESTADO_VALIDO
+    )
+    detalles = DetalleVenta.objects.using(using).filter(
+        _en_rangos(rangos, "venta__fecha"), venta__empresa_id=empresa_id, venta__estado=ESTADO_VALIDO
+    )
+
+    resultado = {
+        "rangos": {p: {"inicio": i.isoformat(), "fin": f.isoformat()} for p, (i, f) in rangos.items()},
+        "totales": _formatear(ventas.aggregate(**_agregados(rangos, "fecha", "total", "id"))),
+        "desglose": {},
+    }
+
+    for dimension in desgloses:
+        if dimension == "categoria":
+            qs, agregados = detalles, _agregados(rangos, "venta__fecha", "subtotal", "venta_id")
+        else:
+            qs, agregados = ventas, _agregados(rangos, "fecha", "total", "id")
+        filas = (
+            qs.order_by()
+            .values(nombre=F(DESGLOSES[dimension]))
+            .annotate(**agregados)
+            .order_by("-actual_total", "nombre")
+        )
+        resultado["desglose"][dimension] = [
+            {"nombre": fila["nombre"] or "Sin asignar", **_formatear(fila)} for fila in filas
+        ]
+    return resultado
+
+
+def comparativo_cacheado(empresa_id, inicio, fin, desgloses=tuple(DESGLOSES), using="default", extra=None):
+    """
+    comparativo() cacheado por (empresa, versión, rango, desgloses). `extra`
+    es una función opcional que agrega claves al resultado (p. ej. la serie).
+    """
+    base = f"{inicio}:{fin}:{','.join(desgloses)}:{bool(extra)}"
+    clave = (
+        f"analitica:comparativo:{empresa_id}:{obtener_version(empresa_id)}:"
+        f"{hashlib.md5(base.encode('utf-8')).hexdigest()}"
+    )
+    datos = cache.get(clave)
+    if datos is None:
+        datos = comparativo(empresa_id, inicio, fin, desgloses, using)
+        if extra:
+            datos.update(extra())
+        cache.set(clave, datos, timeout=getattr(settings, "ANALITICA_CACHE_TIMEOUT", 300))
+    return datos
@@ -0,0 +1,264 @@
+# prediccion/insights.py
+# Motor único de insights de ventas (estacionalidad, días/meses/horas fuertes
+# y débiles). Reemplaza los cálculos duplicados de get_insights,
+# get_ia_insights y train_sales_model.
+#
+#  - Rollup diario (VentaDiaria): total, cantidad y total por hora de las
+#    ventas entregadas de cada día. Al guardar/borrar una venta solo se marca
+#    su día como pendiente (prediccion/signals.py).
+#  - actualizar_insights() recalcula los días pendientes en UNA consulta
+#    agrupada (o todo el histórico la primera vez) y vuelve a calcular los
+#    insights desde el rollup, que tiene una fila por día.
+#  - El resultado se guarda en InsightsVentas; los endpoints solo lo leen
+#    (obtener_insights). Si no existe, o hay días pendientes y pasó
+#    INSIGHTS_REFRESCO, se recalcula en un hilo aparte (INSIGHTS_MODO =
+#    "sync" lo hace en el momento: tests / scripts) y el request responde con
+#    lo guardado. El comando actualizar_insights los refresca por cron.
+#  - Fuerza estacional por varianza: qué % de la varianza de las ventas
+#    diarias explican los promedios por día de la semana, por mes y ambos.
+
+import logging
+import threading
+from datetime import timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from ventas.models import Venta
+from .models import InsightsVentas, VentaDiaria
+
+DAY_MAP = {0: "Lunes", 1: "Martes", 2: "Miércoles", 3: "Jueves", 4: "Viernes", 5: "Sábado", 6: "Domingo"}
+MONTH_MAP = {
+    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo",
+    6: "Junio", 7: "Julio", 8: "Agosto", 9: "Septiembre",
+    10: "Octubre", 11: "Noviembre", 12: "Diciembre"
+}
+ESTADO_VALIDO = "entregado"
+HORAS = 24
+
+logger = logging.getLogger(__name__)
+
+
+# ===========================================
+# 🔵 Días pendientes (desde las señales)
+# ===========================================
+def marcar_dias(empresa_id, fechas):
+    """Marca los días (fechas locales) como pendientes con un solo upsert."""
+    fechas = {f for f in fechas if f is not None}
+    if not empresa_id or not fechas:
+        return
+    VentaDiaria.objects.bulk_create(
+        [VentaDiaria(empresa_id=empresa_id, fecha=f, pendiente=True) for f in fechas],
+        update_conflicts=True,
+        unique_fields=["empresa", "fecha"],
+        update_fields=["pendiente"],
+    )
+
+
+def fecha_local(valor):
+    return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+
+
+# ===========================================
+# 🔵 Rollup diario
+# ===========================================
+def _recalcular_dias(empresa_id, fechas=None):
+    """Recalcula las filas de VentaDiaria de `fechas` (None = todo el histórico)."""
+    ventas = Venta.objects.filter(empresa_id=empresa_id, estado=ESTADO_VALIDO)
+    if fechas is not None:
+        ventas = ventas.filter(fecha__date__in=fechas)
+
+    filas = (
+        ventas.annotate(dia=TruncDate("fecha"), hora=ExtractHour("fecha"))
+        .order_by()
+        .values("dia", "hora")
+        .annotate(total=Sum("total"), numero=Count("id"))
+    )
+
+    dias = {}
+    for fila in filas:
+        dia = dias.setdefault(fila["dia"], VentaDiaria(
+            empresa_id=empresa_id, fecha=fila["dia"], total=0, numero_ventas=0, por_hora=[0.0] * HORAS
+        ))
+        dia.total += fila["total"] or 0
+        dia.numero_ventas += fila["numero"]
+        dia.por_hora[fila["hora"]] += float(fila["total"] or 0)
+
+    # Días sin ventas entregadas (p. ej. se anuló la única venta): fuera del rollup
+    sobrantes = VentaDiaria.objects.filter(empresa_id=empresa_id).exclude(fecha__in=list(dias))
+    if fechas is not None:
+        sobrantes = sobrantes.filter(fecha__in=fechas)
+    sobrantes.delete()
+
+    # `pendiente` no se toca: si una venta marcó el día durante el cálculo, sigue pendiente
+    VentaDiaria.objects.bulk_create(
+        list(dias.values()),
+        update_conflicts=True,
+        unique_fields=["empresa", "fecha"],
+        update_fields=["total", "numero_ventas", "por_hora"],
+    )
+
+
+# ===========================================
+# 🔵 Cálculo de insights
+# ===========================================
+def _fuerza(efecto, serie, varianza):
+    residuo = serie - efecto
+    return max(0.0, min(1.0, 1 - float((residuo ** 2).mean()) / varianza))
+
+
+def calcular_insights(empresa_id):
+    """Insights de la empresa a partir de VentaDiaria ({} si no hay ventas)."""
+    filas = list(
+        VentaDiaria.objects.filter(empresa_id=empresa_id)
+        .order_by("fecha")
+        .values_list("fecha", "total", "por_hora")
+    )
+    if not filas:
+        return {}
+
+    # Serie diaria completa: los días sin ventas cuentan como 0
+    serie = pd.Series(
+        [float(total) for _, total, _ in filas],
+        index=pd.DatetimeIndex([fecha for fecha, _, _ in filas]),
+    )
+    serie = serie.reindex(pd.date_range(serie.index.min(), serie.index.max(), freq="D"), fill_value=0.0)
+    dias_serie = len(serie)
+
+    por_dia = serie.groupby(serie.index.dayofweek).mean()
+    por_mes = serie.groupby(serie.index.month).mean()
+
+    por_hora = [0.0] * HORAS
+    for _, _, horas in filas:
+        for hora, total in enumerate(horas or []):
+            por_hora[hora] += total
+    por_hora = pd.Series([total / dias_serie for total in por_hora])
+    horas_con_ventas = por_hora[por_hora > 0]
+
+    # Varianza explicada por el día de la semana, el mes y ambos
+    media = serie.mean()
+    varianza = float(((serie - media) ** 2).mean())
+    efecto_dia = serie.groupby(serie.index.dayofweek).transform("mean")
+    efecto_mes = serie.groupby(serie.index.month).transform("mean")
+    if varianza > 0:
+        fuerza = {
+            "semanal": _fuerza(efecto_dia, serie, varianza),
+            "mensual": _fuerza(efecto_mes, serie, varianza),
+            "total": _fuerza(efecto_dia + efecto_mes - media, serie, varianza),
+        }
+    else:
+        fuerza = {"semanal": 0.0, "mensual": 0.0, "total": 0.0}
+    fuerza = {k: round(v * 100, 2) for k, v in fuerza.items()}
+
+    def dia(k):
+        # `dia` conserva la numeración de ExtractWeekDay (1=Domingo ... 7=Sábado)
+        return {"dia": (int(k) + 1) % 7 + 1, "nombre": DAY_MAP[k], "promedio_bs": round(float(por_dia[k]), 2)}
+
+    def mes(k):
+        return {"mes": int(k), "nombre": MONTH_MAP[k], "promedio_bs": round(float(por_mes[k]), 2)}
+
+    def hora(k):
+        return {"hora": int(k), "nombre": f"{k:02d}:00", "promedio_bs": round(float(por_hora[k]), 2)}
+
+    return {
+        "dia_fuerte": dia(por_dia.idxmax()),
+        "dia_debil": dia(por_dia.idxmin()),
+        "mes_fuerte": mes(por_mes.idxmax()),
+        "mes_debil": mes(por_mes.idxmin()),
+        "hora_fuerte": hora(horas_con_ventas.idxmax()) if len(horas_con_ventas) else None,
+        "hora_debil": hora(horas_con_ventas.idxmin()) if len(horas_con_ventas) else None,
+        "estacionalidad": fuerza["total"],
+        "fuerza_estacional": fuerza,
+        "promedios": {
+            "dia_semana": [dia(k) for k in por_dia.index],
+            "mes": [mes(k) for k in por_mes.index],
+            "hora": [hora(k) for k in horas_con_ventas.index],
+        },
+        "periodo": {
+            "desde": serie.index.min().date().isoformat(),
+            "hasta": serie.index.max().date().isoformat(),
+            "dias": dias_serie,
+            "promedio_diario_bs": round(float(media), 2),
+        },
+    }
+
+
+# ===========================================
+# 🔵 Actualización y lectura
+# ===========================================
+def actualizar_insights(empresa_id, completo=False):
+    """
+    Recalcula los días pendientes (o todo, con `completo` o si la empresa aún
+    no tiene insights) y guarda el resultado. Lee de la primaria: el rollup
+    debe reflejar las ventas que marcaron cada día.
+    """
+    with transaction.atomic():
+        completo = completo or not InsightsVentas.objects.filter(empresa_id=empresa_id).exists()
+        pendientes = VentaDiaria.objects.filter(empresa_id=empresa_id, pendiente=True)
+
+        if completo:
+            pendientes.update(pendiente=False)
+            _recalcular_dias(empresa_id)
+        else:
+            fechas = list(pendientes.values_list("fecha", flat=True))
+            if fechas:
+                # Se limpia antes de calcular: una venta posterior vuelve a marcar el día
+                VentaDiaria.objects.filter(empresa_id=empresa_id, fecha__in=fechas).update(pendiente=False)
+                _recalcular_dias(empresa_id, fechas)
+
+        datos = calcular_insights(empresa_id)
+        InsightsVentas.objects.update_or_create(
+            empresa_id=empresa_id,
+            defaults={"datos": datos, "actualizado_en": timezone.now()},
+        )
+    return datos
+
+
+def _refrescar(empresa_id, clave):
+    try:
+        actualizar_insights(empresa_id)
+    except Exception:
+        logger.exception("[INSIGHTS] Error al recalcular los insights de la empresa %s", empresa_id)
+    finally:
+        cache.delete(clave)
+        connection.close()
+
+
+def programar_actualizacion(empresa_id):
+    """
+    Recalcula los insights fuera del request, un hilo por empresa a la vez.
+    En modo "sync" los recalcula en el momento y los devuelve.
+    """
+    if getattr(settings, "INSIGHTS_MODO", "async") == "sync":
+        return actualizar_insights(empresa_id)
+
+    clave = f"insights:refrescando:{empresa_id}"
+    if cache.add(clave, True, timeout=10 * 60):
+        threading.Thread(
+            target=_refrescar, args=(empresa_id, clave), name=f"insights-{empresa_id}", daemon=True
+        ).start()
+    return None
+
+
+def obtener_insights(empresa_id):
+    """
+    Insights guardados de la empresa (None si aún no se calcularon). Si no
+    existen, o hay días pendientes y el último cálculo tiene más de
+    INSIGHTS_REFRESCO segundos, se programa el recálculo.
+    """
+    fila = InsightsVentas.objects.filter(empresa_id=empresa_id).first()
+    if fila is not None:
+        refresco = timedelta(seconds=getattr(settings, "INSIGHTS_REFRESCO", 300))
+        vencido = fila.actualizado_en is None or timezone.now() - fila.actualizado_en >= refresco
+        if not (vencido and VentaDiaria.objects.filter(empresa_id=empresa_id, pendiente=True).exists()):
+            return fila.datos
+
+    datos = programar_actualizacion(empresa_id)
+    if datos is not None:
+        return datos
+    return fila.datos if fila is not None else None
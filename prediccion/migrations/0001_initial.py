@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('tenants', '0002_uso_empresa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InsightsVentas',
+            fields=[
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='insights_ventas', serialize=False, to='tenants.empresa')),
+                ('datos', models.JSONField(default=dict)),
+                ('actualizado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Insights de ventas',
+                'verbose_name_plural': 'Insights de ventas',
+                'db_table': 'insights_ventas',
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('numero_ventas', models.IntegerField(default=0)),
+                ('por_hora', models.JSONField(default=list, help_text='24 totales, uno por hora del día')),
+                ('pendiente', models.BooleanField(default=False, help_text='Sus ventas cambiaron desde el último cálculo')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='tenants.empresa')),
+            ],
+            options={
+                'db_table': 'venta_diaria',
+                'indexes': [models.Index(fields=['empresa', 'pendiente'], name='venta_diaria_pendiente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'fecha'), name='venta_diaria_emp_fecha_uniq')],
+            },
+        ),
+    ]
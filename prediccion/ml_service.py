@@ -3,6 +3,8 @@ import os
 from django.conf import settings
 from django.utils import timezone
 from ventas.models import Venta
+from utils.replica import alias_analitica
+from .insights import actualizar_insights
 import pandas as pd
 import joblib
 
@@ -12,18 +14,13 @@ MODEL_DIR = os.path.join(BASE_DIR, "ml_models")
 MODEL_PATH = os.path.join(MODEL_DIR, "sales_model.joblib")
 META_PATH = os.path.join(MODEL_DIR, "sales_metadata.joblib")
 
-DAY_MAP = {0: "Lunes", 1: "Martes", 2: "Miércoles", 3: "Jueves", 4: "Viernes", 5: "Sábado", 6: "Domingo"}
-MONTH_MAP = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 
-    6: "Junio", 7: "Julio", 8: "Agosto", 9: "Septiembre",
-    10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
 
 
 def prepare_data(empresa):
     print("[ML Service] Generando dataset por empresa...")
 
-    ventas_qs = Venta.objects.filter(
+    # Extracción pesada: réplica de analítica si está al día
+    ventas_qs = Venta.objects.using(alias_analitica(empresa.id)).filter(
         empresa=empresa,
         estado="entregado"
     ).values("fecha", "total")
@@ -71,21 +68,20 @@ def train_sales_model(empresa):
     predictions = model.predict(X_test)
     rmse = float(np.sqrt(mean_squared_error(y_test, predictions)))
 
-    # INSIGHTS
-    weekly = df.groupby("dia_de_la_semana")["total"].mean()
-    monthly = df.groupby("mes")["total"].mean()
+    # INSIGHTS: motor único (prediccion/insights.py), se refrescan al reentrenar
+    insights = actualizar_insights(empresa.id)
+    promedios = insights.get("promedios", {})
 
     metadata = {
         "rmse": rmse,
         "fecha_entrenamiento": str(timezone.now()),
         "insights": {
+            **insights,
             "weekly_trend": [
-                {"dia": DAY_MAP[k], "promedio_bs": float(round(v, 2))}
-                for k, v in weekly.items()
+                {"dia": d["nombre"], "promedio_bs": d["promedio_bs"]} for d in promedios.get("dia_semana", [])
             ],
             "monthly_trend": [
-                {"mes": MONTH_MAP[k], "promedio_bs": float(round(v, 2))}
-                for k, v in monthly.items()
+                {"mes": m["nombre"], "promedio_bs": m["promedio_bs"]} for m in promedios.get("mes", [])
             ],
         }
     }
@@ -182,7 +178,7 @@ def get_product_prediction(empresa, producto):
     from django.db.models import Sum
 
     # Obtener ventas históricas del producto
-    qs = DetalleVenta.objects.filter(
+    qs = DetalleVenta.objects.using(alias_analitica(empresa.id)).filter(
         empresa=empresa,
         producto=producto,
         venta__estado="entregado"
@@ -1,3 +1,44 @@
 from django.db import models
 
-# Create your models here.
+
+class VentaDiaria(models.Model):
+    """
+    Resumen diario de las ventas entregadas de una empresa (total, cantidad y
+    total por hora). Es la base de los insights (prediccion/insights.py): se
+    recalculan solo los días marcados como pendientes cuando cambian sus ventas.
+    """
+    empresa = models.ForeignKey('tenants.Empresa', on_delete=models.CASCADE, related_name='ventas_diarias')
+    fecha = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    numero_ventas = models.IntegerField(default=0)
+    por_hora = models.JSONField(default=list, help_text="24 totales, uno por hora del día")
+    pendiente = models.BooleanField(default=False, help_text="Sus ventas cambiaron desde el último cálculo")
+
+    class Meta:
+        db_table = 'venta_diaria'
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'fecha'], name='venta_diaria_emp_fecha_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['empresa', 'pendiente'], name='venta_diaria_pendiente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.empresa_id} {self.fecha}: {self.total}"
+
+
+class InsightsVentas(models.Model):
+    """Último resultado del motor de insights por empresa (lectura O(1) desde los endpoints)."""
+    empresa = models.OneToOneField(
+        'tenants.Empresa', on_delete=models.CASCADE, primary_key=True, related_name='insights_ventas'
+    )
+    datos = models.JSONField(default=dict)
+    actualizado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'insights_ventas'
+        verbose_name = 'Insights de ventas'
+        verbose_name_plural = 'Insights de ventas'
+
+    def __str__(self):
+        return f"Insights {self.empresa_id} ({self.actualizado_en})"
@@ -0,0 +1,65 @@
+# prediccion/signals.py
+# Cuando cambian las ventas de una empresa:
+#  - cambia su versión de analítica, para descartar los comparativos
+#    cacheados (prediccion/comparativo.py);
+#  - se marcan como pendientes los días afectados del rollup de insights
+#    (prediccion/insights.py).
+# Ambos al confirmar la transacción: el upsert del día no debe bloquear la
+# fila (empresa, hoy) mientras la venta sigue abierta, y si se revierte no
+# hay nada que marcar.
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from ventas.models import DetalleVenta, Venta
+from .comparativo import invalidar_analitica
+from .insights import ESTADO_VALIDO, fecha_local, marcar_dias
+
+CAMPOS_ROLLUP = ("fecha", "estado", "total")
+
+
+@receiver([post_save, post_delete], sender=Venta)
+@receiver([post_save, post_delete], sender=DetalleVenta)
+def invalidar_por_venta(sender, instance, **kwargs):
+    # Al confirmar: si la versión cambiara antes, un GET concurrente cachearía
+    # los datos previos a la venta bajo la versión nueva
+    empresa_id = instance.empresa_id
+    transaction.on_commit(lambda: invalidar_analitica(empresa_id))
+
+
+def _estado_rollup(venta):
+    # __dict__ para no disparar consultas con campos diferidos (.only())
+    return tuple(venta.__dict__.get(campo) for campo in CAMPOS_ROLLUP)
+
+
+@receiver(post_init, sender=Venta)
+def recordar_venta(sender, instance, **kwargs):
+    instance._estado_rollup = _estado_rollup(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Venta)
+def marcar_dia_venta(sender, instance, created, **kwargs):
+    anterior = None if created else getattr(instance, "_estado_rollup", None)
+    actual = _estado_rollup(instance)
+    instance._estado_rollup = actual
+    if anterior == actual:
+        return
+
+    fechas = set()
+    for fecha, estado, _ in filter(None, (anterior, actual)):
+        if estado == ESTADO_VALIDO and fecha is not None:
+            fechas.add(fecha_local(fecha))
+    if anterior is not None and None in anterior and actual[0] is not None:
+        # Estado anterior desconocido (campos diferidos): se marca el día actual
+        fechas.add(fecha_local(actual[0]))
+    if fechas:
+        empresa_id = instance.empresa_id
+        transaction.on_commit(lambda: marcar_dias(empresa_id, fechas))
+
+
+@receiver(post_delete, sender=Venta)
+def marcar_dia_venta_borrada(sender, instance, **kwargs):
+    if instance.estado == ESTADO_VALIDO:
+        empresa_id, fechas = instance.empresa_id, {fecha_local(instance.fecha)}
+        transaction.on_commit(lambda: marcar_dias(empresa_id, fechas))
@@ -1,3 +1,257 @@
-from django.test import TestCase
+from datetime import datetime
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from products.models import Categoria, Producto, SubCategoria
+from sucursales.models import Sucursal
+from tenants.models import Empresa
+from users.models import User
+from ventas.models import DetalleVenta, Venta
+
+from .insights import actualizar_insights
+from .models import InsightsVentas, VentaDiaria
+from .views import get_comparativo, get_historical_sales_summary, get_insights
+
+
+class VentasDeEjemploMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Historial", nit="HIST-001")
+        cls.usuario = User.objects.create_user(email="historial@test.com", password="x", empresa=cls.empresa)
+        cls.centro = Sucursal.objects.create(empresa=cls.empresa, nombre="Centro")
+        cls.norte = Sucursal.objects.create(empresa=cls.empresa, nombre="Norte")
+        categoria = Categoria.objects.create(empresa=cls.empresa, nombre="Audio")
+        subcategoria = SubCategoria.objects.create(empresa=cls.empresa, categoria=categoria, nombre="Parlantes")
+        cls.parlante = Producto.objects.create(
+            empresa=cls.empresa, nombre="Parlante", precio_venta=50, subcategoria=subcategoria
+        )
+        cls.cable = Producto.objects.create(empresa=cls.empresa, nombre="Cable", precio_venta=10)
+
+        # Venta con dos productos de la misma categoría: su total cuenta una sola vez
+        cls._venta("N-1", "2025-01-02", 110, cls.centro, "POS", [cls.parlante, cls.cable])
+        cls._venta("N-2", "2025-01-05", 40, cls.norte, "WEB", [cls.cable])
+        cls._venta("N-3", "2025-03-10", 50, cls.centro, "POS", [cls.parlante])
+
+    @classmethod
+    def _venta(cls, nota, fecha, total, sucursal, canal, productos):
+        venta = Venta.objects.create(
+            empresa=cls.empresa, numero_nota=nota, usuario=cls.usuario, sucursal=sucursal, canal=canal,
+            fecha=timezone.make_aware(datetime.fromisoformat(f"{fecha}T12:00")), total=total, estado="entregado",
+        )
+        for producto in productos:
+            DetalleVenta.objects.create(
+                empresa=cls.empresa, venta=venta, producto=producto, cantidad=1, precio_unitario=producto.precio_venta
+            )
+
+
+class HistorialVentasTests(VentasDeEjemploMixin, TestCase):
+    """Serie de ventas con todos los periodos del rango y sin sumar dos veces una venta."""
+
+    def _get(self, **params):
+        request = APIRequestFactory().get("/api/prediccion/historial/", params)
+        force_authenticate(request, user=self.usuario)
+        return get_historical_sales_summary(request)
+
+    def test_rellena_periodos_vacios(self):
+        response = self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-07")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["periodo"] for p in response.data][:3], ["2025-01-01", "2025-01-02", "2025-01-03"])
+        self.assertEqual(len(response.data), 7)
+        self.assertEqual(response.data[1]["total_vendido"], 110.0)
+        self.assertEqual(response.data[2]["numero_ventas"], 0)
+
+    def test_filtro_por_categoria_no_duplica_totales(self):
+        response = self._get(
+            fecha_inicio="2025-01-01", fecha_fin="2025-03-31", granularidad="mes",
+            categoria=self.parlante.subcategoria.categoria_id,
+        )
+        self.assertEqual(
+            [(p["periodo"], p["total_vendido"], p["numero_ventas"]) for p in response.data],
+            [("2025-01", 110.0, 1), ("2025-02", 0.0, 0), ("2025-03", 50.0, 1)],
+        )
+
+    def test_sin_fechas_usa_desde_la_primera_venta(self):
+        response = self._get(granularidad="trimestre")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0], {"periodo": "2025-Q1", "total_vendido": 200.0, "numero_ventas": 3})
+
+    def test_semanas_empiezan_el_lunes(self):
+        response = self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-12", granularidad="semana")
+        self.assertEqual(
+            [(p["periodo"], p["total_vendido"]) for p in response.data],
+            [("2024-12-30", 150.0), ("2025-01-06", 0.0)],
+        )
+
+    def test_varias_series(self):
+        response = self._get(fecha_inicio="2025-01-01", fecha_fin="2025-02-28", granularidad="mes", serie="canal")
+        series = {s["serie"]: [p["total_vendido"] for p in s["datos"]] for s in response.data}
+        self.assertEqual(series, {"POS": [110.0, 0.0], "WEB": [40.0, 0.0]})
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self._get(fecha_inicio="01/01/2025").status_code, 400)
+        self.assertEqual(self._get(granularidad="hora").status_code, 400)
+        self.assertEqual(self._get(serie="vendedor").status_code, 400)
+
+
+class ComparativoTests(VentasDeEjemploMixin, TestCase):
+    """Actual vs. periodo anterior vs. año pasado en una llamada, cacheado por empresa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Mismo periodo del año pasado y periodo anterior (diciembre)
+        cls._venta("N-4", "2024-01-03", 80, cls.centro, "POS", [cls.parlante])
+        cls._venta("N-5", "2024-12-20", 200, cls.norte, "WEB", [cls.cable])
+
+    def setUp(self):
+        cache.clear()
+
+    def _get(self, **params):
+        request = APIRequestFactory().get("/api/prediccion/comparativo/", params)
+        force_authenticate(request, user=self.usuario)
+        return get_comparativo(request)
+
+    def test_periodos_y_crecimiento(self):
+        response = self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-31")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["rangos"]["anterior"], {"inicio": "2024-12-01", "fin": "2024-12-31"})
+        totales = response.data["totales"]
+        self.assertEqual(totales["actual"], {"total": 150.0, "numero_ventas": 2, "ticket_promedio": 75.0})
+        self.assertEqual(totales["anterior"]["total"], 200.0)
+        self.assertEqual(totales["anio_anterior"]["total"], 80.0)
+        self.assertEqual(totales["crecimiento"]["vs_anterior"]["total"], -25.0)
+        self.assertEqual(totales["crecimiento"]["vs_anio_anterior"]["total"], 87.5)
+
+    def test_desgloses(self):
+        desglose = self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-31").data["desglose"]
+        canal = {f["nombre"]: f["actual"]["total"] for f in desglose["canal"]}
+        self.assertEqual(canal, {"POS": 110.0, "WEB": 40.0})
+        categoria = {f["nombre"]: f["actual"] for f in desglose["categoria"]}
+        # Categoría usa el subtotal de cada línea y cuenta ventas distintas
+        self.assertEqual(categoria["Audio"]["total"], 50.0)
+        self.assertEqual(categoria["Sin asignar"]["numero_ventas"], 2)
+
+    def test_cache_hasta_nueva_venta(self):
+        self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-31")
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-31")
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._venta("N-6", "2025-01-15", 10, self.centro, "POS", [self.cable])
+            # Antes del commit sigue la versión anterior (sin cachear datos a medias)
+            self.assertEqual(self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-31")
+                             .data["totales"]["actual"]["numero_ventas"], 2)
+        response = self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-31")
+        self.assertEqual(response.data["totales"]["actual"]["numero_ventas"], 3)
+
+    def test_una_consulta_por_dimension(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-31", desglose="sucursal,canal")
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+    def test_filtra_fecha_sin_castear_a_date(self):
+        # Una venta a las 23:30 locales del último día entra; el filtro compara
+        # `fecha` con datetimes (usa el índice) en lugar de fecha::date
+        venta = Venta.objects.get(numero_nota="N-2")
+        venta.fecha = timezone.make_aware(datetime(2025, 1, 31, 23, 30))
+        venta.save(update_fields=["fecha"])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-31")
+        self.assertEqual(response.data["totales"]["actual"]["numero_ventas"], 2)
+        sql = " ".join(q["sql"] for q in ctx.captured_queries).lower()
+        self.assertNotIn("cast_date", sql)
+        self.assertNotIn("::date", sql)
+
+    def test_serie_y_parametros_invalidos(self):
+        response = self._get(fecha_inicio="2025-01-01", fecha_fin="2025-01-31", serie="1")
+        self.assertEqual(len(response.data["serie"]["actual"]), 31)
+        self.assertEqual(len(response.data["serie"]["anterior"]), 31)
+        self.assertEqual(self._get(desglose="vendedor").status_code, 400)
+        self.assertEqual(self._get(fecha_inicio="2025-02-01", fecha_fin="2025-01-01").status_code, 400)
+
+
+@override_settings(INSIGHTS_MODO="sync")
+class InsightsTests(VentasDeEjemploMixin, TestCase):
+    """Insights desde el rollup diario, guardados y refrescados solo por días pendientes."""
+
+    def _get(self):
+        request = APIRequestFactory().get("/api/prediccion/insights/")
+        force_authenticate(request, user=self.usuario)
+        return get_insights(request)
+
+    def test_estacionalidad_desde_el_rollup(self):
+        datos = actualizar_insights(self.empresa.id)
+        # 2025-01-02 (jueves) a 2025-03-10: 68 días, 10 jueves
+        self.assertEqual(datos["periodo"]["dias"], 68)
+        self.assertEqual(datos["dia_fuerte"], {"dia": 5, "nombre": "Jueves", "promedio_bs": 11.0})
+        self.assertEqual(datos["mes_debil"]["nombre"], "Febrero")
+        self.assertEqual(datos["hora_fuerte"]["hora"], 12)
+        for valor in datos["fuerza_estacional"].values():
+            self.assertTrue(0 <= valor <= 100)
+        self.assertEqual(VentaDiaria.objects.filter(empresa=self.empresa).count(), 3)
+
+    def test_endpoint_lee_lo_guardado(self):
+        self.assertEqual(self._get().status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._get()
+        self.assertEqual(response.data["dia_debil"]["promedio_bs"], 0.0)
+        # Sin días pendientes no se vuelve a leer ninguna venta ni el rollup
+        tablas = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn('"venta"', tablas)
+        self.assertNotIn('"venta_diaria"', tablas)
+
+    @override_settings(INSIGHTS_REFRESCO=0)
+    def test_refresca_solo_dias_pendientes(self):
+        actualizar_insights(self.empresa.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._venta("N-7", "2025-03-10", 30, self.norte, "WEB", [self.cable])
+            # El día se marca al confirmar, no dentro de la transacción de la venta
+            self.assertFalse(VentaDiaria.objects.filter(pendiente=True).exists())
+        self.assertEqual(
+            list(VentaDiaria.objects.filter(pendiente=True).values_list("fecha", flat=True)),
+            [datetime(2025, 3, 10).date()],
+        )
+
+        datos = actualizar_insights(self.empresa.id)
+        self.assertFalse(VentaDiaria.objects.filter(pendiente=True).exists())
+        self.assertEqual(VentaDiaria.objects.get(fecha="2025-03-10").numero_ventas, 2)
+        self.assertEqual(datos["dia_fuerte"]["nombre"], "Jueves")
+
+        # Anular la única venta del domingo saca ese día del rollup
+        venta = Venta.objects.get(numero_nota="N-2")
+        venta.estado = "cancelado"
+        with self.captureOnCommitCallbacks(execute=True):
+            venta.save()
+        actualizar_insights(self.empresa.id)
+        self.assertFalse(VentaDiaria.objects.filter(fecha="2025-01-05").exists())
+
+    @override_settings(INSIGHTS_MODO="async", INSIGHTS_REFRESCO=0)
+    def test_endpoint_no_recalcula_en_el_request(self):
+        with patch("prediccion.insights.threading.Thread") as hilo:
+            # Primer acceso: 202 y el cálculo queda en un hilo aparte
+            self.assertEqual(self._get().status_code, 202)
+            hilo.assert_called_once()
+            self.assertFalse(InsightsVentas.objects.exists())
+
+            # Con datos guardados y días pendientes se responde con lo guardado
+            cache.clear()
+            guardados = actualizar_insights(self.empresa.id)
+            with self.captureOnCommitCallbacks(execute=True):
+                self._venta("N-8", "2025-03-10", 30, self.norte, "WEB", [self.cable])
+            response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, guardados)
+        self.assertEqual(hilo.call_count, 2)
+
+    def test_sin_ventas(self):
+        Venta.objects.all().delete()
+        actualizar_insights(self.empresa.id, completo=True)
+        self.assertEqual(InsightsVentas.objects.get(empresa=self.empresa).datos, {})
@@ -0,0 +1,202 @@
+# prediccion/timeseries.py
+# Series de tiempo de ventas con TODOS los periodos del rango (los vacíos en 0).
+#
+#  - Se agrega sobre ventas DISTINTAS: los filtros por producto/categoría van
+#    como subconsulta (venta_id IN ...), nunca como JOIN a detalles, así una
+#    venta con varios productos no suma su total más de una vez.
+#  - PostgreSQL: los periodos salen de generate_series y se hace LEFT JOIN con
+#    el agregado en la misma consulta.
+#  - Otros motores (SQLite en desarrollo/tests): el rango se arma con
+#    pandas.date_range y se une en Python.
+#  - Granularidad: dia | semana (lunes) | mes | trimestre.
+#  - Varias series a la vez con `serie`: "sucursal" o "canal".
+
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from ventas.models import DetalleVenta
+
+# granularidad -> (kind de Trunc/date_trunc, intervalo de Postgres, frecuencia de pandas)
+GRANULARIDADES = {
+    "dia": ("day", "1 day", "D"),
+    "semana": ("week", "1 week", "W-MON"),
+    "mes": ("month", "1 month", "MS"),
+    "trimestre": ("quarter", "3 months", "QS"),
+}
+
+# serie -> campo de Venta
+SERIES = {
+    "sucursal": "sucursal__nombre",
+    "canal": "canal",
+}
+
+
+class SerieTemporalError(ValueError):
+    pass
+
+
+# ===========================================
+# 🔵 Helpers de periodos
+# ===========================================
+def granularidad_automatica(inicio, fin):
+    """Día para rangos de hasta 90 días, mes para los más largos (comportamiento histórico)."""
+    return "dia" if (fin - inicio).days <= 90 else "mes"
+
+
+def inicio_periodo(fecha, granularidad):
+    if granularidad == "dia":
+        return fecha
+    if granularidad == "semana":
+        return fecha - timedelta(days=fecha.weekday())
+    if granularidad == "mes":
+        return fecha.replace(day=1)
+    return fecha.replace(month=3 * ((fecha.month - 1) // 3) + 1, day=1)
+
+
+def etiqueta_periodo(fecha, granularidad):
+    if granularidad == "mes":
+        return fecha.strftime("%Y-%m")
+    if granularidad == "trimestre":
+        return f"{fecha.year}-Q{(fecha.month - 1) // 3 + 1}"
+    return fecha.strftime("%Y-%m-%d")  # día, o lunes de la semana
+
+
+def _como_fecha(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def rango_datetime(inicio, fin):
+    """
+    [inicio 00:00, fin + 1 día 00:00) en la zona local. Filtrar `fecha` con
+    estos límites (y no con fecha__date) deja usar el índice (empresa, estado,
+    fecha): __date compila a (fecha AT TIME ZONE ...)::date.
+    """
+    desde = datetime.combine(inicio, time.min)
+    hasta = datetime.combine(fin + timedelta(days=1), time.min)
+    if settings.USE_TZ:
+        desde, hasta = timezone.make_aware(desde), timezone.make_aware(hasta)
+    return desde, hasta
+
+
+# ===========================================
+# 🔵 Consulta
+# ===========================================
+def filtrar_por_productos(ventas, producto_id=None, subcategoria_id=None, categoria_id=None):
+    """Filtra ventas que incluyen el producto/subcategoría/categoría sin duplicarlas."""
+    filtros = {}
+    if producto_id:
+        filtros["producto_id"] = producto_id
+    if subcategoria_id:
+        filtros["producto__subcategoria_id"] = subcategoria_id
+    if categoria_id:
+        filtros["producto__subcategoria__categoria_id"] = categoria_id
+    if not filtros:
+        return ventas
+
+    detalles = DetalleVenta.objects.using(ventas.db).filter(**filtros).values("venta_id")
+    return ventas.filter(pk__in=detalles)
+
+
+def _agregado(ventas, inicio, fin, granularidad, serie):
+    kind = GRANULARIDADES[granularidad][0]
+    desde, hasta = rango_datetime(inicio, fin)
+    qs = ventas.filter(fecha__gte=desde, fecha__lt=hasta).annotate(
+        periodo=Trunc("fecha", kind, output_field=DateField())
+    )
+    campos = ["periodo"]
+    if serie:
+        qs = qs.annotate(serie=F(SERIES[serie]))
+        campos.append("serie")
+    return qs.order_by().values(*campos).annotate(total=Sum("total"), numero=Count("id"))
+
+
+def _filas_postgres(agregado, inicio, fin, granularidad, serie):
+    kind, intervalo, _ = GRANULARIDADES[granularidad]
+    conexion = connections[agregado.db]
+    sql_agregado, params = agregado.query.get_compiler(using=agregado.db).as_sql()
+
+    if serie:
+        series = "SELECT DISTINCT serie FROM agregado"
+        union = "a.periodo = p.periodo AND a.serie IS NOT DISTINCT FROM s.serie"
+    else:
+        series = "SELECT NULL AS serie"
+        union = "a.periodo = p.periodo"
+
+    sql = f"""
+        WITH agregado AS ({sql_agregado}),
+        periodos AS (
+            SELECT generate_series(date_trunc(%s, %s::timestamp), %s::timestamp, %s::interval)::date AS periodo
+        ),
+        series AS ({series})
+        SELECT p.periodo, s.serie, COALESCE(a.total, 0), COALESCE(a.numero, 0)
+        FROM periodos p
+        CROSS JOIN series s
+        LEFT JOIN agregado a ON {union}
+        ORDER BY s.serie, p.periodo
+    """
+    with conexion.cursor() as cursor:
+        cursor.execute(sql, (*params, kind, inicio, fin, intervalo))
+        return cursor.fetchall()
+
+
+def _filas_pandas(agregado, inicio, fin, granularidad, serie):
+    frecuencia = GRANULARIDADES[granularidad][2]
+    periodos = [p.date() for p in pd.date_range(inicio_periodo(inicio, granularidad), fin, freq=frecuencia)]
+
+    datos = {}
+    for fila in agregado:
+        clave = (fila.get("serie"), _como_fecha(fila["periodo"]))
+        datos[clave] = (fila["total"], fila["numero"])
+
+    nombres = sorted({s for s, _ in datos}, key=lambda s: (s is None, str(s))) if serie else [None]
+    return [
+        (periodo, nombre, *datos.get((nombre, periodo), (0, 0)))
+        for nombre in nombres
+        for periodo in periodos
+    ]
+
+
+def serie_temporal(ventas, inicio, fin, granularidad="dia", serie=None):
+    """
+    Serie completa de [inicio, fin] para el QuerySet de ventas (ya filtrado
+    por empresa/estado/productos). Devuelve:
+      - sin `serie`: [{"periodo", "total_vendido", "numero_ventas"}, ...]
+      - con `serie`: [{"serie": nombre, "datos": [...]}, ...]
+    """
+    if granularidad not in GRANULARIDADES:
+        raise SerieTemporalError(f"granularidad debe ser una de: {', '.join(GRANULARIDADES)}")
+    if serie and serie not in SERIES:
+        raise SerieTemporalError(f"serie debe ser una de: {', '.join(SERIES)}")
+    if inicio > fin:
+        raise SerieTemporalError("fecha_inicio no puede ser posterior a fecha_fin")
+
+    agregado = _agregado(ventas, inicio, fin, granularidad, serie)
+    if connections[agregado.db].vendor == "postgresql":
+        filas = _filas_postgres(agregado, inicio, fin, granularidad, serie)
+    else:
+        filas = _filas_pandas(agregado, inicio, fin, granularidad, serie)
+
+    por_serie = {}
+    for periodo, nombre, total, numero in filas:
+        por_serie.setdefault(nombre, []).append({
+            "periodo": etiqueta_periodo(_como_fecha(periodo), granularidad),
+            "total_vendido": float(total or 0),
+            "numero_ventas": numero or 0,
+        })
+
+    if not serie:
+        return por_serie.get(None, [])
+    return [{"serie": nombre, "datos": datos} for nombre, datos in por_serie.items()]
+
+
+def parsear_fecha(valor, nombre):
+    try:
+        return date.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise SerieTemporalError(f"{nombre} debe tener el formato YYYY-MM-DD")
@@ -3,6 +3,7 @@ from .views import (
     get_sales_predictions,
     get_dashboard_kpis,
     get_historical_sales_summary,
+    get_comparativo,
     get_productos_baja_rotacion,
     get_sales_prediction_range_view,
     get_product_prediction_view,
@@ -16,6 +17,7 @@ urlpatterns = [
     path("predicciones/", get_sales_predictions),
     path("kpis/", get_dashboard_kpis),
     path("historial/", get_historical_sales_summary),
+    path("comparativo/", get_comparativo),
     path("baja-rotacion/", get_productos_baja_rotacion),
     # ENDPOINTS AVANZADOS
     path("pronostico-rango/", get_sales_prediction_range_view),
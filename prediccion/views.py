@@ -6,7 +6,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
-from django.db.models import Sum, Count, Q, F
+from django.db.models import Sum, Count, Q, F, Min
 from datetime import datetime, timedelta
 
 from ventas.models import Venta, DetalleVenta
@@ -19,6 +19,20 @@ from .ml_service import (
     get_global_trends 
 )
 from .serializers import ProductoBajaRotacionSerializer
+from .comparativo import DESGLOSES, comparativo_cacheado
+from .insights import obtener_insights
+from .timeseries import (
+    SerieTemporalError,
+    filtrar_por_productos,
+    granularidad_automatica,
+    parsear_fecha,
+    serie_temporal,
+)
+from rest_framework.permissions import IsAuthenticated
+from tenants.quotas import requiere_funcion
+from rest_framework.decorators import throttle_classes
+from utils.replica import db_analitica
+from utils.throttling import con_semaforo, tasa_por_scope
 # from usuario.permissions import IsAdminOrVendedor
 
 
@@ -69,8 +83,10 @@ def get_dashboard_kpis(request):
     empresa = request.user.empresa
     hoy = timezone.now().date()
 
+    db = db_analitica(request)
+
     try:
-        ventas_validas = Venta.objects.filter(
+        ventas_validas = Venta.objects.using(db).filter(
             empresa=empresa,
             estado="entregado"   # <-- tu estado real
         )
@@ -81,7 +97,7 @@ def get_dashboard_kpis(request):
             fecha__date=hoy
         ).aggregate(sum=Sum("total"))["sum"] or 0
 
-        total_productos = Producto.objects.filter(
+        total_productos = Producto.objects.using(db).filter(
             empresa=empresa,
             esta_activo=True
         ).count()
@@ -105,106 +121,49 @@ def get_dashboard_kpis(request):
 
 @api_view(["GET"])
 def get_historical_sales_summary(request):
-    from datetime import datetime, timedelta
-    from django.db.models.functions import TruncMonth, TruncDay
-    from django.db.models import Sum, Count
-
+    """
+    Ventas por periodo con todos los periodos del rango (vacíos en 0).
+    Parámetros: fecha_inicio, fecha_fin (YYYY-MM-DD, opcionales),
+    granularidad (dia | semana | mes | trimestre; por defecto según el rango),
+    serie (sucursal | canal) y producto / subcategoria / categoria.
+    """
     empresa = request.user.empresa
+    params = request.query_params
 
-    fecha_inicio = request.query_params.get("fecha_inicio")
-    fecha_fin = request.query_params.get("fecha_fin")
-
-    producto_id = request.query_params.get("producto") or request.query_params.get("producto_id")
-    subcategoria_id = request.query_params.get("subcategoria") or request.query_params.get("subcategoria_id")
-    categoria_id = request.query_params.get("categoria") or request.query_params.get("categoria_id")
+    producto_id = params.get("producto") or params.get("producto_id")
+    subcategoria_id = params.get("subcategoria") or params.get("subcategoria_id")
+    categoria_id = params.get("categoria") or params.get("categoria_id")
 
     # -------------------------
-    # 1. QUERY BASE
+    # 1. VENTAS DISTINTAS (filtros de producto por subconsulta)
     # -------------------------
-    qs = Venta.objects.filter(
+    qs = Venta.objects.using(db_analitica(request)).filter(
         empresa=empresa,
         estado="entregado",
     )
+    qs = filtrar_por_productos(qs, producto_id, subcategoria_id, categoria_id)
 
     # -------------------------
-    # 2. FILTROS FECHAS
-    # -------------------------
-    if fecha_inicio:
-        qs = qs.filter(fecha__date__gte=fecha_inicio)
-    if fecha_fin:
-        qs = qs.filter(fecha__date__lte=fecha_fin)
-
-    # -------------------------
-    # 3. FILTROS PRODUCTO / CATEGORÍA
-    # -------------------------
-    if producto_id:
-        qs = qs.filter(detalles__producto_id=producto_id)
-
-    if subcategoria_id:
-        qs = qs.filter(detalles__producto__subcategoria_id=subcategoria_id)
-
-    if categoria_id:
-        qs = qs.filter(detalles__producto__subcategoria__categoria_id=categoria_id)
-
-    # -------------------------
-    # 4. DEFINIR SI AGRUPAR DÍA O MES
+    # 2. RANGO (sin fechas: desde la primera venta hasta hoy)
     # -------------------------
-    if fecha_inicio and fecha_fin:
-        rango_dias = (
-            datetime.strptime(fecha_fin, "%Y-%m-%d")
-            - datetime.strptime(fecha_inicio, "%Y-%m-%d")
-        ).days
-        agrupar_por_dia = rango_dias <= 90
-    else:
-        agrupar_por_dia = False
-
-    trunc = TruncDay("fecha") if agrupar_por_dia else TruncMonth("fecha")
-    formato = "%Y-%m-%d" if agrupar_por_dia else "%Y-%m"
-
-    # -------------------------
-    # 5. CONSULTA AGRUPADA REAL
-    # -------------------------
-    qs = qs.annotate(periodo=trunc).values("periodo").annotate(
-        total_ventas=Sum("total"),
-        numero_ventas=Count("id")
-    ).order_by("periodo")
-
-    ventas_dict = {
-        item["periodo"].strftime(formato): {
-            "total_vendido": float(item["total_ventas"]),
-            "numero_ventas": item["numero_ventas"]
-        }
-        for item in qs
-    }
-
-    # -------------------------
-    # 6. RELLENAR MESES / DÍAS VACÍOS
-    # -------------------------
-    resultado = []
-
-    inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d")
-    fin = datetime.strptime(fecha_fin, "%Y-%m-%d")
-
-    cursor = inicio
+    try:
+        fecha_fin = parsear_fecha(params["fecha_fin"], "fecha_fin") if params.get("fecha_fin") else timezone.localdate()
+        if params.get("fecha_inicio"):
+            fecha_inicio = parsear_fecha(params["fecha_inicio"], "fecha_inicio")
+        else:
+            primera = qs.aggregate(primera=Min("fecha"))["primera"]
+            if primera is None:
+                return Response([])
+            fecha_inicio = timezone.localtime(primera).date()
 
-    while cursor <= fin:
-        clave = cursor.strftime(formato)
+        granularidad = params.get("granularidad") or granularidad_automatica(fecha_inicio, fecha_fin)
 
-        resultado.append({
-            "periodo": clave,
-            "total_vendido": ventas_dict.get(clave, {}).get("total_vendido", 0),
-            "numero_ventas": ventas_dict.get(clave, {}).get("numero_ventas", 0)
-        })
-
-        # avanzar día o mes
-        if agrupar_por_dia:
-            cursor += timedelta(days=1)
-        else:
-            # sumar 1 mes correctamente
-            if cursor.month == 12:
-                cursor = cursor.replace(year=cursor.year + 1, month=1)
-            else:
-                cursor = cursor.replace(month=cursor.month + 1)
+        # -------------------------
+        # 3. SERIE COMPLETA (generate_series / rango de fechas)
+        # -------------------------
+        resultado = serie_temporal(qs, fecha_inicio, fecha_fin, granularidad, params.get("serie"))
+    except SerieTemporalError as e:
+        return Response({"error": str(e)}, status=400)
 
     return Response(resultado)
 
@@ -262,6 +221,53 @@ def get_historical_sales_summary(request):
 
 #     return Response(data)
 
+# ============================================================
+# 📊 COMPARATIVO (ACTUAL vs ANTERIOR vs AÑO PASADO)
+# ============================================================
+
+@api_view(["GET"])
+def get_comparativo(request):
+    """
+    Periodo actual, periodo anterior y mismo periodo del año pasado, con
+    crecimiento y desglose. Parámetros: fecha_inicio / fecha_fin (por defecto
+    los últimos 30 días), desglose ("sucursal,canal,categoria") y serie=1
+    para incluir la serie diaria/mensual del periodo actual y del anterior.
+    """
+    empresa_id = request.user.empresa_id
+    params = request.query_params
+
+    try:
+        fecha_fin = parsear_fecha(params["fecha_fin"], "fecha_fin") if params.get("fecha_fin") else timezone.localdate()
+        fecha_inicio = (
+            parsear_fecha(params["fecha_inicio"], "fecha_inicio")
+            if params.get("fecha_inicio") else fecha_fin - timedelta(days=29)
+        )
+        if fecha_inicio > fecha_fin:
+            raise SerieTemporalError("fecha_inicio no puede ser posterior a fecha_fin")
+    except SerieTemporalError as e:
+        return Response({"error": str(e)}, status=400)
+
+    desgloses = tuple(d.strip() for d in params.get("desglose", ",".join(DESGLOSES)).split(",") if d.strip())
+    invalidos = [d for d in desgloses if d not in DESGLOSES]
+    if invalidos:
+        return Response({"error": f"desglose debe ser uno de: {', '.join(DESGLOSES)}"}, status=400)
+
+    db = db_analitica(request)
+    extra = None
+    if params.get("serie") in ("1", "true"):
+        def extra():
+            ventas = Venta.objects.using(db).filter(empresa_id=empresa_id, estado="entregado")
+            granularidad = granularidad_automatica(fecha_inicio, fecha_fin)
+            dias = fecha_fin - fecha_inicio
+            anterior_fin = fecha_inicio - timedelta(days=1)
+            return {"serie": {
+                "granularidad": granularidad,
+                "actual": serie_temporal(ventas, fecha_inicio, fecha_fin, granularidad),
+                "anterior": serie_temporal(ventas, anterior_fin - dias, anterior_fin, granularidad),
+            }}
+
+    return Response(comparativo_cacheado(empresa_id, fecha_inicio, fecha_fin, desgloses, db, extra))
+
 # ============================================================
 # ░█▀█░█▀▀░█▀█░█▀█░█▀█░█▀█░█▄█░▀█▀░█▀█░█▀█░█▀▄░█▀▀
 # =============== BAJA ROTACIÓN ===============================
@@ -281,7 +287,7 @@ def get_productos_baja_rotacion(request):
     categoria = request.query_params.get("categoria")
     producto = request.query_params.get("producto")
 
-    productos = Producto.objects.filter(
+    productos = Producto.objects.using(db_analitica(request)).filter(
         empresa=empresa,
         esta_activo=True
     )
@@ -320,6 +326,7 @@ def get_productos_baja_rotacion(request):
 
 
 @api_view(["GET"])
+@permission_classes([IsAuthenticated, requiere_funcion("prediccion_ventas")])
 def get_sales_predictions(request):
     empresa = request.user.empresa
 
@@ -362,7 +369,7 @@ def get_sales_predictions(request):
     # ===========================
     from ventas.models import Venta
 
-    ventas_qs = Venta.objects.filter(
+    ventas_qs = Venta.objects.using(db_analitica(request)).filter(
         empresa=empresa,
         estado="entregado"
     )
@@ -417,6 +424,7 @@ def get_sales_predictions(request):
 
 
 @api_view(["GET"])
+@permission_classes([IsAuthenticated, requiere_funcion("prediccion_ventas")])
 def get_product_prediction_view(request):
     empresa = request.user.empresa
     producto_id = request.query_params.get("producto")
@@ -437,6 +445,7 @@ def get_product_prediction_view(request):
     return Response(data)
 
 @api_view(["GET"])
+@permission_classes([IsAuthenticated, requiere_funcion("prediccion_ventas")])
 def get_trends_view(request):
     empresa = request.user.empresa
     dias = int(request.query_params.get("dias", 60))
@@ -454,7 +463,7 @@ def get_trends_view(request):
     desde = timezone.now() - timedelta(days=dias)
 
     ranking_qs = (
-        DetalleVenta.objects
+        DetalleVenta.objects.using(db_analitica(request))
         .filter(
             empresa=empresa,
             venta__estado="entregado",
@@ -482,6 +491,7 @@ def get_trends_view(request):
     })
 
 @api_view(["GET"])
+@permission_classes([IsAuthenticated, requiere_funcion("prediccion_ventas")])
 def get_sales_prediction_range_view(request):
     empresa = request.user.empresa
     fecha_inicio = request.query_params.get("inicio")
@@ -501,134 +511,36 @@ def get_sales_prediction_range_view(request):
         "metadata": metadata
     })
 
-@api_view(["GET"])
-def get_ia_insights(request):
-    empresa = request.user.empresa
-
-    df = prepare_data(empresa)
-    if df is None:
-        return Response({"error": "No hay datos suficientes."}, 404)
-
-    weekly_avg = df.groupby("dia_de_la_semana")["total"].mean().round(2)
-    monthly_avg = df.groupby("mes")["total"].mean().round(2)
-
-    # Día fuerte / débil
-    dia_fuerte = weekly_avg.idxmax()
-    dia_debil = weekly_avg.idxmin()
-
-    # Mes fuerte / débil
-    mes_fuerte = monthly_avg.idxmax()
-    mes_debil = monthly_avg.idxmin()
-
-    # Variabilidad
-    var_total = df["total"].var()
-    var_mes = monthly_avg.var()
-
-    porcentaje_estacionalidad = round((var_mes / var_total) * 100, 2) if var_total > 0 else 0
-
-    return Response({
-        "dia_fuerte": {
-            "nombre": DAY_MAP[dia_fuerte],
-            "promedio_bs": float(weekly_avg[dia_fuerte])
-        },
-        "dia_debil": {
-            "nombre": DAY_MAP[dia_debil],
-            "promedio_bs": float(weekly_avg[dia_debil])
-        },
-        "mes_fuerte": {
-            "nombre": MONTH_MAP[mes_fuerte],
-            "promedio_bs": float(monthly_avg[mes_fuerte])
-        },
-        "mes_debil": {
-            "nombre": MONTH_MAP[mes_debil],
-            "promedio_bs": float(monthly_avg[mes_debil])
-        },
-        "estacionalidad": porcentaje_estacionalidad,
-    })
-
 # ============================================================
 # 🔮 INSIGHTS GLOBALES (ESTACIONALIDAD, DIA FUERTE, MES FUERTE)
 # ============================================================
-@api_view(["GET"])
-def get_insights(request):
-    from django.db.models.functions import ExtractWeekDay, ExtractMonth
-    empresa = request.user.empresa
-
-    # Obtener todas las ventas "entregadas"
-    ventas = Venta.objects.filter(
-        empresa=empresa,
-        estado="entregado"
-    )
-
-    if not ventas.exists():
+# Ambos endpoints leen el resultado guardado del motor de insights
+# (prediccion/insights.py); no recorren las ventas en cada request.
+def _respuesta_insights(request):
+    datos = obtener_insights(request.user.empresa_id)
+    if datos is None:
+        # Primer cálculo en curso (hilo aparte)
+        return Response({"detail": "Calculando insights, intente de nuevo en unos segundos."}, 202)
+    if not datos:
         return Response({"error": "No hay ventas suficientes"}, 404)
+    return Response(datos)
 
-    # ------------------------------------------------------------
-    # 1) Promedio por día de la semana
-    # ------------------------------------------------------------
-    dias_semana = ventas.annotate(
-        dia=ExtractWeekDay("fecha")  # 1 Domingo ... 7 Sábado
-    ).values("dia").annotate(
-        promedio=Sum("total") / Count("id")
-    ).order_by("dia")
-
-    # Formatear nombres
-    DIAS = {
-        1: "Domingo", 2: "Lunes", 3: "Martes", 4: "Miércoles",
-        5: "Jueves", 6: "Viernes", 7: "Sábado"
-    }
-
-    dias_format = [
-        {"dia": d["dia"], "nombre": DIAS[d["dia"]], "promedio_bs": float(d["promedio"])}
-        for d in dias_semana
-    ]
-
-    dia_fuerte = max(dias_format, key=lambda x: x["promedio_bs"])
-    dia_debil = min(dias_format, key=lambda x: x["promedio_bs"])
-
-    # ------------------------------------------------------------
-    # 2) Promedio por mes
-    # ------------------------------------------------------------
-    meses = ventas.annotate(
-        mes=ExtractMonth("fecha")
-    ).values("mes").annotate(
-        promedio=Sum("total") / Count("id")
-    ).order_by("mes")
-
-    MESES = {
-        1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril",
-        5: "Mayo", 6: "Junio", 7: "Julio", 8: "Agosto",
-        9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-    }
-
-    meses_format = [
-        {"mes": m["mes"], "nombre": MESES[m["mes"]], "promedio_bs": float(m["promedio"])}
-        for m in meses
-    ]
 
-    mes_fuerte = max(meses_format, key=lambda x: x["promedio_bs"])
-    mes_debil = min(meses_format, key=lambda x: x["promedio_bs"])
-
-    # ------------------------------------------------------------
-    # 3) Estacionalidad (qué % explican día + mes)
-    # ------------------------------------------------------------
-    promedio_dias = [d["promedio_bs"] for d in dias_format]
-    promedio_meses = [m["promedio_bs"] for m in meses_format]
-
-    var_dias = max(promedio_dias) - min(promedio_dias)
-    var_meses = max(promedio_meses) - min(promedio_meses)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, requiere_funcion("permite_reportes_ia")])
+def get_ia_insights(request):
+    return _respuesta_insights(request)
 
-    estacionalidad = round((var_dias + var_meses) / 2, 2)
 
-    return Response({
-        "dia_fuerte": dia_fuerte,
-        "dia_debil": dia_debil,
-        "mes_fuerte": mes_fuerte,
-        "mes_debil": mes_debil,
-        "estacionalidad": estacionalidad
-    })
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, requiere_funcion("permite_reportes_ia")])
+def get_insights(request):
+    return _respuesta_insights(request)
 
 @api_view(["POST"])
+@permission_classes([IsAuthenticated, requiere_funcion("prediccion_ventas")])
+@throttle_classes([tasa_por_scope("ml")])
+@con_semaforo("ml")
 def retrain_model(request):
     empresa = request.user.empresa
     ok = train_sales_model(empresa)
@@ -1,7 +1,12 @@
 # products/apps.py 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from . import signals
+        post_migrate.connect(signals.recrear_indices_busqueda, sender=self)
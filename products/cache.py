@@ -0,0 +1,121 @@
+# products/cache.py
+# Cache de respuestas del catálogo público (marcas, categorías, productos...).
+#
+# Cada empresa tiene una "versión" de catálogo en el cache. Las claves de las
+# respuestas incluyen esa versión, así que invalidar = cambiar la versión
+# (ver products/signals.py). Las entradas viejas simplemente expiran.
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+# Empresa que ve un visitante anónimo de la tienda
+EMPRESA_PUBLICA_ID = 1
+
+
+def _timeout():
+    return getattr(settings, "CATALOGO_CACHE_TIMEOUT", 300)
+
+
+def cache_activo():
+    """False sin cache compartido entre workers (ver CATALOGO_CACHE_ACTIVO)."""
+    return getattr(settings, "CATALOGO_CACHE_ACTIVO", True)
+
+
+def _version_key(empresa_id):
+    return f"catalogo:version:{empresa_id}"
+
+
+def obtener_version_catalogo(empresa_id):
+    """Devuelve {'v': <versión>, 'ts': <última modificación (epoch)>}."""
+    version = cache.get(_version_key(empresa_id))
+    if version is None:
+        version = {"v": time.time_ns(), "ts": int(time.time())}
+        cache.add(_version_key(empresa_id), version, timeout=None)
+        version = cache.get(_version_key(empresa_id), version)
+    return version
+
+
+def invalidar_catalogo(empresa_id):
+    """Descarta todas las respuestas cacheadas del catálogo de una empresa."""
+    cache.set(
+        _version_key(empresa_id),
+        {"v": time.time_ns(), "ts": int(time.time())},
+        timeout=None,
+    )
+
+
+def empresa_del_request(request):
+    """Misma regla que los get_queryset del catálogo: la empresa del usuario o la pública."""
+    user = getattr(request, "user", None)
+    if user and user.is_authenticated:
+        return user.empresa_id
+    return EMPRESA_PUBLICA_ID
+
+
+class CatalogoCacheMixin:
+    """
+    Cachea list/retrieve por (empresa, versión de catálogo, endpoint, parámetros)
+    y responde 304 con ETag / Last-Modified cuando el cliente ya tiene la versión.
+    Debe ir ANTES de SoftDeleteViewSet en la herencia.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._respuesta_cacheada(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._respuesta_cacheada(super().retrieve, request, *args, **kwargs)
+
+    def _clave_cache(self, request, empresa_id, version, kwargs):
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        base = f"{self.basename}:{self.action}:{kwargs.get(self.lookup_field, '')}:{params}"
+        digest = hashlib.md5(base.encode("utf-8")).hexdigest()
+        return f"catalogo:{empresa_id}:{version['v']}:{digest}"
+
+    def _no_modificado(self, request, entrada):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match:
+            etags = [e.strip() for e in if_none_match.split(",")]
+            return entrada["etag"] in etags or "*" in etags
+        if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+        return if_modified_since is not None and entrada["ts"] <= if_modified_since
+
+    def _respuesta_cacheada(self, handler, request, *args, **kwargs):
+        empresa_id = empresa_del_request(request)
+        # Usuarios sin empresa (SUPER_ADMIN): ninguna señal invalidaría su clave
+        if empresa_id is None or not cache_activo():
+            return handler(request, *args, **kwargs)
+        version = obtener_version_catalogo(empresa_id)
+        clave = self._clave_cache(request, empresa_id, version, kwargs)
+
+        entrada = cache.get(clave)
+        if entrada is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            contenido = JSONRenderer().render(response.data)
+            entrada = {
+                "data": response.data,
+                "etag": quote_etag(hashlib.md5(contenido).hexdigest()),
+                "ts": version["ts"],
+            }
+            cache.set(clave, entrada, timeout=_timeout())
+
+        if self._no_modificado(request, entrada):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(entrada["data"])
+
+        response["ETag"] = entrada["etag"]
+        response["Last-Modified"] = http_date(entrada["ts"])
+        response["Cache-Control"] = "private, max-age=0, must-revalidate"
+        patch_vary_headers(response, ("Authorization",))
+        return response
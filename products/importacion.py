@@ -0,0 +1,295 @@
+# products/importacion.py
+# Importación masiva del catálogo (CSV / XLSX).
+#
+#  - El archivo se lee en streaming (csv.DictReader / openpyxl read_only).
+#  - Marca, categoría y subcategoría se resuelven por nombre con un cache en
+#    memoria precargado en una consulta (las que faltan se crean una sola vez).
+#  - Los SKU se reservan en bloque por lote y Producto / DetalleProducto /
+#    StockSucursal se insertan con bulk_create.
+#
+# Columnas: nombre, precio_venta, descripcion, sku, marca, categoria, subcategoria,
+#           potencia, velocidades, voltaje, aire_frio, tecnologias, largo_cable,
+#           sucursal, stock
+
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+
+from sucursales.models import StockSucursal, Sucursal
+from tenants import quotas
+from tenants.models import Empresa
+from utils.exceptions import PlanLimitException
+from .cache import invalidar_catalogo
+from .models import Categoria, DetalleProducto, Marca, Producto, SubCategoria
+from .search import construir_texto_busqueda, normalizar_texto
+
+CHUNK_SIZE = 1000
+MAXIMO_ENTERO = 2 ** 63 - 1  # bigint de la base
+
+CAMPOS_DETALLE = ["potencia", "velocidades", "voltaje", "aire_frio", "tecnologias", "largo_cable"]
+
+
+# ===========================================
+# 🔵 Lectura en streaming
+# ===========================================
+def _limpiar(fila):
+    return {
+        str(k).strip().lower(): (str(v).strip() if v is not None else "")
+        for k, v in fila.items()
+        if k is not None
+    }
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    for fila in csv.DictReader(texto):
+        yield _limpiar(fila)
+
+
+def _filas_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = [str(c or "").strip().lower() for c in next(filas, [])]
+        for valores in filas:
+            if not any(v not in (None, "") for v in valores):
+                continue
+            yield _limpiar(dict(zip(encabezados, valores)))
+    finally:
+        libro.close()
+
+
+def leer_catalogo(archivo, nombre_archivo):
+    """Iterador de filas (dicts) de un archivo binario .csv o .xlsx."""
+    if nombre_archivo.lower().endswith((".xlsx", ".xlsm")):
+        return _filas_xlsx(archivo)
+    return _filas_csv(archivo)
+
+
+# ===========================================
+# 🔵 Cache de marcas / categorías / subcategorías
+# ===========================================
+class ResolutorCatalogo:
+    """Busca (o crea) marcas y (sub)categorías por nombre sin repetir consultas."""
+
+    def __init__(self, empresa):
+        self.empresa = empresa
+        self.marcas = {normalizar_texto(m.nombre): m for m in Marca.objects.filter(empresa=empresa)}
+        self.categorias = {normalizar_texto(c.nombre): c for c in Categoria.objects.filter(empresa=empresa)}
+        self.subcategorias = {
+            normalizar_texto(s.nombre): s
+            for s in SubCategoria.objects.filter(empresa=empresa).select_related("categoria")
+        }
+
+    def marca(self, nombre):
+        if not nombre:
+            return None
+        clave = normalizar_texto(nombre)
+        if clave not in self.marcas:
+            self.marcas[clave] = Marca.objects.create(empresa=self.empresa, nombre=nombre)
+        return self.marcas[clave]
+
+    def categoria(self, nombre):
+        if not nombre:
+            return None
+        clave = normalizar_texto(nombre)
+        if clave not in self.categorias:
+            self.categorias[clave] = Categoria.objects.create(empresa=self.empresa, nombre=nombre)
+        return self.categorias[clave]
+
+    def subcategoria(self, nombre, categoria_nombre):
+        if not nombre:
+            return None
+        clave = normalizar_texto(nombre)
+        if clave not in self.subcategorias:
+            categoria = self.categoria(categoria_nombre)
+            if categoria is None:
+                raise ValueError(f"La subcategoría '{nombre}' no existe y no se indicó su categoría")
+            self.subcategorias[clave] = SubCategoria.objects.create(
+                empresa=self.empresa, categoria=categoria, nombre=nombre
+            )
+        return self.subcategorias[clave]
+
+
+# ===========================================
+# 🔵 Importación por lotes
+# ===========================================
+def _entero(valor):
+    """int, o None si viene vacío. "2.7" es un error: nunca se trunca."""
+    if valor is None or valor == "":
+        return None
+    try:
+        numero = Decimal(str(valor).strip())
+    except InvalidOperation:
+        raise ValueError("stock debe ser un número entero")
+    if not numero.is_finite() or numero != numero.to_integral_value() or abs(numero) > MAXIMO_ENTERO:
+        raise ValueError("stock debe ser un número entero")
+    return int(numero)
+
+
+def _lotes(iterable, tamanio):
+    iterador = iter(iterable)
+    while True:
+        lote = list(islice(iterador, tamanio))
+        if not lote:
+            return
+        yield lote
+
+
+def _skus_libres(empresa, cantidad, ocupados):
+    """
+    SKUs generados (reservar_skus) que no chocan con los SKU del archivo ni con
+    los ya guardados: un SKU escrito a mano puede coincidir con uno generado.
+    """
+    extra = len(ocupados)
+    while True:
+        candidatos = Producto.reservar_skus(empresa, cantidad + extra)
+        usados = ocupados | set(
+            Producto.objects.filter(empresa=empresa, sku__in=candidatos).values_list("sku", flat=True)
+        )
+        libres = [sku for sku in candidatos if sku not in usados]
+        if len(libres) >= cantidad:
+            return libres[:cantidad]
+        extra += cantidad - len(libres)
+
+
+def _importar_lote(empresa, lote, inicio, resolutor, sucursales, errores):
+    # SKUs que ya existen (una consulta por lote)
+    skus_archivo = {f.get("sku") for f in lote if isinstance(f, dict) and f.get("sku")}
+    existentes = set(
+        Producto.objects.filter(empresa=empresa, sku__in=skus_archivo).values_list("sku", flat=True)
+    )
+
+    validas = []
+    for num, fila in enumerate(lote, start=inicio):
+        if not isinstance(fila, dict):
+            errores.append({"fila": num, "sku": None, "error": "La fila debe ser un objeto"})
+            continue
+        try:
+            if not fila.get("nombre"):
+                raise ValueError("El nombre es obligatorio")
+            if fila.get("sku") in existentes:
+                raise ValueError("El SKU ya existe")
+            try:
+                precio = Decimal(fila.get("precio_venta") or 0)
+            except InvalidOperation:
+                raise ValueError("precio_venta inválido")
+            stock = _entero(fila.get("stock"))
+            if stock is not None and stock < 0:
+                raise ValueError("El stock no puede ser negativo")
+            sucursal_id = None
+            if stock is not None:
+                sucursal_id = sucursales.get(normalizar_texto(fila.get("sucursal")))
+                if sucursal_id is None:
+                    raise ValueError("Sucursal no encontrada")
+
+            producto = Producto(
+                empresa=empresa,
+                nombre=fila["nombre"],
+                descripcion=fila.get("descripcion") or None,
+                sku=fila.get("sku") or None,
+                precio_venta=precio,
+                marca=resolutor.marca(fila.get("marca")),
+                subcategoria=resolutor.subcategoria(fila.get("subcategoria"), fila.get("categoria")),
+            )
+        except (ValueError, TypeError) as e:
+            errores.append({"fila": num, "sku": fila.get("sku"), "error": str(e)})
+            continue
+        if producto.sku:
+            existentes.add(producto.sku)
+        validas.append((num, fila, producto, sucursal_id, stock))
+
+    if not validas:
+        return 0
+
+    # Cupo de productos del plan: el lote entero o nada
+    quotas.verificar_cupo(empresa.id, "productos", len(validas))
+
+    try:
+        with transaction.atomic():
+            # Bloquea la empresa: dos importaciones simultáneas no reciben el mismo bloque de SKUs
+            Empresa.objects.select_for_update().filter(id=empresa.id).exists()
+            sin_sku = [p for _, _, p, _, _ in validas if not p.sku]
+            if sin_sku:
+                ocupados = {p.sku for _, _, p, _, _ in validas if p.sku}
+                for producto, sku in zip(sin_sku, _skus_libres(empresa, len(sin_sku), ocupados)):
+                    producto.sku = sku
+
+            # bulk_create no pasa por save(): el texto de búsqueda se arma aquí
+            for _, _, producto, _, _ in validas:
+                producto.texto_busqueda = construir_texto_busqueda(producto)
+            Producto.objects.bulk_create([p for _, _, p, _, _ in validas], batch_size=CHUNK_SIZE)
+
+            detalles = []
+            stocks = []
+            for _, fila, producto, sucursal_id, stock in validas:
+                datos_detalle = {c: fila[c] for c in CAMPOS_DETALLE if fila.get(c)}
+                if datos_detalle:
+                    detalles.append(DetalleProducto(producto=producto, empresa=empresa, **datos_detalle))
+                if sucursal_id is not None:
+                    stocks.append(StockSucursal(
+                        empresa=empresa, producto=producto, sucursal_id=sucursal_id, stock=stock
+                    ))
+            DetalleProducto.objects.bulk_create(detalles, batch_size=CHUNK_SIZE)
+            StockSucursal.objects.bulk_create(stocks, batch_size=CHUNK_SIZE)
+            # bulk_create no dispara las señales que llevan el contador
+            quotas.incrementar(empresa.id, "productos", len(validas))
+    except IntegrityError:
+        # Un producto guardado en paralelo (Producto.save no bloquea la empresa)
+        # tomó un SKU del lote: el lote se descarta y se informa como las demás filas
+        for num, fila, _, _, _ in validas:
+            errores.append({
+                "fila": num, "sku": fila.get("sku"),
+                "error": "Conflicto de SKU con otro producto guardado al mismo tiempo; reintente la fila",
+            })
+        return 0
+
+    return len(validas)
+
+
+def importar_catalogo(empresa, filas, chunk_size=CHUNK_SIZE, progreso=None):
+    """
+    Importa productos (con ficha técnica y stock inicial opcionales).
+
+    `filas` puede ser cualquier iterable de dicts (p. ej. leer_catalogo(...)).
+    `progreso(procesadas, creados)` se llama al terminar cada lote.
+    Cada lote es una transacción: un error de base de datos no deshace los anteriores.
+    """
+    resolutor = ResolutorCatalogo(empresa)
+    sucursales = {}
+    for pk, nombre in Sucursal.objects.filter(empresa=empresa).values_list("id", "nombre"):
+        sucursales[str(pk)] = pk
+        sucursales[normalizar_texto(nombre)] = pk
+
+    errores = []
+    procesadas = 0
+    creados = 0
+    for lote in _lotes(filas, chunk_size):
+        try:
+            creados += _importar_lote(empresa, lote, procesadas + 1, resolutor, sucursales, errores)
+        except PlanLimitException as e:
+            # Los lotes anteriores quedan; el resto no entra en el plan
+            errores.append({"fila": procesadas + 1, "sku": None, "error": str(e.detail)})
+            break
+        procesadas += len(lote)
+        if progreso:
+            progreso(procesadas, creados)
+
+    # bulk_create no dispara señales: se invalida el cache del catálogo a mano
+    if creados:
+        invalidar_catalogo(empresa.id)
+
+    return {"filas": procesadas, "creados": creados, "errores": errores}
+
+
+def resumen_bitacora(reporte, origen):
+    """Texto para el único registro de bitácora de la importación."""
+    return (
+        f"Importó catálogo desde {origen}: {reporte['creados']}/{reporte['filas']} productos creados, "
+        f"{len(reporte['errores'])} filas con error"
+    )
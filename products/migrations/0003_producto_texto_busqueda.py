@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+from products.search import (
+    normalizar_texto,
+    POSTGRES_INDICES,
+    POSTGRES_INDICES_REVERSE,
+    SQLITE_INDICES,
+    SQLITE_INDICES_REVERSE,
+)
+
+
+def poblar_texto_busqueda(apps, schema_editor):
+    Producto = apps.get_model("products", "Producto")
+    lote = []
+    qs = Producto.objects.using(schema_editor.connection.alias).select_related(
+        "marca", "subcategoria__categoria"
+    )
+    for p in qs.iterator(chunk_size=500):
+        partes = [p.nombre, p.sku, p.descripcion]
+        if p.marca:
+            partes.append(p.marca.nombre)
+        if p.subcategoria:
+            partes += [p.subcategoria.nombre, p.subcategoria.categoria.nombre]
+        p.texto_busqueda = normalizar_texto(" ".join(x for x in partes if x))
+        lote.append(p)
+        if len(lote) >= 500:
+            Producto.objects.bulk_update(lote, ["texto_busqueda"])
+            lote = []
+    if lote:
+        Producto.objects.bulk_update(lote, ["texto_busqueda"])
+
+
+def _ejecutar(schema_editor, por_motor):
+    sentencias = por_motor.get(schema_editor.connection.vendor, [])
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+def crear_indices(apps, schema_editor):
+    _ejecutar(schema_editor, {"postgresql": POSTGRES_INDICES, "sqlite": SQLITE_INDICES})
+
+
+def eliminar_indices(apps, schema_editor):
+    _ejecutar(schema_editor, {"postgresql": POSTGRES_INDICES_REVERSE, "sqlite": SQLITE_INDICES_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(poblar_texto_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
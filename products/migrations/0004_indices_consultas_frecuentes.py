@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:41
+
+from django.db import migrations, models
+
+from utils.migraciones import AddIndexConcurrentlyPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('products', '0003_producto_texto_busqueda'),
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyPostgres(
+            model_name='producto',
+            index=models.Index(fields=['empresa', 'esta_activo', 'nombre'], name='producto_emp_activo_nom_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 # products/models.py
 from django.db import models
 
+from .search import construir_texto_busqueda
+
 class Marca(models.Model):
     #Representa al fabricante del producto (Ej: Samsung, LG, Sony).
     empresa = models.ForeignKey('tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True, related_name='marcas')
@@ -59,6 +61,34 @@ class SubCategoria(models.Model): #Nivel 2
         # Muestra "ELECTROHOGAR > Licuadoras"
         return f"{self.categoria.nombre} > {self.nombre}"
 
+class ProductoQuerySet(models.QuerySet):
+
+    def para_catalogo(self):
+        """
+        Carga en bloque todo lo que usa ProductoSerializer
+        (marca, subcategoría > categoría, ficha técnica, imágenes y
+        descuentos activos) para que una página cueste un número fijo de queries.
+        """
+        return self.select_related(
+            "empresa",
+            "marca",
+            "subcategoria__categoria",
+            "detalle__empresa",
+        ).prefetch_related(
+            models.Prefetch(
+                "imagenes",
+                queryset=ImagenProducto.objects.select_related("empresa"),
+            ),
+            models.Prefetch(
+                "descuentos",
+                queryset=Descuento.objects.filter(esta_activo=True)
+                .select_related("sucursal", "campania", "empresa")
+                .order_by("id"),
+                to_attr="descuentos_activos",
+            ),
+        )
+
+
 class Producto(models.Model):
     """
     El Producto principal. Este es el "SKU".
@@ -93,23 +123,44 @@ class Producto(models.Model):
     
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     esta_activo = models.BooleanField(default=True)
+
+    # Documento normalizado para la búsqueda indexada (ver products/search.py)
+    texto_busqueda = models.TextField(blank=True, default="", editable=False)
+
+    objects = ProductoQuerySet.as_manager()
+
+    @classmethod
+    def reservar_skus(cls, empresa, cantidad):
+        """
+        Genera `cantidad` SKUs consecutivos para la empresa con UNA consulta
+        (las importaciones masivas piden el bloque completo de una vez).
+        """
+        prefix = f"SKU-{empresa.id if empresa else 'GEN'}"
+        ultimo = cls.objects.filter(empresa=empresa).aggregate(ultimo=models.Max("id"))["ultimo"] or 0
+        return [f"{prefix}-{num:05d}" for num in range(ultimo + 1, ultimo + 1 + cantidad)]
     
     def save(self, *args, **kwargs):
         """
-        Genera automáticamente un SKU único por empresa si no existe.
+        Genera automáticamente un SKU único por empresa si no existe
+        y actualiza el texto de búsqueda.
         """
         if not self.sku:
-            prefix = f"SKU-{self.empresa.id if self.empresa else 'GEN'}"
-            last = Producto.objects.filter(empresa=self.empresa).order_by('id').last()
-            next_num = 1 if not last else last.id + 1
-            self.sku = f"{prefix}-{next_num:05d}"
+            self.sku = Producto.reservar_skus(self.empresa, 1)[0]
+        self.texto_busqueda = construir_texto_busqueda(self)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "texto_busqueda" not in update_fields:
+            kwargs["update_fields"] = list(update_fields) + ["texto_busqueda"]
         super().save(*args, **kwargs)
 
     class Meta:
         db_table = "producto"
         verbose_name = "Producto (SKU)"
         verbose_name_plural = "Productos (SKUs)"
-        unique_together = ("empresa", "sku") 
+        unique_together = ("empresa", "sku")
+        indexes = [
+            # Catálogo y dashboard: productos activos de la empresa, ordenados por nombre
+            models.Index(fields=["empresa", "esta_activo", "nombre"], name="producto_emp_activo_nom_idx"),
+        ] 
 
     def __str__(self):
         return f"{self.nombre} ({self.sku or 'Sin SKU'})"
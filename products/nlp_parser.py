@@ -1,8 +1,11 @@
 import json
 from decouple import config
 import google.generativeai as genai 
+from django.conf import settings
 from django.utils import timezone
 
+from utils.async_db import con_timeout
+
 # ----------------- PROMPT DE PRODUCTOS (RETAIL) -----------------
 PROMPT_PLANTILLA = """
 Eres un analizador de lenguaje natural experto en retail de electrodomésticos y tecnología.
@@ -73,44 +76,80 @@ Devuelve SOLAMENTE el objeto JSON.
 """
 # ----------------------------------------------------
 
-def parse_natural_query(texto_usuario: str) -> dict:
-    
-    # Esta función es IDÉNTICA a la de tu app 'reports'
-    
+def _modelo():
+    """Modelo de Gemini configurado, o None si falta la API key."""
     api_key = config('API_GEMINI', default=config('GOOGLE_API_KEY', default=''))
     if not api_key:
         print("ERROR: Clave API_GEMINI no configurada.")
-        return {"error": "API Key no configurada"}
+        return None
+    genai.configure(api_key=api_key)
+    # Usamos el modelo que SÍ te funciona
+    return genai.GenerativeModel('gemini-2.5-flash')
+
+
+def _armar_prompt(texto_usuario: str) -> str:
+    fecha_hoy_str = timezone.now().strftime('%Y-%m-%d')
+    # ¡IMPORTANTE! Usamos la plantilla de PRODUCTOS
+    return PROMPT_PLANTILLA.format(
+        texto_usuario=texto_usuario,
+        fecha_hoy=fecha_hoy_str
+    )
+
+
+def _leer_json(raw_text: str) -> dict:
+    raw_text = raw_text.strip()
+
+    # Limpieza de JSON
+    if raw_text.startswith("```json"):
+        raw_text = raw_text.lstrip("```json").rstrip("```").strip()
+    elif raw_text.startswith("```"):
+        raw_text = raw_text.lstrip("```").rstrip("```").strip()
+
+    try:
+        return json.loads(raw_text)
+    except json.JSONDecodeError:
+        print(f"Error JSON Decode: No se pudo parsear. Texto crudo: '{raw_text}'")
+        return {"error": "Respuesta de IA no es un JSON válido"}
+
+
+def parse_natural_query(texto_usuario: str) -> dict:
     
+    # Esta función es IDÉNTICA a la de tu app 'reports'
     try:
-        genai.configure(api_key=api_key)
-        # Usamos el modelo que SÍ te funciona
-        model = genai.GenerativeModel('gemini-2.5-flash') 
-
-        fecha_hoy_str = timezone.now().strftime('%Y-%m-%d')
-        # ¡IMPORTANTE! Usamos la plantilla de PRODUCTOS
-        prompt_final = PROMPT_PLANTILLA.format(
-            texto_usuario=texto_usuario,
-            fecha_hoy=fecha_hoy_str
+        model = _modelo()
+        if model is None:
+            return {"error": "API Key no configurada"}
+
+        response = model.generate_content(
+            _armar_prompt(texto_usuario),
+            request_options={"timeout": settings.GEMINI_TIMEOUT},
         )
+        return _leer_json(response.text)
 
-        response = model.generate_content(prompt_final)
-        raw_text = response.text.strip()
-        
-        # Limpieza de JSON
-        if raw_text.startswith("```json"):
-            raw_text = raw_text.lstrip("```json").rstrip("```").strip()
-        elif raw_text.startswith("```"):
-            raw_text = raw_text.lstrip("```").rstrip("```").strip()
+    except Exception as e:
+        print(f"Error FATAL en Gemini API: {type(e).__name__}: {e}")
+        return {"error": f"Error de API: {e}"}
 
-        parsed_json = json.loads(raw_text)
-        return parsed_json
 
-    except json.JSONDecodeError as e:
-        print(f"Error JSON Decode: No se pudo parsear. Texto crudo: '{raw_text}'")
-        return {"error": "Respuesta de IA no es un JSON válido"} 
+async def parse_natural_query_async(texto_usuario: str) -> dict:
+    """Igual que parse_natural_query, con el cliente async de Gemini (vistas ASGI)."""
+    try:
+        model = _modelo()
+        if model is None:
+            return {"error": "API Key no configurada"}
+
+        response = await con_timeout(
+            model.generate_content_async(
+                _armar_prompt(texto_usuario),
+                request_options={"timeout": settings.GEMINI_TIMEOUT},
+            ),
+            settings.GEMINI_TIMEOUT,
+        )
+        return _leer_json(response.text)
+
+    except TimeoutError:
+        return {"error": "Gemini no respondió a tiempo"}
 
     except Exception as e:
         print(f"Error FATAL en Gemini API: {type(e).__name__}: {e}")
         return {"error": f"Error de API: {e}"}
-    
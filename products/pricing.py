@@ -0,0 +1,139 @@
+# products/pricing.py
+# Motor de precios: precio efectivo de cada producto con su descuento vigente.
+#
+#  - UNA consulta: Producto LEFT JOIN descuento (FilteredRelation por activo y
+#    sucursal) LEFT JOIN campaña.
+#  - Cálculo vectorizado con numpy: ventana de la campaña, PORCENTAJE vs MONTO
+#    y, si hay varios descuentos aplicables, el mejor precio por producto.
+#    El precio final del ganador se recalcula en Decimal (ROUND_HALF_UP): los
+#    float64 solo deciden qué descuento gana, nunca el monto cobrado.
+#  - La tabla completa de la empresa se cachea por (empresa, sucursal, día,
+#    versión del catálogo), así que cualquier cambio en productos, descuentos
+#    o campañas la invalida (ver products/cache.py).
+#  - Con `producto_ids` solo se calculan esos productos y no se usa el cache:
+#    carrito, venta, detalle de un producto o una página del listado sin cache
+#    compartido no recorren todo el catálogo.
+
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import FilteredRelation, Q
+from django.utils import timezone
+
+from .cache import cache_activo, obtener_version_catalogo
+from .models import Producto
+
+CENTAVO = Decimal("0.01")
+TIMEOUT = 60 * 60 * 24
+
+
+def _a_decimal(valor):
+    return Decimal(valor or 0).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def _precio_con_descuento(precio, tipo, monto, porcentaje):
+    """Precio final exacto de una fila (mismas reglas que el cálculo vectorizado)."""
+    precio = Decimal(precio or 0)
+    if tipo == "PORCENTAJE":
+        porcentaje = min(max(Decimal(porcentaje or 0), Decimal(0)), Decimal(100))
+        final = precio * (1 - porcentaje / 100)
+    else:
+        final = precio - Decimal(monto or 0)
+    return _a_decimal(max(final, Decimal(0)))
+
+
+def _calcular_tabla(empresa_id, sucursal_id, hoy, producto_ids=None):
+    condicion = Q(descuentos__esta_activo=True)
+    if sucursal_id is not None:
+        condicion &= Q(descuentos__sucursal_id=sucursal_id)
+
+    productos = Producto.objects.filter(empresa_id=empresa_id, esta_activo=True)
+    if producto_ids is not None:
+        productos = productos.filter(id__in=producto_ids)
+
+    filas = list(
+        productos
+        .annotate(d=FilteredRelation("descuentos", condition=condicion))
+        .values_list(
+            "id",
+            "precio_venta",
+            "d__id",
+            "d__tipo",
+            "d__monto",
+            "d__porcentaje",
+            "d__campania_id",
+            "d__campania__fecha_inicio",
+            "d__campania__fecha_fin",
+            "d__campania__esta_activo",
+        )
+    )
+    if not filas:
+        return {}
+
+    columnas = list(zip(*filas))
+    ids = np.array(columnas[0], dtype=np.int64)
+    base = np.array([float(p or 0) for p in columnas[1]])
+    descuento_id = np.array([d or 0 for d in columnas[2]], dtype=np.int64)
+    es_porcentaje = np.array([t == "PORCENTAJE" for t in columnas[3]])
+    monto = np.array([float(m or 0) for m in columnas[4]])
+    porcentaje = np.array([float(p or 0) for p in columnas[5]])
+    tiene_campania = np.array([c is not None for c in columnas[6]])
+    inicio = np.array([i or hoy for i in columnas[7]], dtype="datetime64[D]")
+    fin = np.array([f or hoy for f in columnas[8]], dtype="datetime64[D]")
+    campania_activa = np.array([bool(a) for a in columnas[9]])
+
+    # Un descuento aplica si existe y, cuando tiene campaña, está dentro de su ventana
+    hoy64 = np.datetime64(hoy, "D")
+    en_ventana = campania_activa & (inicio <= hoy64) & (hoy64 <= fin)
+    aplica = (descuento_id > 0) & (~tiene_campania | en_ventana)
+
+    con_descuento = np.where(
+        es_porcentaje,
+        base * (1 - np.clip(porcentaje, 0, 100) / 100),
+        base - monto,
+    )
+    final = np.where(aplica, np.clip(con_descuento, 0, None), base)
+
+    # Varias filas por producto (sin sucursal): gana el precio más bajo
+    orden = np.lexsort((final, ids))
+    ids = ids[orden]
+    primero = np.concatenate(([True], ids[1:] != ids[:-1]))
+
+    tabla = {}
+    for i in orden[primero]:
+        pk, precio, _, tipo, monto, porcentaje = filas[i][:6]
+        if aplica[i]:
+            tabla[int(pk)] = (
+                _a_decimal(precio), _precio_con_descuento(precio, tipo, monto, porcentaje), int(descuento_id[i])
+            )
+        else:
+            tabla[int(pk)] = (_a_decimal(precio), _a_decimal(precio), None)
+    return tabla
+
+
+def tabla_precios(empresa_id, sucursal_id=None, fecha=None, producto_ids=None):
+    """
+    {producto_id: (precio_base, precio_final, descuento_id)} para toda la empresa,
+    o solo para `producto_ids` si se indican.
+    Sin sucursal se usa el mejor descuento vigente de cualquier sucursal.
+    """
+    hoy = fecha or timezone.localdate()
+    if producto_ids is not None:
+        return _calcular_tabla(empresa_id, sucursal_id, hoy, producto_ids)
+    # Mismas reglas que el catálogo: sin empresa o sin cache compartido no se cachea
+    if empresa_id is None or not cache_activo():
+        return _calcular_tabla(empresa_id, sucursal_id, hoy)
+    version = obtener_version_catalogo(empresa_id)["v"]
+    clave = f"precios:{empresa_id}:{sucursal_id or 'todas'}:{hoy.isoformat()}:{version}"
+    tabla = cache.get(clave)
+    if tabla is None:
+        tabla = _calcular_tabla(empresa_id, sucursal_id, hoy)
+        cache.set(clave, tabla, timeout=TIMEOUT)
+    return tabla
+
+
+def precio_final(empresa_id, producto, sucursal_id=None):
+    """Precio efectivo de un producto (su precio de lista si no está en la tabla)."""
+    fila = tabla_precios(empresa_id, sucursal_id, producto_ids=[producto.id]).get(producto.id)
+    return fila[1] if fila else producto.precio_venta
@@ -0,0 +1,237 @@
+# products/search.py
+# Búsqueda de productos indexada.
+#
+# Todo el texto buscable del producto (nombre, sku, descripción, marca,
+# categoría y subcategoría) se guarda normalizado en `Producto.texto_busqueda`
+# y se indexa según el motor:
+#   - PostgreSQL: GIN sobre to_tsvector('simple', texto_busqueda) (prefijos y ranking)
+#                 + GIN pg_trgm (tolerancia a errores de tipeo).
+#   - SQLite:     tabla virtual FTS5 `producto_fts` mantenida con triggers
+#                 (ver migración 0003_producto_texto_busqueda).
+
+import difflib
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import BooleanField, Case, FloatField, IntegerField, When
+from django.db.models.expressions import RawSQL
+
+# Máximo de candidatos que se rankean antes de paginar/serializar
+LIMITE_CANDIDATOS = 500
+
+RE_TERMINOS = re.compile(r"\w+", re.UNICODE)
+
+# ===========================================
+# 🔵 DDL de los índices (usado por la migración 0003 y por post_migrate)
+# ===========================================
+POSTGRES_INDICES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS producto_busqueda_tsv_idx ON producto "
+    "USING gin (to_tsvector('simple', texto_busqueda))",
+    "CREATE INDEX IF NOT EXISTS producto_busqueda_trgm_idx ON producto "
+    "USING gin (texto_busqueda gin_trgm_ops)",
+]
+POSTGRES_INDICES_REVERSE = [
+    "DROP INDEX IF EXISTS producto_busqueda_tsv_idx",
+    "DROP INDEX IF EXISTS producto_busqueda_trgm_idx",
+]
+
+# Tabla FTS5 con contenido externo (no duplica datos) + triggers de sincronización
+SQLITE_INDICES = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS producto_fts USING fts5("
+    "texto_busqueda, content='producto', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS producto_fts_vocab USING fts5vocab(producto_fts, 'row')",
+    "CREATE TRIGGER IF NOT EXISTS producto_fts_ai AFTER INSERT ON producto BEGIN "
+    "INSERT INTO producto_fts(rowid, texto_busqueda) VALUES (new.id, new.texto_busqueda); END",
+    "CREATE TRIGGER IF NOT EXISTS producto_fts_ad AFTER DELETE ON producto BEGIN "
+    "INSERT INTO producto_fts(producto_fts, rowid, texto_busqueda) "
+    "VALUES ('delete', old.id, old.texto_busqueda); END",
+    "CREATE TRIGGER IF NOT EXISTS producto_fts_au AFTER UPDATE OF texto_busqueda ON producto BEGIN "
+    "INSERT INTO producto_fts(producto_fts, rowid, texto_busqueda) "
+    "VALUES ('delete', old.id, old.texto_busqueda); "
+    "INSERT INTO producto_fts(rowid, texto_busqueda) VALUES (new.id, new.texto_busqueda); END",
+    "INSERT INTO producto_fts(producto_fts) VALUES ('rebuild')",
+]
+SQLITE_INDICES_REVERSE = [
+    "DROP TRIGGER IF EXISTS producto_fts_ai",
+    "DROP TRIGGER IF EXISTS producto_fts_ad",
+    "DROP TRIGGER IF EXISTS producto_fts_au",
+    "DROP TABLE IF EXISTS producto_fts_vocab",
+    "DROP TABLE IF EXISTS producto_fts",
+]
+
+
+def asegurar_indices_busqueda(connection):
+    """
+    En SQLite, las operaciones que reconstruyen la tabla `producto`
+    (AlterField, etc.) borran sus triggers. Se recrean si faltan.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'producto_fts_%'"
+        )
+        if cursor.fetchone()[0] == 3:
+            return
+        cursor.execute("SELECT count(*) FROM sqlite_master WHERE name = 'producto'")
+        if not cursor.fetchone()[0]:
+            return
+        for sql in SQLITE_INDICES:
+            cursor.execute(sql)
+
+
+def normalizar_texto(texto) -> str:
+    """Minúsculas, sin tildes y con espacios colapsados."""
+    texto = unicodedata.normalize("NFKD", str(texto or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.split())
+
+
+def construir_texto_busqueda(producto) -> str:
+    """Arma el documento buscable de un producto (usa las relaciones ya cargadas)."""
+    partes = [producto.nombre, producto.sku, producto.descripcion]
+    if producto.marca_id and producto.marca:
+        partes.append(producto.marca.nombre)
+    if producto.subcategoria_id and producto.subcategoria:
+        partes.append(producto.subcategoria.nombre)
+        partes.append(producto.subcategoria.categoria.nombre)
+    return normalizar_texto(" ".join(p for p in partes if p))
+
+
+def reindexar_productos(queryset, batch_size=500):
+    """
+    Recalcula `texto_busqueda` para un queryset de productos
+    (se usa cuando cambia el nombre de una marca o (sub)categoría).
+    """
+    from .models import Producto
+
+    queryset = queryset.select_related("marca", "subcategoria__categoria")
+    lote = []
+    for producto in queryset.iterator(chunk_size=batch_size):
+        producto.texto_busqueda = construir_texto_busqueda(producto)
+        lote.append(producto)
+        if len(lote) >= batch_size:
+            Producto.objects.bulk_update(lote, ["texto_busqueda"])
+            lote = []
+    if lote:
+        Producto.objects.bulk_update(lote, ["texto_busqueda"])
+
+
+def _terminos(texto):
+    return RE_TERMINOS.findall(normalizar_texto(texto))
+
+
+# ===========================================
+# 🔵 PostgreSQL: tsvector (prefijos) + pg_trgm (typos)
+# ===========================================
+def _buscar_postgres(queryset, terminos, texto_normalizado, limite):
+    tsquery = " & ".join(f"{t}:*" for t in terminos)
+    tsvector = "to_tsvector('simple', producto.texto_busqueda)"
+
+    condicion = RawSQL(
+        f"({tsvector} @@ to_tsquery('simple', %s) OR %s <%% producto.texto_busqueda)",
+        [tsquery, texto_normalizado],
+        output_field=BooleanField(),
+    )
+    rank = RawSQL(
+        f"(ts_rank({tsvector}, to_tsquery('simple', %s)) + word_similarity(%s, producto.texto_busqueda))",
+        [tsquery, texto_normalizado],
+        output_field=FloatField(),
+    )
+    candidatos = queryset.filter(condicion).annotate(rank=rank).order_by("-rank", "nombre")
+    if limite:
+        return candidatos[:limite]
+    # Mismo tope de candidatos que en SQLite, sin perder la posibilidad de filtrar después
+    ids = candidatos.values("id")[:LIMITE_CANDIDATOS]
+    return queryset.filter(id__in=ids).annotate(rank=rank).order_by("-rank", "nombre")
+
+
+# ===========================================
+# 🔵 SQLite: FTS5 (bm25 + prefijos) y corrección por vocabulario
+# ===========================================
+def _fts5_match(terminos):
+    return " ".join(f'"{t}"*' for t in terminos)
+
+
+def _corregir_terminos_sqlite(cursor, terminos):
+    """Reemplaza cada término por el más parecido del vocabulario FTS5."""
+    corregidos = []
+    for termino in terminos:
+        cursor.execute(
+            "SELECT term FROM producto_fts_vocab WHERE term LIKE %s LIMIT 5000",
+            [f"{termino[0]}%"],
+        )
+        vocabulario = [fila[0] for fila in cursor.fetchall()]
+        parecidos = difflib.get_close_matches(termino, vocabulario, n=1, cutoff=0.7)
+        corregidos.append(parecidos[0] if parecidos else termino)
+    return corregidos
+
+
+def _ids_sqlite(connection, terminos, limite):
+    sql = (
+        "SELECT rowid FROM producto_fts WHERE producto_fts MATCH %s "
+        "ORDER BY rank LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_fts5_match(terminos), limite])
+        ids = [fila[0] for fila in cursor.fetchall()]
+        if not ids:
+            corregidos = _corregir_terminos_sqlite(cursor, terminos)
+            if corregidos != terminos:
+                cursor.execute(sql, [_fts5_match(corregidos), limite])
+                ids = [fila[0] for fila in cursor.fetchall()]
+    return ids
+
+
+def _buscar_sqlite(queryset, terminos, limite):
+    connection = connections[queryset.db]
+    # El índice FTS es global: se piden más candidatos y luego se filtra por el queryset
+    candidatos = _ids_sqlite(connection, terminos, LIMITE_CANDIDATOS * 4)
+    if not candidatos:
+        return queryset.none()
+    permitidos = set(queryset.filter(id__in=candidatos).values_list("id", flat=True))
+    ids = [pk for pk in candidatos if pk in permitidos][: limite or LIMITE_CANDIDATOS]
+    orden = Case(
+        *[When(id=pk, then=len(ids) - pos) for pos, pk in enumerate(ids)],
+        default=0,
+        output_field=IntegerField(),
+    )
+    return queryset.filter(id__in=ids).annotate(rank=orden).order_by("-rank")
+
+
+# ===========================================
+# 🔵 API pública
+# ===========================================
+def buscar_productos(queryset, texto, limite=None):
+    """
+    Filtra y ordena por relevancia (anotación `rank`) un queryset de Producto.
+    Soporta prefijos ("sams" -> Samsung) y errores de tipeo ("samsng").
+    Con `limite` devuelve un queryset recortado (no admite más filtros); sin
+    él, como máximo LIMITE_CANDIDATOS resultados en cualquier motor.
+    """
+    terminos = _terminos(texto)
+    if not terminos:
+        return queryset
+    if limite is not None:
+        limite = max(1, min(int(limite), LIMITE_CANDIDATOS))
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        return _buscar_postgres(queryset, terminos, " ".join(terminos), limite)
+    if vendor == "sqlite":
+        return _buscar_sqlite(queryset, terminos, limite)
+
+    # Otros motores: sin índice de texto, se conserva el comportamiento anterior
+    for termino in terminos:
+        queryset = queryset.filter(texto_busqueda__contains=termino)
+    queryset = queryset.order_by("nombre")
+    return queryset[:limite] if limite else queryset
+
+
+def sugerir_productos(queryset, texto, limite=8):
+    """Autocompletado: los productos más relevantes para lo que se está tipeando."""
+    resultados = buscar_productos(queryset, texto, limite=limite)
+    return list(resultados.values("id", "nombre", "sku"))
@@ -98,6 +98,7 @@ class ProductoSerializer(serializers.ModelSerializer):
     subcategoria_nombre = serializers.CharField(source="subcategoria.nombre", read_only=True)
     empresa_nombre = serializers.CharField(source="empresa.nombre", read_only=True)
     descuento = serializers.SerializerMethodField()
+    precio_final = serializers.SerializerMethodField()
     class Meta:
         model = Producto
         fields = [
@@ -116,18 +117,44 @@ class ProductoSerializer(serializers.ModelSerializer):
             "empresa_nombre",
             "detalle",
             "imagenes",
-            'descuento'
+            'descuento',
+            "precio_final",
         ]
     
+    def _precio(self, obj):
+        """Fila del motor de precios (products/pricing.py) si la vista la pasó en el contexto."""
+        precios = self.context.get("precios")
+        return precios.get(obj.id) if precios is not None else None
+
     def get_descuento(self, obj):
         """
-        Método para obtener el descuento del producto si existe
+        Método para obtener el descuento del producto si existe.
+        Con el motor de precios en el contexto, es el descuento que realmente
+        aplica (sucursal y vigencia de la campaña); si no, el primero activo.
+        Usa los descuentos precargados por Producto.objects.para_catalogo().
         """
-        descuento = Descuento.objects.filter(producto=obj, esta_activo=True).first()
+        descuentos = getattr(obj, "descuentos_activos", None)
+        precio = self._precio(obj)
+        if "precios" in self.context:
+            descuento_id = precio[2] if precio else None
+            if descuento_id is None:
+                return None
+            if descuentos is not None:
+                descuento = next((d for d in descuentos if d.id == descuento_id), None)
+            else:
+                descuento = Descuento.objects.filter(id=descuento_id).first()
+        elif descuentos is not None:
+            descuento = descuentos[0] if descuentos else None
+        else:
+            descuento = Descuento.objects.filter(producto=obj, esta_activo=True).first()
         if descuento:
             return DescuentoSerializer(descuento).data
         return None  
 
+    def get_precio_final(self, obj):
+        precio = self._precio(obj)
+        return str(precio[1] if precio else obj.precio_venta)
+
     def validate(self, data):
         """
         Valida que el producto, la marca y la subcategoría sean de la misma empresa.
@@ -146,9 +173,9 @@ class ProductoSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
 
         representation = super().to_representation(instance)
-        if instance.marca:
+        if instance.marca and 'marca' in representation:
             representation['marca'] = instance.marca.nombre
-        if instance.subcategoria:
+        if instance.subcategoria and 'subcategoria' in representation:
             representation['subcategoria'] = str(instance.subcategoria)
         return representation
 
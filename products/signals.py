@@ -0,0 +1,94 @@
+# products/signals.py
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.db import connections, transaction
+
+from sucursales.models import Sucursal
+from .cache import invalidar_catalogo
+from .models import (
+    Marca,
+    Categoria,
+    SubCategoria,
+    Producto,
+    DetalleProducto,
+    ImagenProducto,
+    Campania,
+    Descuento,
+)
+from .search import reindexar_productos, asegurar_indices_busqueda
+
+
+# ---
+# Búsqueda: si cambia el nombre de una marca o (sub)categoría,
+# el texto de búsqueda de TODOS sus productos queda desactualizado (aunque el
+# nombre nuevo ya aparezca en él: "LG Electronics" -> "LG").
+# El nombre cargado se recuerda en post_init para no reindexar si no cambió.
+# ---
+@receiver(post_init, sender=Marca)
+@receiver(post_init, sender=SubCategoria)
+@receiver(post_init, sender=Categoria)
+def recordar_nombre(sender, instance, **kwargs):
+    # __dict__ para no disparar consultas con campos diferidos (.only())
+    instance._nombre_indexado = instance.__dict__.get("nombre") if instance.pk else None
+
+
+def _nombre_cambio(instance, created):
+    anterior = getattr(instance, "_nombre_indexado", None)
+    instance._nombre_indexado = instance.nombre
+    # Nombre anterior desconocido (campo diferido): se reindexa por las dudas
+    return not created and (anterior is None or anterior != instance.nombre)
+
+
+@receiver(post_save, sender=Marca)
+def reindexar_por_marca(sender, instance, created, **kwargs):
+    if _nombre_cambio(instance, created):
+        reindexar_productos(Producto.objects.filter(marca=instance))
+
+
+@receiver(post_save, sender=SubCategoria)
+def reindexar_por_subcategoria(sender, instance, created, **kwargs):
+    if _nombre_cambio(instance, created):
+        reindexar_productos(Producto.objects.filter(subcategoria=instance))
+
+
+@receiver(post_save, sender=Categoria)
+def reindexar_por_categoria(sender, instance, created, **kwargs):
+    if _nombre_cambio(instance, created):
+        reindexar_productos(Producto.objects.filter(subcategoria__categoria=instance))
+
+
+def recrear_indices_busqueda(sender, using=None, **kwargs):
+    asegurar_indices_busqueda(connections[using or "default"])
+
+
+# ---
+# Cache del catálogo: cualquier cambio en un modelo que aparece en las
+# respuestas de products/cache.py invalida el catálogo de su empresa.
+# La versión cambia al confirmar la transacción: si cambiara antes, un GET
+# concurrente cachearía los datos viejos bajo la versión nueva.
+# (Sucursal entra por el nombre que muestra el descuento.)
+# ---
+@receiver(post_save, sender=Marca)
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=SubCategoria)
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=DetalleProducto)
+@receiver(post_save, sender=ImagenProducto)
+@receiver(post_save, sender=Campania)
+@receiver(post_save, sender=Descuento)
+@receiver(post_save, sender=Sucursal)
+@receiver(post_delete, sender=Marca)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=SubCategoria)
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=DetalleProducto)
+@receiver(post_delete, sender=ImagenProducto)
+@receiver(post_delete, sender=Campania)
+@receiver(post_delete, sender=Descuento)
+@receiver(post_delete, sender=Sucursal)
+def invalidar_cache_catalogo(sender, instance, **kwargs):
+    empresa_id = instance.empresa_id
+    if empresa_id is None and getattr(instance, "producto_id", None):
+        empresa_id = Producto.objects.filter(id=instance.producto_id).values_list("empresa_id", flat=True).first()
+    if empresa_id is not None:
+        transaction.on_commit(lambda: invalidar_catalogo(empresa_id))
@@ -1,3 +1,500 @@
-from django.test import TestCase
+from unittest.mock import AsyncMock, patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from products.models import (
+    Marca,
+    Categoria,
+    SubCategoria,
+    Producto,
+    DetalleProducto,
+    ImagenProducto,
+    Descuento,
+)
+from products.search import buscar_productos
+from products.views import BuscarProductoNLPView, ProductoViewSet
+from sucursales.models import Sucursal
+from tenants.models import Empresa
+from users.models import User
+
+
+class ProductoCatalogoQueryCountTests(TestCase):
+    """
+    El listado del catálogo debe costar un número fijo de queries,
+    sin importar cuántos productos tenga la página (sin N+1).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Test", nit="TEST-001")
+        cls.usuario = User.objects.create_user(
+            email="catalogo@test.com", password="x", empresa=cls.empresa
+        )
+        cls.marca = Marca.objects.create(empresa=cls.empresa, nombre="Samsung")
+        cls.categoria = Categoria.objects.create(empresa=cls.empresa, nombre="Electrohogar")
+        cls.subcategoria = SubCategoria.objects.create(
+            empresa=cls.empresa, categoria=cls.categoria, nombre="Licuadoras"
+        )
+        cls.sucursal = Sucursal.objects.create(empresa=cls.empresa, nombre="Central")
+
+    def _crear_productos(self, cantidad):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._crear_productos_sin_confirmar(cantidad)
+
+    def _crear_productos_sin_confirmar(self, cantidad):
+        for i in range(cantidad):
+            producto = Producto.objects.create(
+                empresa=self.empresa,
+                nombre=f"Producto {Producto.objects.count() + 1}",
+                precio_venta=100,
+                marca=self.marca,
+                subcategoria=self.subcategoria,
+            )
+            DetalleProducto.objects.create(producto=producto, empresa=self.empresa, potencia="500W")
+            ImagenProducto.objects.create(producto=producto, empresa=self.empresa, url="productos/x.jpg")
+            ImagenProducto.objects.create(producto=producto, empresa=self.empresa, url="productos/y.jpg")
+            Descuento.objects.create(
+                empresa=self.empresa,
+                nombre=f"Promo {producto.id}",
+                tipo="PORCENTAJE",
+                porcentaje=10,
+                producto=producto,
+                sucursal=self.sucursal,
+            )
+
+    def _contar_queries_listado(self):
+        request = APIRequestFactory().get("/api/producto/")
+        force_authenticate(request, user=self.usuario)
+        view = ProductoViewSet.as_view({"get": "list"})
+        with CaptureQueriesContext(connection) as ctx:
+            response = view(request)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data
+
+    def test_listado_con_queries_constantes(self):
+        self._crear_productos(3)
+        queries_pocos, data = self._contar_queries_listado()
+        self.assertEqual(len(data["results"]), 3)
+
+        self._crear_productos(12)
+        queries_muchos, data = self._contar_queries_listado()
+        self.assertEqual(len(data["results"]), 15)
+
+        self.assertEqual(queries_pocos, queries_muchos)
+
+    def test_listado_incluye_relaciones(self):
+        self._crear_productos(1)
+        _, data = self._contar_queries_listado()
+        item = data["results"][0]
+        self.assertEqual(item["marca"], "Samsung")
+        self.assertEqual(item["subcategoria"], "Electrohogar > Licuadoras")
+        self.assertEqual(item["detalle"]["potencia"], "500W")
+        self.assertEqual(len(item["imagenes"]), 2)
+        self.assertEqual(item["descuento"]["tipo"], "PORCENTAJE")
+
+
+@override_settings(CATALOGO_CACHE_ACTIVO=True)
+class CatalogoCacheTests(TestCase):
+    """Las respuestas del catálogo se sirven desde cache hasta que algo cambia."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Cache", nit="CACHE-001")
+        cls.usuario = User.objects.create_user(
+            email="cache@test.com", password="x", empresa=cls.empresa
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.marca = Marca.objects.create(empresa=self.empresa, nombre="LG")
+
+    def _listar(self, usuario=None, **headers):
+        request = APIRequestFactory().get("/api/producto/", **headers)
+        force_authenticate(request, user=usuario or self.usuario)
+        view = ProductoViewSet.as_view({"get": "list"})
+        with CaptureQueriesContext(connection) as ctx:
+            response = view(request)
+            response.render()
+        return response, len(ctx.captured_queries)
+
+    def test_segunda_peticion_no_consulta_la_bd(self):
+        Producto.objects.create(empresa=self.empresa, nombre="Tv", precio_venta=10, marca=self.marca)
+        primera, queries = self._listar()
+        self.assertGreater(queries, 0)
+        segunda, queries = self._listar()
+        self.assertEqual(queries, 0)
+        self.assertEqual(primera.data, segunda.data)
+        self.assertEqual(primera["ETag"], segunda["ETag"])
+
+    def test_etag_devuelve_304(self):
+        primera, _ = self._listar()
+        response, _ = self._listar(HTTP_IF_NONE_MATCH=primera["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cambio_en_catalogo_invalida(self):
+        self._listar()
+        # La versión cambia recién al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Producto.objects.create(empresa=self.empresa, nombre="Radio", precio_venta=10, marca=self.marca)
+            self.assertEqual(self._listar()[1], 0)
+        self.assertTrue(callbacks)
+        response, queries = self._listar()
+        self.assertGreater(queries, 0)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_sin_empresa_no_se_cachea(self):
+        admin = User.objects.create_user(email="admin-cache@test.com", password="x", empresa=None)
+        with patch("products.cache.cache.set") as guardar:
+            self._listar(usuario=admin)
+        guardar.assert_not_called()
+
+    @override_settings(CATALOGO_CACHE_ACTIVO=False)
+    def test_desactivado_sin_cache_compartido(self):
+        self._listar()
+        response, queries = self._listar()
+        self.assertGreater(queries, 0)
+        self.assertNotIn("ETag", response)
+
+
+class ImportacionCatalogoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Import", nit="IMPORT-CAT")
+        cls.sucursal = Sucursal.objects.create(empresa=cls.empresa, nombre="Central")
+        Marca.objects.create(empresa=cls.empresa, nombre="Samsung")
+
+    def test_importa_en_lotes_con_skus_en_bloque(self):
+        import io
+        from products.importacion import importar_catalogo, leer_catalogo
+        from sucursales.models import StockSucursal
+
+        lineas = ["nombre,precio_venta,marca,categoria,subcategoria,potencia,sucursal,stock"]
+        for i in range(25):
+            lineas.append(f"Licuadora {i},{100 + i},samsung,Electrohogar,Licuadoras,500W,Central,{i}")
+        lineas.append(",10,Samsung,,,,,")
+        archivo = io.BytesIO("\n".join(lineas).encode("utf-8"))
+
+        avances = []
+        reporte = importar_catalogo(
+            self.empresa, leer_catalogo(archivo, "catalogo.csv"),
+            chunk_size=10, progreso=lambda p, c: avances.append((p, c)),
+        )
+
+        self.assertEqual(reporte["creados"], 25)
+        self.assertEqual([e["fila"] for e in reporte["errores"]], [26])
+        self.assertEqual(avances, [(10, 10), (20, 20), (26, 25)])
+
+        productos = Producto.objects.filter(empresa=self.empresa)
+        self.assertEqual(productos.values("sku").distinct().count(), 25)
+        self.assertEqual(Marca.objects.filter(empresa=self.empresa).count(), 1)
+        self.assertEqual(SubCategoria.objects.filter(empresa=self.empresa).count(), 1)
+        self.assertEqual(DetalleProducto.objects.filter(empresa=self.empresa).count(), 25)
+        self.assertEqual(StockSucursal.objects.filter(empresa=self.empresa).count(), 25)
+        self.assertIn("samsung", productos.first().texto_busqueda)
+
+    def _importar(self, *lineas):
+        import io
+        from products.importacion import importar_catalogo, leer_catalogo
+
+        archivo = io.BytesIO("\n".join(["nombre,precio_venta,sku", *lineas]).encode("utf-8"))
+        return importar_catalogo(self.empresa, leer_catalogo(archivo, "catalogo.csv"))
+
+    def test_sku_del_archivo_igual_a_uno_generado(self):
+        generado = Producto.reservar_skus(self.empresa, 1)[0]
+        reporte = self._importar(f"Con SKU,10,{generado}", "Sin SKU,10,")
+        self.assertEqual((reporte["creados"], reporte["errores"]), (2, []))
+        self.assertNotEqual(Producto.objects.get(nombre="Sin SKU").sku, generado)
+
+    def test_stock_decimal_o_negativo_es_error(self):
+        from products.importacion import importar_catalogo
+        from sucursales.models import StockSucursal
+
+        reporte = importar_catalogo(self.empresa, [
+            {"nombre": "Plancha", "precio_venta": "10", "sucursal": "Central", "stock": "2.7"},
+            {"nombre": "Radio", "precio_venta": "10", "sucursal": "Central", "stock": "-1"},
+            {"nombre": "Tv", "precio_venta": "10", "sucursal": "Central", "stock": "4.0"},
+            "Licuadora",
+        ])
+        self.assertEqual(reporte["creados"], 1)
+        self.assertEqual([e["fila"] for e in reporte["errores"]], [1, 2, 4])
+        self.assertEqual(StockSucursal.objects.get(producto__nombre="Tv").stock, 4)
+
+    def test_conflicto_concurrente_se_reporta_por_fila(self):
+        existente = Producto.objects.create(empresa=self.empresa, nombre="Otro", precio_venta=1)
+        # Simula un Producto.save() en paralelo que tomó el SKU reservado
+        with patch("products.importacion._skus_libres", return_value=[existente.sku]):
+            reporte = self._importar("Nuevo,10,", "Otro nuevo,10,MANUAL-1")
+        self.assertEqual(reporte["creados"], 0)
+        self.assertEqual([e["fila"] for e in reporte["errores"]], [1, 2])
+        self.assertFalse(Producto.objects.filter(sku="MANUAL-1").exists())
+
+
+@override_settings(CATALOGO_CACHE_ACTIVO=True)
+class MotorPreciosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import date
+
+        from products.models import Campania
+
+        cls.empresa = Empresa.objects.create(nombre="Empresa Precios", nit="PRECIOS-001")
+        cls.central = Sucursal.objects.create(empresa=cls.empresa, nombre="Central")
+        cls.norte = Sucursal.objects.create(empresa=cls.empresa, nombre="Norte")
+        cls.tv = Producto.objects.create(empresa=cls.empresa, nombre="Tv", precio_venta=200)
+        cls.radio = Producto.objects.create(empresa=cls.empresa, nombre="Radio", precio_venta=50)
+        cls.plancha = Producto.objects.create(empresa=cls.empresa, nombre="Plancha", precio_venta=80)
+        vencida = Campania.objects.create(
+            empresa=cls.empresa, nombre="Navidad 2020",
+            fecha_inicio=date(2020, 12, 1), fecha_fin=date(2020, 12, 31),
+        )
+        Descuento.objects.create(
+            empresa=cls.empresa, nombre="10%", tipo="PORCENTAJE", porcentaje=10,
+            producto=cls.tv, sucursal=cls.central,
+        )
+        Descuento.objects.create(
+            empresa=cls.empresa, nombre="-30", tipo="MONTO", monto=30,
+            producto=cls.tv, sucursal=cls.norte,
+        )
+        Descuento.objects.create(
+            empresa=cls.empresa, nombre="Navidad", tipo="MONTO", monto=20,
+            producto=cls.radio, sucursal=cls.central, campania=vencida,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_precio_por_sucursal_y_campania(self):
+        from decimal import Decimal
+        from products.pricing import tabla_precios
+
+        central = tabla_precios(self.empresa.id, self.central.id)
+        self.assertEqual(central[self.tv.id][1], Decimal("180.00"))
+        self.assertEqual(central[self.radio.id][1], Decimal("50.00"))  # campaña vencida
+        self.assertIsNone(central[self.radio.id][2])
+        self.assertEqual(central[self.plancha.id][1], Decimal("80.00"))
+
+        norte = tabla_precios(self.empresa.id, self.norte.id)
+        self.assertEqual(norte[self.tv.id][1], Decimal("170.00"))
+
+        # Sin sucursal: el mejor descuento vigente
+        self.assertEqual(tabla_precios(self.empresa.id)[self.tv.id][1], Decimal("170.00"))
+
+    def test_redondeo_exacto_al_centavo(self):
+        from decimal import Decimal
+        from products.pricing import tabla_precios
+
+        # 1.10 * 0.95 = 1.045: en float64 queda 1.04499..., en Decimal sube a 1.05
+        chicle = Producto.objects.create(empresa=self.empresa, nombre="Chicle", precio_venta=Decimal("1.10"))
+        Descuento.objects.create(
+            empresa=self.empresa, nombre="5%", tipo="PORCENTAJE", porcentaje=5,
+            producto=chicle, sucursal=self.central,
+        )
+        self.assertEqual(tabla_precios(self.empresa.id, self.central.id)[chicle.id][1], Decimal("1.05"))
+
+    def test_solo_los_productos_pedidos(self):
+        from decimal import Decimal
+        from products.pricing import tabla_precios
+
+        # No se usa ni se llena el cache de la tabla completa
+        with patch("products.pricing.cache") as cache_precios:
+            tabla = tabla_precios(self.empresa.id, self.central.id, producto_ids=[self.tv.id])
+        cache_precios.get.assert_not_called()
+        self.assertEqual(list(tabla), [self.tv.id])
+        self.assertEqual(tabla[self.tv.id][1], Decimal("180.00"))
+
+    @override_settings(CATALOGO_CACHE_ACTIVO=False)
+    def test_detalle_sin_cache_no_recorre_el_catalogo(self):
+        from products import pricing
+
+        request = APIRequestFactory().get(f"/api/productos/{self.tv.id}/", {"sucursal": self.central.id})
+        with patch.object(pricing, "_calcular_tabla", wraps=pricing._calcular_tabla) as calcular:
+            response = ProductoViewSet.as_view({"get": "retrieve"})(request, pk=self.tv.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(calcular.call_args.args[3], [self.tv.id])
+
+    def test_tabla_cacheada_e_invalidada(self):
+        from decimal import Decimal
+        from products.pricing import tabla_precios
+
+        tabla_precios(self.empresa.id, self.central.id)
+        with self.assertNumQueries(0):
+            tabla_precios(self.empresa.id, self.central.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plancha.precio_venta = 90
+            self.plancha.save()
+        self.assertEqual(tabla_precios(self.empresa.id, self.central.id)[self.plancha.id][1], Decimal("90.00"))
+
+
+class BusquedaNLPAsyncTests(TestCase):
+    """La búsqueda con Gemini es una vista async: Gemini se espera en el loop y el ORM corre aparte."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa NLP", nit="NLP-001")
+        cls.usuario = User.objects.create_user(email="nlp@test.com", password="x", empresa=cls.empresa)
+        Producto.objects.create(empresa=cls.empresa, nombre="Licuadora Oster", precio_venta=100)
+        Producto.objects.create(empresa=cls.empresa, nombre="Smart TV", precio_venta=900)
+
+    def setUp(self):
+        cache.clear()
+
+    def _buscar(self, prompt):
+        request = APIRequestFactory().post("/api/productos/buscar-nlp/", {"prompt": prompt}, format="json")
+        force_authenticate(request, user=self.usuario)
+        return async_to_sync(BuscarProductoNLPView.as_view())(request)
+
+    def test_vista_es_async(self):
+        self.assertTrue(BuscarProductoNLPView.view_is_async)
+
+    @patch("products.views.parse_natural_query_async", new_callable=AsyncMock)
+    def test_busca_con_la_interpretacion_de_gemini(self, interprete):
+        interprete.return_value = {"nombre_producto": "licuadora"}
+        response = self._buscar("mostrame licuadoras")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["nombre"] for p in response.data], ["Licuadora Oster"])
+        interprete.assert_awaited_once_with("mostrame licuadoras")
+
+    @patch("products.views.parse_natural_query_async", new_callable=AsyncMock)
+    def test_error_de_gemini(self, interprete):
+        interprete.return_value = {"error": "Gemini no respondió a tiempo"}
+        response = self._buscar("algo")
+        self.assertEqual(response.status_code, 500)
+
+    def test_prompt_vacio(self):
+        self.assertEqual(self._buscar("").status_code, 400)
+
+    @override_settings(DEBUG=True)  # Django solo registra los adaptadores con DEBUG
+    @patch("products.views.parse_natural_query_async", new_callable=AsyncMock)
+    def test_middlewares_no_adaptan_la_vista_async(self, interprete):
+        # Toda la cadena es async: Django no envuelve nada con sync_to_async/async_to_sync
+        interprete.return_value = {"nombre_producto": "licuadora"}
+        cliente = AsyncClient(headers={"authorization": f"Bearer {AccessToken.for_user(self.usuario)}"})
+        with self.assertNoLogs("django.request", level="DEBUG"):
+            response = async_to_sync(cliente.post)(
+                "/api/busqueda-inteligente/", {"prompt": "licuadoras"}, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["nombre"] for p in response.json()], ["Licuadora Oster"])
+
+
+class BusquedaProductosTests(TestCase):
+    """Búsqueda indexada: prefijos, errores de tipeo, reindexado y límites del autocompletado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Busqueda", nit="BUSQ-001")
+        cls.usuario = User.objects.create_user(email="busqueda@test.com", password="x", empresa=cls.empresa)
+        cls.marca = Marca.objects.create(empresa=cls.empresa, nombre="Samsung")
+        cls.tv = Producto.objects.create(empresa=cls.empresa, nombre="Televisor", precio_venta=900, marca=cls.marca)
+        cls.licuadora = Producto.objects.create(empresa=cls.empresa, nombre="Licuadora Oster", precio_venta=100)
+        for i in range(25):
+            Producto.objects.create(empresa=cls.empresa, nombre=f"Cable HDMI {i}", precio_venta=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def _nombres(self, texto, **kwargs):
+        return [p.nombre for p in buscar_productos(Producto.objects.filter(empresa=self.empresa), texto, **kwargs)]
+
+    def _sugerir(self, **params):
+        request = APIRequestFactory().get("/api/producto/sugerir/", params)
+        force_authenticate(request, user=self.usuario)
+        return ProductoViewSet.as_view({"get": "sugerir"})(request)
+
+    def test_prefijo(self):
+        self.assertEqual(self._nombres("sams"), ["Televisor"])
+        self.assertEqual(self._nombres("licu ost"), ["Licuadora Oster"])
+
+    def test_tolera_errores_de_tipeo(self):
+        self.assertEqual(self._nombres("samsng"), ["Televisor"])
+
+    def test_reindexa_al_renombrar_producto_y_marca(self):
+        self.tv.nombre = "Monitor"
+        self.tv.save(update_fields=["nombre"])
+        self.assertEqual(self._nombres("monitor"), ["Monitor"])
+
+        self.marca.nombre = "Hisense"
+        self.marca.save()
+        self.assertEqual(self._nombres("hisense"), ["Monitor"])
+
+        # Cambiar la marca del producto también actualiza su texto
+        self.tv.marca = Marca.objects.create(empresa=self.empresa, nombre="Philips")
+        self.tv.save()
+        self.assertEqual(self._nombres("philips"), ["Monitor"])
+        self.assertEqual(self._nombres("hisense"), [])
+
+    def test_renombrar_a_una_parte_del_nombre(self):
+        # "Samsung Electronics" -> "Samsung": el texto ya contiene el nombre nuevo,
+        # pero el viejo tiene que dejar de encontrarse
+        self.marca.nombre = "Samsung Electronics"
+        self.marca.save()
+        self.assertEqual(self._nombres("electronics"), ["Televisor"])
+
+        self.marca.nombre = "Samsung"
+        self.marca.save()
+        self.assertEqual(self._nombres("electronics"), [])
+        self.assertEqual(self._nombres("samsung"), ["Televisor"])
+
+    def test_guardar_sin_cambiar_el_nombre_no_reindexa(self):
+        marca = Marca.objects.get(id=self.marca.id)
+        with patch("products.signals.reindexar_productos") as reindexar:
+            marca.save()
+        reindexar.assert_not_called()
+
+    def test_limites_de_sugerir(self):
+        self.assertEqual(len(self._sugerir(q="cable").data), 8)
+        self.assertEqual(len(self._sugerir(q="cable", limite=0).data), 1)
+        self.assertEqual(len(self._sugerir(q="cable", limite=-3).data), 1)
+        self.assertEqual(len(self._sugerir(q="cable", limite=100).data), 20)
+        self.assertEqual(len(self._sugerir(q="cable", limite="x").data), 8)
+        self.assertEqual(self._sugerir(q="c").data, [])
+
+
+@override_settings(CATALOGO_CACHE_ACTIVO=False)
+class PaginacionCursorTests(TestCase):
+    """Con nombres repetidos el cursor no salta ni repite productos (desempate por id)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Cursor", nit="CURSOR-001")
+        cls.usuario = User.objects.create_user(email="cursor@test.com", password="x", empresa=cls.empresa)
+        for _ in range(5):
+            Producto.objects.create(empresa=cls.empresa, nombre="Repetido", precio_venta=10)
+        Producto.objects.create(empresa=cls.empresa, nombre="Zapato", precio_venta=10)
+
+    def test_recorre_todas_las_paginas(self):
+        from urllib.parse import parse_qs, urlparse
+
+        vistos, params = [], {"page_size": 2}
+        while True:
+            request = APIRequestFactory().get("/api/producto/", params)
+            force_authenticate(request, user=self.usuario)
+            data = ProductoViewSet.as_view({"get": "list"})(request).data
+            vistos += [p["id"] for p in data["results"]]
+            if not data["next"]:
+                break
+            params = {"page_size": 2, "cursor": parse_qs(urlparse(data["next"]).query)["cursor"][0]}
+
+        self.assertEqual(len(vistos), 6)
+        self.assertEqual(len(set(vistos)), 6)
+
+    def test_orden_con_desempate(self):
+        from utils.pagination import KeysetPagination
+
+        def ordenar(*campos):
+            return KeysetPagination().get_ordering(None, Producto.objects.order_by(*campos), object())
+
+        self.assertEqual(ordenar("nombre"), ("nombre", "id"))
+        self.assertEqual(ordenar("-precio_venta"), ("-precio_venta", "-id"))
+        self.assertEqual(ordenar("nombre", "-id"), ("nombre", "-id"))
+        self.assertEqual(ordenar(), ("-id",))
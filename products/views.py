@@ -7,8 +7,16 @@ from datetime import timedelta
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated, AllowAny # Importado
-from django.db.models import Q
-from .nlp_parser import parse_natural_query
+from django.db.models import Q, Prefetch
+from .nlp_parser import parse_natural_query_async
+from .search import buscar_productos, sugerir_productos
+from .cache import CatalogoCacheMixin, cache_activo, empresa_del_request
+from .pricing import tabla_precios
+from . import importacion
+from tenants.quotas import CupoPlanPermission
+from utils.async_db import en_bd
+from utils.async_views import AsyncAPIView
+from utils.throttling import TokenBucketThrottle, con_semaforo
 from rest_framework.views import APIView
 
 from .models import (
@@ -33,13 +41,14 @@ from .serializers import (
 )
 from utils.permissions import ModulePermission
 from utils.viewsets import SoftDeleteViewSet
+from utils.logging_utils import log_action
 
 # ---
 # NOTA: Asumo que todos estos modelos (Marca, Categoria, etc.)
 # tienen un campo 'empresa' y 'esta_activo'
 # ---
 
-class MarcaViewSet(SoftDeleteViewSet):
+class MarcaViewSet(CatalogoCacheMixin, SoftDeleteViewSet):
     permission_classes = [AllowAny]
     queryset = Marca.objects.all().order_by('nombre')
     serializer_class = MarcaSerializer
@@ -47,13 +56,13 @@ class MarcaViewSet(SoftDeleteViewSet):
 
     # --- CAMBIO AQUÍ ---
     def get_queryset(self):
-        queryset = Marca.objects.all() # Base
+        queryset = Marca.objects.select_related("empresa") # Base
         if self.request.user and self.request.user.is_authenticated:
             return queryset.filter(empresa=self.request.user.empresa, esta_activo=True)
         # Filtro público para la empresa 1
         return queryset.filter(empresa_id=1, esta_activo=True)
 
-class CategoriaViewSet(SoftDeleteViewSet):
+class CategoriaViewSet(CatalogoCacheMixin, SoftDeleteViewSet):
     permission_classes = [AllowAny]
     queryset = Categoria.objects.all().order_by('nombre')
     serializer_class = CategoriaSerializer
@@ -61,13 +70,15 @@ class CategoriaViewSet(SoftDeleteViewSet):
 
     # --- CAMBIO AQUÍ ---
     def get_queryset(self):
-        queryset = Categoria.objects.all() # Base
+        queryset = Categoria.objects.select_related("empresa").prefetch_related(
+            Prefetch("subcategorias", queryset=SubCategoria.objects.select_related("categoria", "empresa"))
+        ) # Base
         if self.request.user and self.request.user.is_authenticated:
             return queryset.filter(empresa=self.request.user.empresa, esta_activo=True)
         # Filtro público para la empresa 1
         return queryset.filter(empresa_id=1, esta_activo=True)
 
-class SubCategoriaViewSet(SoftDeleteViewSet): 
+class SubCategoriaViewSet(CatalogoCacheMixin, SoftDeleteViewSet): 
     permission_classes = [AllowAny]
     queryset = SubCategoria.objects.all().order_by('categoria__nombre', 'nombre')
     serializer_class = SubCategoriaSerializer
@@ -75,17 +86,18 @@ class SubCategoriaViewSet(SoftDeleteViewSet):
 
     # --- CAMBIO AQUÍ ---
     def get_queryset(self):
-        queryset = SubCategoria.objects.all() # Base
+        queryset = SubCategoria.objects.select_related("categoria", "empresa") # Base
         if self.request.user and self.request.user.is_authenticated:
             return queryset.filter(empresa=self.request.user.empresa, esta_activo=True)
         # Filtro público para la empresa 1
         return queryset.filter(empresa_id=1, esta_activo=True)
 
-class ProductoViewSet(SoftDeleteViewSet):
+class ProductoViewSet(CatalogoCacheMixin, SoftDeleteViewSet):
     queryset = Producto.objects.all().order_by('nombre')
     serializer_class = ProductoSerializer
     module_name = "Producto"
-    permission_classes = [AllowAny]
+    permission_classes = [AllowAny, CupoPlanPermission]
+    recurso_cupo = "productos"
 
     def get_queryset(self):
         # Empresa actual
@@ -99,6 +111,7 @@ class ProductoViewSet(SoftDeleteViewSet):
                 empresa_id=1,
                 esta_activo=True
             )
+        qs = qs.para_catalogo()
 
         # ================================
         # 🔥 FILTRO POR CATEGORIA (NIVEL 1)
@@ -122,14 +135,74 @@ class ProductoViewSet(SoftDeleteViewSet):
             qs = qs.filter(marca_id=marca)
 
         # ================================
-        # 🔥 FILTRO POR NOMBRE
+        # 🔥 BÚSQUEDA DE TEXTO (indexada, ordenada por relevancia)
+        # nombre, sku, descripción, marca y (sub)categoría
         # ================================
-        nombre = self.request.query_params.get("nombre")
-        if nombre:
-            qs = qs.filter(nombre__icontains=nombre)
+        texto = self.request.query_params.get("q") or self.request.query_params.get("nombre")
+        if texto and self.action != "sugerir":
+            return buscar_productos(qs, texto)
 
         return qs.order_by("nombre")
 
+    def get_serializer(self, *args, **kwargs):
+        # Productos que se van a serializar (la página o el detalle) para el motor de precios
+        if self.action in ("list", "retrieve") and args:
+            self._producto_ids = [p.id for p in args[0]] if kwargs.get("many") else [args[0].id]
+        return super().get_serializer(*args, **kwargs)
+
+    def get_serializer_context(self):
+        """Precio final y descuento vigente salen del motor de precios (?sucursal= opcional)."""
+        context = super().get_serializer_context()
+        if self.action in ("list", "retrieve"):
+            sucursal = self.request.query_params.get("sucursal")
+            # La tabla completa solo conviene en el listado con cache compartido;
+            # si no, se calculan únicamente los productos de la respuesta
+            producto_ids = None if self.action == "list" and cache_activo() else getattr(self, "_producto_ids", None)
+            context["precios"] = tabla_precios(
+                empresa_del_request(self.request),
+                int(sucursal) if sucursal and sucursal.isdigit() else None,
+                producto_ids=producto_ids,
+            )
+        return context
+
+    @action(detail=False, methods=["post"], url_path="importar", permission_classes=[ModulePermission])
+    def importar(self, request):
+        """
+        Importación masiva del catálogo desde un .csv o .xlsx (campo `archivo`).
+        Para archivos muy grandes usar el comando `importar_catalogo`.
+        """
+        archivo = request.FILES.get("archivo")
+        empresa = getattr(request.user, "empresa", None)
+        if not archivo or empresa is None:
+            return Response(
+                {"detail": "Se requiere un archivo (.csv o .xlsx) y un usuario con empresa."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        reporte = importacion.importar_catalogo(empresa, importacion.leer_catalogo(archivo.file, archivo.name))
+        log_action(
+            user=request.user,
+            modulo=self.module_name,
+            accion="CREAR",
+            descripcion=importacion.resumen_bitacora(reporte, archivo.name),
+            request=request,
+        )
+        return Response(reporte, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="sugerir")
+    def sugerir(self, request):
+        """
+        Autocompletado del buscador: /producto/sugerir/?q=sams
+        """
+        texto = request.query_params.get("q", "")
+        try:
+            limite = max(1, min(int(request.query_params.get("limite", 8)), 20))
+        except ValueError:
+            limite = 8
+        if len(texto.strip()) < 2:
+            return Response([])
+        return Response(sugerir_productos(self.get_queryset(), texto, limite=limite))
+
 class DetalleProductoViewSet(SoftDeleteViewSet):
     queryset = DetalleProducto.objects.all()
     serializer_class = DetalleProductoSerializer
@@ -159,7 +232,7 @@ class ImagenProductoViewSet(SoftDeleteViewSet):
         return queryset.filter(producto__empresa_id=1, producto__esta_activo=True)
 
 
-class CampaniaViewSet(SoftDeleteViewSet):
+class CampaniaViewSet(CatalogoCacheMixin, SoftDeleteViewSet):
     permission_classes = [AllowAny]
     queryset = Campania.objects.all()
     serializer_class = CampaniaSerializer
@@ -167,7 +240,7 @@ class CampaniaViewSet(SoftDeleteViewSet):
 
     # --- CAMBIO AQUÍ ---
     def get_queryset(self):
-        queryset = Campania.objects.all() # Base
+        queryset = Campania.objects.select_related("empresa") # Base
         if self.request.user and self.request.user.is_authenticated:
             return queryset.filter(empresa=self.request.user.empresa, esta_activo=True)
         # Filtro público para la empresa 1
@@ -188,24 +261,32 @@ class DescuentoViewSet(SoftDeleteViewSet):
         return queryset.filter(empresa_id=1, esta_activo=True)
     
 
-class BuscarProductoNLPView(APIView):
+class BuscarProductoNLPView(AsyncAPIView):
     permission_classes = [AllowAny] # Correcto
+    throttle_classes = [TokenBucketThrottle]  # Gemini: por empresa, o por IP si es anónimo
+    throttle_scope = "llm"
     """
     Recibe un prompt de texto, lo interpreta con Gemini (Retail),
     y devuelve una lista de productos que coinciden.
     """
-    def post(self, request, *args, **kwargs):
+    @con_semaforo("llm")
+    async def post(self, request, *args, **kwargs):
         
         prompt = request.data.get('prompt', '')
         if not prompt:
             return Response({"error": "No se proporcionó un 'prompt' de texto."}, status=400)
 
-        # 1. Llamar al "Intérprete" de Productos (El nuevo)
-        parsed_json = parse_natural_query(prompt)
+        # 1. Llamar al "Intérprete" de Productos (Gemini async: no ocupa un hilo)
+        parsed_json = await parse_natural_query_async(prompt)
         
         if "error" in parsed_json:
             return Response(parsed_json, status=500)
 
+        # 2 y 3. Consulta y serialización (ORM: fuera del loop)
+        return Response(await en_bd(self.buscar, request, parsed_json))
+
+    def buscar(self, request, parsed_json):
+
         # --- CAMBIO AQUÍ ---
         # Determinar la empresa ANTES de hacer la consulta
         empresa_a_filtrar = 1  # Por defecto es 1 (público)
@@ -218,21 +299,20 @@ class BuscarProductoNLPView(APIView):
         queryset = Producto.objects.filter(
             empresa_id=empresa_a_filtrar, # <-- USAMOS LA VARIABLE
             esta_activo=True
-        )
+        ).para_catalogo()
         
         # --- ¡FILTROS MEJORADOS! ---
         
-        # Filtro de Nombre (si existe)
+        # Filtro de Nombre (si existe) -> búsqueda indexada por relevancia
         if parsed_json.get('nombre_producto'):
-            queryset = queryset.filter(
-                nombre__icontains=parsed_json['nombre_producto']
-            )
+            queryset = buscar_productos(queryset, parsed_json['nombre_producto'])
         
         # (El resto de tus filtros están bien y no necesitan cambios)
         ...
         
         # 3. Serializar y Devolver los Resultados
-        productos_encontrados = queryset.distinct()[:50]
+        productos_encontrados = list(queryset[:50])
+        precios = tabla_precios(empresa_a_filtrar, producto_ids=[p.id for p in productos_encontrados])
         
-        serializer = ProductoSerializer(productos_encontrados, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        serializer = ProductoSerializer(productos_encontrados, many=True, context={"precios": precios})
+        return serializer.data
\ No newline at end of file
@@ -16,6 +16,8 @@ from users.models import User
 
 from reportes.generators import generar_reporte_pdf, generar_reporte_excel
 from reportes.services.llm_interpreter import interpretar_prompt
+from utils.replica import alias_analitica
+from utils.throttling import TokenBucketThrottle, con_semaforo
 
 
 # ============================================
@@ -109,20 +111,23 @@ def _build_queryset_from_interpretacion(user, interpretacion):
     if not empresa:
         raise ValueError("El usuario no tiene empresa asignada.")
 
+    # Reporte libre sobre toda la historia: réplica de analítica si está al día
+    db = alias_analitica(empresa.id)
+
     if tipo == "ventas":
         ModelClass = Venta
-        qs = Venta.objects.filter(empresa=empresa)\
+        qs = Venta.objects.using(db).filter(empresa=empresa)\
             .select_related("usuario", "sucursal")\
             .prefetch_related("detalles__producto")
 
     elif tipo == "productos":
         ModelClass = Producto
-        qs = Producto.objects.filter(empresa=empresa, esta_activo=True)\
+        qs = Producto.objects.using(db).filter(empresa=empresa, esta_activo=True)\
             .select_related("marca", "subcategoria__categoria")
 
     elif tipo == "usuarios":
         ModelClass = User
-        qs = User.objects.filter(empresa=empresa, esta_activo=True)
+        qs = User.objects.using(db).filter(empresa=empresa, esta_activo=True)
 
     else:
         raise ValueError(f"tipo_reporte '{tipo}' no soportado.")
@@ -171,7 +176,10 @@ def _build_queryset_from_interpretacion(user, interpretacion):
 
 class GenerarReporteView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "llm"
 
+    @con_semaforo("llm")
     def post(self, request):
 
         prompt = request.data.get("prompt", "")
@@ -245,7 +253,10 @@ class GenerarReporteView(APIView):
 
 class ExportarDatosView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "reportes"
 
+    @con_semaforo("reportes")
     def post(self, request):
         data = request.data.get("data")
         formato = request.data.get("formato")
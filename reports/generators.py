@@ -10,6 +10,7 @@ import pandas as pd
 from weasyprint import HTML
 
 from ventas.models import DetalleVenta, Venta, Pago
+from utils.replica import db_analitica
 
 # --- FUNCIÓN 1: REPORTE DE PRODUCTO ---
 def generar_reporte_producto(request, formato, fecha_inicio, fecha_fin):
@@ -18,8 +19,9 @@ def generar_reporte_producto(request, formato, fecha_inicio, fecha_fin):
     fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d')
     fecha_fin_str = fecha_fin.strftime('%Y-%m-%d')
 
-    # 1. Consulta Base
-    base_query = Venta.objects.filter(
+    # 1. Consulta Base (réplica de analítica si está al día)
+    db = db_analitica(request)
+    base_query = Venta.objects.using(db).filter(
         estado='Completado',
         empresa=request.user.empresa
     )
@@ -32,7 +34,7 @@ def generar_reporte_producto(request, formato, fecha_inicio, fecha_fin):
 
     # 2. Consulta Específica del Reporte
     ventas_ids = ventas_filtradas.values_list('id', flat=True)
-    datos_reporte = DetalleVenta.objects.filter(
+    datos_reporte = DetalleVenta.objects.using(db).filter(
         venta__id__in=ventas_ids
     ).values(
         'producto__nombre', 'producto__sku'
@@ -93,8 +95,9 @@ def generar_reporte_sucursal(request, formato, fecha_inicio, fecha_fin):
     fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d')
     fecha_fin_str = fecha_fin.strftime('%Y-%m-%d')
 
-    # 1. Consulta Base
-    base_query = Venta.objects.filter(
+    # 1. Consulta Base (réplica de analítica si está al día)
+    db = db_analitica(request)
+    base_query = Venta.objects.using(db).filter(
         estado='Completado',
         empresa=request.user.empresa
     )
@@ -163,8 +166,9 @@ def generar_reporte_vendedor(request, formato, fecha_inicio, fecha_fin):
     fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d')
     fecha_fin_str = fecha_fin.strftime('%Y-%m-%d')
 
-    # 1. Consulta Base
-    base_query = Venta.objects.filter(
+    # 1. Consulta Base (réplica de analítica si está al día)
+    db = db_analitica(request)
+    base_query = Venta.objects.using(db).filter(
         estado='Completado',
         empresa=request.user.empresa,
         canal='POS' # El filtro clave de este reporte
@@ -233,8 +237,8 @@ def generar_reporte_metodo_pago(request, formato, fecha_inicio, fecha_fin):
     fecha_inicio_str = fecha_inicio.strftime('%Y-%m-%d')
     fecha_fin_str = fecha_fin.strftime('%Y-%m-%d')
 
-    # 1. Consulta Base
-    base_query = Pago.objects.filter(
+    # 1. Consulta Base (réplica de analítica si está al día)
+    base_query = Pago.objects.using(db_analitica(request)).filter(
         estado='completado',
         empresa=request.user.empresa
     )
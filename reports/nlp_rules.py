@@ -0,0 +1,198 @@
+# reports/nlp_rules.py
+# Intérprete local (sin IA) para las peticiones de reportes.
+# Cubre la mayoría de prompts ("ventas por sucursal del mes pasado en excel")
+# con expresiones regulares precompiladas, y solo cuando NO está seguro
+# devuelve None para que se consulte a Gemini.
+
+import calendar
+import re
+import unicodedata
+from datetime import date, timedelta
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin tildes y con espacios colapsados."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = texto.replace("\xa0", " ")
+    return " ".join(texto.split())
+
+
+# ===========================================
+# 🔵 Tipos de reporte (los 4 de la "Fábrica")
+# ===========================================
+REGEX_REPORTES = {
+    "ingresos_metodo_pago": re.compile(
+        r"\b(metodos? de pago|formas? de pago|medios? de pago|metodo pago|ingresos? por (metodo|pago)|pagos?)\b"
+    ),
+    "ventas_vendedor": re.compile(r"\b(vendedor(es|as?)?|empleados?|cajer[oa]s?|asesor(es)?)\b"),
+    "ventas_sucursal": re.compile(r"\b(sucursal(es)?|tiendas?|locales?|agencias?)\b"),
+    "ventas_producto": re.compile(r"\b(productos?|articulos?|skus?|items?)\b"),
+}
+
+# ===========================================
+# 🔵 Formatos
+# ===========================================
+REGEX_FORMATOS = [
+    ("excel", re.compile(r"\b(excel|xlsx|hoja de calculo|planilla)\b")),
+    ("csv", re.compile(r"\bcsv\b")),
+    ("pdf", re.compile(r"\bpdf\b")),
+]
+
+# ===========================================
+# 🔵 Fechas
+# ===========================================
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
+    "noviembre": 11, "diciembre": 12,
+}
+_MESES_RE = "|".join(MESES)
+
+RE_ISO = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+RE_DMY = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+RE_ULTIMOS = re.compile(r"\b(?:ultim[oa]s|pasad[oa]s) (\d{1,3}) (dias?|semanas?|mes(?:es)?)\b")
+RE_MES = re.compile(rf"\b({_MESES_RE})(?: (?:de |del )?(\d{{4}}))?\b")
+RE_ANIO = re.compile(r"\b(?:de|del|en|ano) (\d{4})\b")
+
+# Palabras que indican que el usuario pidió un rango de fechas.
+# Si aparecen y ninguna regla las resolvió, la respuesta local no es confiable.
+RE_PISTA_TEMPORAL = re.compile(
+    rf"\b(hoy|ayer|semana|mes|meses|ano|anos|dias?|trimestre|semestre|quincena|"
+    rf"desde|hasta|entre|navidad|temporada|{_MESES_RE}|\d{{4}})\b"
+)
+
+# Calificadores de rango que las reglas no resuelven ("primer trimestre",
+# "desde marzo", "del 2023 al 2024"): si quedan, se consulta al LLM
+RE_CALIFICADOR = re.compile(r"\b(trimestres?|semestres?|quincenas?|desde|hasta|entre|al)\b")
+RE_ANIO_SUELTO = re.compile(r"\b\d{4}\b")
+
+
+def _rango_mes(anio, mes):
+    ultimo = calendar.monthrange(anio, mes)[1]
+    return date(anio, mes, 1), date(anio, mes, ultimo)
+
+
+def _restar_meses(d, meses):
+    total = d.year * 12 + (d.month - 1) - meses
+    anio, mes = divmod(total, 12)
+    return date(anio, mes + 1, 1)
+
+
+def _parse_fecha(anio, mes, dia):
+    try:
+        return date(int(anio), int(mes), int(dia))
+    except ValueError:
+        return None
+
+
+def extraer_rango_fechas(texto: str, hoy: date):
+    """
+    Devuelve (fecha_inicio, fecha_fin) o None si el texto no trae fechas
+    que se puedan resolver localmente.
+    """
+    # 1) Fechas explícitas: "2025-01-01", "01/01/2025"
+    explicitas = [_parse_fecha(*m.groups()) for m in RE_ISO.finditer(texto)]
+    explicitas += [_parse_fecha(m.group(3), m.group(2), m.group(1)) for m in RE_DMY.finditer(texto)]
+    explicitas = [f for f in explicitas if f]
+    if len(explicitas) >= 2:
+        inicio, fin = sorted(explicitas[:2])
+        return inicio, fin
+
+    # Un rango a medias es peor que ninguno: None para que decida el LLM
+    resto = RE_DMY.sub(" ", RE_ISO.sub(" ", texto))
+    if RE_CALIFICADOR.search(resto) or len(RE_ANIO_SUELTO.findall(resto)) > 1:
+        return None
+
+    if len(explicitas) == 1:
+        return explicitas[0], explicitas[0]
+
+    # 2) Expresiones relativas
+    if re.search(r"\bhoy\b", texto):
+        return hoy, hoy
+    if re.search(r"\bayer\b", texto):
+        ayer = hoy - timedelta(days=1)
+        return ayer, ayer
+
+    m = RE_ULTIMOS.search(texto)
+    if m:
+        n = int(m.group(1))
+        unidad = m.group(2)
+        if unidad.startswith("dia"):
+            return hoy - timedelta(days=n), hoy
+        if unidad.startswith("semana"):
+            return hoy - timedelta(weeks=n), hoy
+        return _restar_meses(hoy, n), hoy
+
+    if re.search(r"\b(esta semana|semana actual)\b", texto):
+        return hoy - timedelta(days=hoy.weekday()), hoy
+    if re.search(r"\b(semana pasada|ultima semana|semana anterior)\b", texto):
+        lunes = hoy - timedelta(days=hoy.weekday() + 7)
+        return lunes, lunes + timedelta(days=6)
+
+    if re.search(r"\b(este mes|mes actual|lo que va del mes)\b", texto):
+        return hoy.replace(day=1), hoy
+    if re.search(r"\b(mes pasado|ultimo mes|mes anterior)\b", texto):
+        anterior = _restar_meses(hoy, 1)
+        return _rango_mes(anterior.year, anterior.month)
+
+    if re.search(r"\b(este ano|ano actual|lo que va del ano)\b", texto):
+        return date(hoy.year, 1, 1), hoy
+    if re.search(r"\b(ano pasado|ultimo ano|ano anterior)\b", texto):
+        return date(hoy.year - 1, 1, 1), date(hoy.year - 1, 12, 31)
+
+    # 3) "de septiembre", "octubre 2024", "de enero de 2025"
+    meses = list(RE_MES.finditer(texto))
+    if len(meses) == 1:
+        mes = MESES[meses[0].group(1)]
+        anio = meses[0].group(2)
+        if anio:
+            anio = int(anio)
+        else:
+            # Sin año: el último mes con ese nombre que ya empezó
+            anio = hoy.year if mes <= hoy.month else hoy.year - 1
+        return _rango_mes(anio, mes)
+
+    # 4) "de 2024", "del 2023"
+    m = RE_ANIO.search(texto)
+    if m and not meses:
+        anio = int(m.group(1))
+        return date(anio, 1, 1), date(anio, 12, 31)
+
+    return None
+
+
+def interpretar_con_reglas(texto_usuario: str, hoy: date):
+    """
+    Intenta resolver el prompt sin IA.
+
+    Devuelve un dict con el mismo formato que `parse_natural_query`
+    (reporte_a_generar, formato, fecha_inicio, fecha_fin) si la
+    interpretación es confiable, o None si hay que consultar al LLM.
+    """
+    texto = normalizar(texto_usuario)
+
+    # Tipo de reporte: debe haber UNA sola coincidencia
+    candidatos = [nombre for nombre, regex in REGEX_REPORTES.items() if regex.search(texto)]
+    if len(candidatos) != 1:
+        return None
+    reporte = candidatos[0]
+
+    # Formato: uno solo o ninguno (default pdf, igual que el prompt de Gemini)
+    formatos = [nombre for nombre, regex in REGEX_FORMATOS if regex.search(texto)]
+    if len(formatos) > 1:
+        return None
+    formato = formatos[0] if formatos else "pdf"
+
+    # Fechas: si hay pistas temporales, tienen que haberse resuelto
+    rango = extraer_rango_fechas(texto, hoy)
+    if rango is None and (RE_PISTA_TEMPORAL.search(texto) or RE_CALIFICADOR.search(texto)):
+        return None
+
+    fecha_inicio, fecha_fin = (rango if rango else ("", ""))
+    return {
+        "reporte_a_generar": reporte,
+        "formato": formato,
+        "fecha_inicio": str(fecha_inicio),
+        "fecha_fin": str(fecha_fin),
+    }
@@ -1,8 +1,14 @@
 import json
 from decouple import config
 import google.generativeai as genai
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone # Para saber la fecha de "hoy"
 
+from utils.async_db import con_timeout
+from .nlp_rules import interpretar_con_reglas
+
 # reports/nlp_utils.py
 # ... (importaciones) ...
 
@@ -65,72 +71,194 @@ Devuelve SOLAMENTE el objeto JSON.
 """
 # ----------------------------------------------------
 
-def parse_natural_query(texto_usuario: str) -> dict:
-    
+def _modelo():
+    """Modelo de Gemini configurado, o None si falta la API key."""
     api_key = config('API_GEMINI', default=config('GOOGLE_API_KEY', default=''))
     if not api_key:
         print("ERROR: Clave API_GEMINI no configurada.")
-        return {"error": "API Key no configurada"}
+        return None
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-2.5-flash')
+
+
+def _armar_prompt(texto_usuario: str) -> str:
+    fecha_hoy_str = timezone.now().strftime('%Y-%m-%d')
+    return PROMPT_PLANTILLA.format(
+        texto_usuario=texto_usuario,
+        fecha_hoy=fecha_hoy_str  # <-- Esta es la variable que causaba el KeyError
+    )
+
+
+def _leer_json(raw_text: str) -> dict:
+    raw_text = raw_text.strip()
+
+    # (Limpieza de JSON...)
+    if raw_text.startswith("```json"):
+        raw_text = raw_text.lstrip("```json").rstrip("```").strip()
+    elif raw_text.startswith("```"):
+        raw_text = raw_text.lstrip("```").rstrip("```").strip()
+
+    try:
+        return json.loads(raw_text)
+    except json.JSONDecodeError:
+        print(f"Error JSON Decode: No se pudo parsear. Texto crudo: '{raw_text}'")
+        return {"error": "Respuesta de IA no es un JSON válido"}
+
+
+def parse_natural_query(texto_usuario: str) -> dict:
     
     try:
-        genai.configure(api_key=api_key)
-        # ¡Usamos 'gemini-pro' que sí existe en la API v1beta!
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        fecha_hoy_str = timezone.now().strftime('%Y-%m-%d')
-        prompt_final = PROMPT_PLANTILLA.format(
-            texto_usuario=texto_usuario,
-            fecha_hoy=fecha_hoy_str  # <-- Esta es la variable que causaba el KeyError
+        model = _modelo()
+        if model is None:
+            return {"error": "API Key no configurada"}
+
+        response = model.generate_content(
+            _armar_prompt(texto_usuario),
+            request_options={"timeout": settings.GEMINI_TIMEOUT},
         )
+        return _leer_json(response.text)
 
-        response = model.generate_content(prompt_final)
-        raw_text = response.text.strip()
-        
-        # (Limpieza de JSON...)
-        if raw_text.startswith("```json"):
-            raw_text = raw_text.lstrip("```json").rstrip("```").strip()
-        elif raw_text.startswith("```"):
-            raw_text = raw_text.lstrip("```").rstrip("```").strip()
+    except Exception as e:
+        print(f"Error FATAL en Gemini API: {type(e).__name__}: {e}")
+        return {"error": f"Error de API: {e}"}
 
-        parsed_json = json.loads(raw_text)
-        return parsed_json
 
-    except json.JSONDecodeError as e:
-        print(f"Error JSON Decode: No se pudo parsear. Texto crudo: '{raw_text}'")
-        return {"error": "Respuesta de IA no es un JSON válido"} 
+async def parse_natural_query_async(texto_usuario: str) -> dict:
+    """Igual que parse_natural_query, con el cliente async de Gemini (vistas ASGI)."""
+    try:
+        model = _modelo()
+        if model is None:
+            return {"error": "API Key no configurada"}
+
+        response = await con_timeout(
+            model.generate_content_async(
+                _armar_prompt(texto_usuario),
+                request_options={"timeout": settings.GEMINI_TIMEOUT},
+            ),
+            settings.GEMINI_TIMEOUT,
+        )
+        return _leer_json(response.text)
+
+    except TimeoutError:
+        return {"error": "Gemini no respondió a tiempo"}
 
     except Exception as e:
         print(f"Error FATAL en Gemini API: {type(e).__name__}: {e}")
         return {"error": f"Error de API: {e}"}
     
-def analyze_data_with_gemini(datos_json: str, prompt_analista: str) -> dict:
+# ----------------- INTÉRPRETE EN DOS NIVELES -----------------
+# Nivel 1: reglas locales (microsegundos). Nivel 2: Gemini (segundos).
+# Los contadores viven en el cache de Django para poder medir la tasa de aciertos.
+
+ORIGENES_INTERPRETACION = ("reglas", "llm", "llm_error")
+CACHE_PREFIX_ESTADISTICAS = "reports:nlp:origen:"
+
+
+def _registrar_origen(origen: str):
+    key = f"{CACHE_PREFIX_ESTADISTICAS}{origen}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # La clave expiró/evictó entre add() e incr()
+        cache.set(key, 1, timeout=None)
+
+
+def interpretar_consulta_reporte(texto_usuario: str) -> dict:
     """
-    Toma un string JSON de datos y un prompt, y le pide a Gemini que los analice.
+    Resuelve el prompt con reglas locales y solo llama a Gemini
+    cuando las reglas no están seguras. Agrega la clave 'origen'.
     """
-    
-    api_key = config('API_GEMINI', default=config('GOOGLE_API_KEY', default=''))
-    if not api_key:
-        print("ERROR: Clave API_GEMINI no configurada.")
-        return {"error": "API Key no configurada"}
+    resultado = interpretar_con_reglas(texto_usuario, timezone.localdate())
+    if resultado is not None:
+        _registrar_origen("reglas")
+        resultado["origen"] = "reglas"
+        return resultado
 
-    try:
-        genai.configure(api_key=api_key)
-        # Usamos el modelo que SÍ te funciona
-        model = genai.GenerativeModel('gemini-2.5-flash') 
+    resultado = parse_natural_query(texto_usuario)
+    origen = "llm_error" if "error" in resultado else "llm"
+    _registrar_origen(origen)
+    resultado["origen"] = origen
+    return resultado
+
+
+async def interpretar_consulta_reporte_async(texto_usuario: str) -> dict:
+    """Versión async: las reglas corren en el loop, Gemini con su cliente async."""
+    resultado = interpretar_con_reglas(texto_usuario, timezone.localdate())
+    if resultado is not None:
+        await sync_to_async(_registrar_origen)("reglas")
+        resultado["origen"] = "reglas"
+        return resultado
+
+    resultado = await parse_natural_query_async(texto_usuario)
+    origen = "llm_error" if "error" in resultado else "llm"
+    await sync_to_async(_registrar_origen)(origen)
+    resultado["origen"] = origen
+    return resultado
 
-        # ¡Este es el prompt del Analista!
-        # Combina el prompt de instrucciones con los datos.
-        prompt_final = f"""
+
+def obtener_estadisticas_interprete() -> dict:
+    """Cantidad de prompts resueltos por cada nivel y la tasa de aciertos locales."""
+    conteos = cache.get_many([f"{CACHE_PREFIX_ESTADISTICAS}{o}" for o in ORIGENES_INTERPRETACION])
+    datos = {o: conteos.get(f"{CACHE_PREFIX_ESTADISTICAS}{o}", 0) for o in ORIGENES_INTERPRETACION}
+    total = sum(datos.values())
+    datos["total"] = total
+    datos["tasa_reglas"] = round(datos["reglas"] / total, 4) if total else 0.0
+    return datos
+
+
+def _prompt_analisis(datos_json: str, prompt_analista: str) -> str:
+    # ¡Este es el prompt del Analista!
+    # Combina el prompt de instrucciones con los datos.
+    return f"""
         {prompt_analista}
 
         Aquí están los datos en formato JSON:
         {datos_json}
         """
 
-        response = model.generate_content(prompt_final)
+
+def analyze_data_with_gemini(datos_json: str, prompt_analista: str) -> dict:
+    """
+    Toma un string JSON de datos y un prompt, y le pide a Gemini que los analice.
+    """
+    try:
+        model = _modelo()
+        if model is None:
+            return {"error": "API Key no configurada"}
+
+        response = model.generate_content(
+            _prompt_analisis(datos_json, prompt_analista),
+            request_options={"timeout": settings.GEMINI_TIMEOUT},
+        )
         
         # Para el análisis, solo devolvemos el texto crudo.
         return {"analisis": response.text.strip()}
 
     except Exception as e:
         print(f"Error FATAL en Gemini API (Analisis): {type(e).__name__}: {e}")
-        return {"error": f"Error de API: {e}"}
\ No newline at end of file
+        return {"error": f"Error de API: {e}"}
+
+
+async def analyze_data_with_gemini_async(datos_json: str, prompt_analista: str) -> dict:
+    """Versión async de analyze_data_with_gemini."""
+    try:
+        model = _modelo()
+        if model is None:
+            return {"error": "API Key no configurada"}
+
+        response = await con_timeout(
+            model.generate_content_async(
+                _prompt_analisis(datos_json, prompt_analista),
+                request_options={"timeout": settings.GEMINI_TIMEOUT},
+            ),
+            settings.GEMINI_TIMEOUT,
+        )
+        return {"analisis": response.text.strip()}
+
+    except TimeoutError:
+        return {"error": "Gemini no respondió a tiempo"}
+
+    except Exception as e:
+        print(f"Error FATAL en Gemini API (Analisis): {type(e).__name__}: {e}")
+        return {"error": f"Error de API: {e}"}
@@ -1,3 +1,112 @@
-from django.test import TestCase
+from datetime import date
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from .nlp_rules import extraer_rango_fechas, interpretar_con_reglas
+from .nlp_utils import interpretar_consulta_reporte, obtener_estadisticas_interprete
+
+HOY = date(2025, 3, 12)  # miércoles
+
+
+class ReglasReporteTests(SimpleTestCase):
+    """Intérprete local: tipo de reporte, formato y rangos de fechas sin IA."""
+
+    def test_reporte_formato_y_mes_pasado(self):
+        self.assertEqual(
+            interpretar_con_reglas("Ventas por sucursal del último mes en Excel", HOY),
+            {
+                "reporte_a_generar": "ventas_sucursal",
+                "formato": "excel",
+                "fecha_inicio": "2025-02-01",
+                "fecha_fin": "2025-02-28",
+            },
+        )
+
+    def test_sin_fechas_ni_formato(self):
+        resultado = interpretar_con_reglas("ingresos por método de pago", HOY)
+        self.assertEqual(resultado["reporte_a_generar"], "ingresos_metodo_pago")
+        self.assertEqual((resultado["formato"], resultado["fecha_inicio"]), ("pdf", ""))
+
+    def test_rangos_relativos(self):
+        casos = {
+            "esta semana": (date(2025, 3, 10), HOY),
+            "semana pasada": (date(2025, 3, 3), date(2025, 3, 9)),
+            "este mes": (date(2025, 3, 1), HOY),
+            "ultimos 7 dias": (date(2025, 3, 5), HOY),
+            "ayer": (date(2025, 3, 11), date(2025, 3, 11)),
+            "ano pasado": (date(2024, 1, 1), date(2024, 12, 31)),
+            "de octubre": (date(2024, 10, 1), date(2024, 10, 31)),
+        }
+        for texto, esperado in casos.items():
+            with self.subTest(texto=texto):
+                self.assertEqual(extraer_rango_fechas(texto, HOY), esperado)
+
+    def test_fechas_explicitas(self):
+        self.assertEqual(
+            extraer_rango_fechas("desde 2025-01-31 hasta 01/01/2025", HOY),
+            (date(2025, 1, 1), date(2025, 1, 31)),
+        )
+        self.assertEqual(extraer_rango_fechas("2025-02-30", HOY), None)
+
+    def test_ambiguo_va_al_llm(self):
+        # Dos tipos de reporte, dos formatos o una fecha que las reglas no resuelven
+        self.assertIsNone(interpretar_con_reglas("productos por sucursal", HOY))
+        self.assertIsNone(interpretar_con_reglas("ventas por vendedor en pdf y csv", HOY))
+        self.assertIsNone(interpretar_con_reglas("ventas por vendedor de la quincena", HOY))
+
+    def test_rangos_parciales_van_al_llm(self):
+        # Las reglas no deben devolver un rango recortado o de más
+        for texto in (
+            "ventas por sucursal del primer trimestre de 2024",
+            "ventas por sucursal desde 2025-01-01",
+            "ventas por sucursal desde marzo",
+            "ventas por sucursal del 2023 al 2024",
+            "ventas por sucursal del segundo semestre",
+        ):
+            with self.subTest(texto=texto):
+                self.assertIsNone(extraer_rango_fechas(texto, HOY))
+                self.assertIsNone(interpretar_con_reglas(texto, HOY))
+
+
+class InterpreteDosNivelesTests(SimpleTestCase):
+    """Reglas primero, Gemini solo si no están seguras; contadores para las estadísticas."""
+
+    def setUp(self):
+        cache.clear()
+
+    def _gemini(self, texto):
+        modelo = MagicMock()
+        modelo.generate_content.return_value = MagicMock(text=texto)
+        return patch("reports.nlp_utils._modelo", return_value=modelo)
+
+    def test_reglas_no_llaman_a_gemini(self):
+        with self._gemini("{}") as modelo:
+            resultado = interpretar_consulta_reporte("ventas por producto de hoy en csv")
+        modelo.assert_not_called()
+        self.assertEqual(resultado["origen"], "reglas")
+        self.assertEqual(resultado["formato"], "csv")
+
+    def test_fallback_a_gemini(self):
+        respuesta = '```json\n{"reporte_a_generar": "ventas_vendedor", "formato": "pdf"}\n```'
+        with self._gemini(respuesta) as modelo:
+            resultado = interpretar_consulta_reporte("ventas por vendedor de la quincena")
+        modelo.return_value.generate_content.assert_called_once()
+        self.assertEqual(resultado["reporte_a_generar"], "ventas_vendedor")
+        self.assertEqual(resultado["origen"], "llm")
+
+    def test_contadores(self):
+        with self._gemini("no es json"):
+            interpretar_consulta_reporte("ventas por sucursal")
+            interpretar_consulta_reporte("ventas por sucursal del mes pasado")
+            interpretar_consulta_reporte("productos por sucursal")
+        self.assertEqual(
+            obtener_estadisticas_interprete(),
+            {"reglas": 2, "llm": 0, "llm_error": 1, "total": 3, "tasa_reglas": 0.6667},
+        )
+
+    def test_error_del_llm_no_se_reporta_como_llm(self):
+        with self._gemini("no es json"):
+            resultado = interpretar_consulta_reporte("productos por sucursal")
+        self.assertEqual(resultado["origen"], "llm_error")
@@ -7,6 +7,7 @@ from .views import (
     ReporteVentasPorVendedor,
     ReporteIngresosPorMetodoPago,
     GenerarReporteNLPView,
+    EstadisticasInterpreteNLPView,
     AnalizarVentasProductoView,
 )
 urlpatterns = [
@@ -35,6 +36,11 @@ urlpatterns = [
         GenerarReporteNLPView.as_view(), 
         name='generar-reporte-nlp'
     ),
+    path(
+        'generar-con-nlp/estadisticas/', 
+        EstadisticasInterpreteNLPView.as_view(), 
+        name='estadisticas-interprete-nlp'
+    ),
     path(
         'analizar/ventas-por-producto/', 
         AnalizarVentasProductoView.as_view(), 
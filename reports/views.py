@@ -14,16 +14,46 @@ from django.utils import timezone
 
 # ¡Importamos la "Fábrica" y el "Intérprete"!
 from . import generators
-from .nlp_utils import parse_natural_query, analyze_data_with_gemini
+from .nlp_utils import (
+    interpretar_consulta_reporte_async,
+    obtener_estadisticas_interprete,
+    analyze_data_with_gemini_async,
+)
 
 # Importamos los modelos y filtros para las vistas
 from ventas.models import Venta, Pago, DetalleVenta
+from tenants.quotas import exigir_funcion, requiere_funcion
+from utils.tenant import obtener_tenant
+from utils.async_db import en_bd
+from utils.replica import alias_analitica, db_analitica
+from utils.async_views import AsyncAPIView
+from utils.throttling import SemaforoTenant, TokenBucketThrottle, con_semaforo
 from .filters import ReporteVentaFilter, ReportePagoFilter
 
 # --- CLASE BASE PARA OBTENER FECHAS ---
 # Esto es para no repetir el código de fechas en cada vista
 class BaseReporteView(ListAPIView):
     permission_classes = [IsAdminUser]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'reportes'
+    formato_por_defecto = 'json'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Exportar a Excel depende del plan de la empresa
+        formato = request.query_params.get('formato', self.formato_por_defecto).lower()
+        if formato == 'excel':
+            exigir_funcion(obtener_tenant(request).empresa_id, 'permite_exportar_excel')
+        # Los archivos (PDF/Excel/CSV) ocupan el worker: tope de exportaciones simultáneas
+        self.semaforo = None
+        if formato in ('excel', 'pdf', 'csv'):
+            self.semaforo = SemaforoTenant(request, 'reportes')
+            self.semaforo.adquirir()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if getattr(self, 'semaforo', None):
+            self.semaforo.liberar()
+        return super().finalize_response(request, response, *args, **kwargs)
     
     def get_fechas(self, request):
             """
@@ -76,7 +106,8 @@ class ReporteVentasPorProducto(BaseReporteView):
         if formato in ['excel', 'pdf', 'csv']:
             return generators.generar_reporte_producto(request, formato, fecha_inicio, fecha_fin)
 
-        base_query = Venta.objects.filter(
+        db = db_analitica(request)
+        base_query = Venta.objects.using(db).filter(
             estado='Completado',
             empresa=request.user.empresa
         )
@@ -87,7 +118,7 @@ class ReporteVentasPorProducto(BaseReporteView):
              return Response({"error": "No se encontraron ventas para este rango."}, status=404)
 
         ventas_ids = ventas_filtradas.values_list('id', flat=True)
-        datos_agregados = DetalleVenta.objects.filter(
+        datos_agregados = DetalleVenta.objects.using(db).filter(
             venta__id__in=ventas_ids
         ).values(
             'producto__nombre', 'producto__sku'
@@ -119,7 +150,7 @@ class ReporteVentasPorSucursal(BaseReporteView):
         if formato == 'excel' or formato == 'pdf' or formato == 'csv':
             return generators.generar_reporte_sucursal(request, formato, fecha_inicio, fecha_fin)
 
-        base_query = Venta.objects.filter(
+        base_query = Venta.objects.using(db_analitica(request)).filter(
             estado='Completado',
             empresa=request.user.empresa,
             fecha__range=[fecha_inicio, fecha_fin]
@@ -146,6 +177,7 @@ class ReporteVentasPorSucursal(BaseReporteView):
 class ReporteVentasPorVendedor(BaseReporteView):
     queryset = Venta.objects.all()
     filterset_class = ReporteVentaFilter
+    formato_por_defecto = 'excel'
     
     def get(self, request, *args, **kwargs):
         formato = request.query_params.get('formato', 'excel').lower()
@@ -155,6 +187,7 @@ class ReporteVentasPorVendedor(BaseReporteView):
 class ReporteIngresosPorMetodoPago(BaseReporteView):
     queryset = Pago.objects.all()
     filterset_class = ReportePagoFilter
+    formato_por_defecto = 'excel'
     
     def get(self, request, *args, **kwargs):
         formato = request.query_params.get('formato', 'excel').lower()
@@ -164,26 +197,29 @@ class ReporteIngresosPorMetodoPago(BaseReporteView):
 
 # --- ¡LA NUEVA VISTA DE NLP! ---
 
-class GenerarReporteNLPView(APIView):
+class GenerarReporteNLPView(AsyncAPIView):
     """
-    Recibe un prompt de texto, lo interpreta con Gemini,
-    y genera el reporte correspondiente.
+    Recibe un prompt de texto, lo interpreta (reglas locales y, si no
+    alcanzan, Gemini) y genera el reporte correspondiente.
     """
-    permission_classes = [IsAdminUser]
+    permission_classes = [IsAdminUser, requiere_funcion("permite_reportes_ia")]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "llm"
 
-    def post(self, request, *args, **kwargs):
+    @con_semaforo("llm")
+    async def post(self, request, *args, **kwargs):
         
         prompt = request.data.get('prompt', '')
         if not prompt:
             return Response({"error": "No se proporcionó un 'prompt' de texto."}, status=400)
 
-        # 1. Llamar al "Intérprete" (NLP)
-        parsed_json = parse_natural_query(prompt)
+        # 1. Llamar al "Intérprete" (reglas locales -> Gemini)
+        parsed_json = await interpretar_consulta_reporte_async(prompt)
         
         if "error" in parsed_json:
             return Response(parsed_json, status=500)
 
-        # 2. Extraer parámetros del JSON de Gemini
+        # 2. Extraer parámetros del JSON (mismo formato en ambos niveles)
         reporte = parsed_json.get('reporte_a_generar')
         formato = parsed_json.get('formato', 'pdf') # Default 'pdf'
         fecha_inicio_str = parsed_json.get('fecha_inicio')
@@ -211,29 +247,38 @@ class GenerarReporteNLPView(APIView):
         except ValueError:
             return Response({"error": "Gemini devolvió un formato de fecha inválido."}, status=500)
 
-        # 4. Ser el "Operador" y llamar a la "Fábrica"
-        
-        if reporte == "ventas_producto":
-            return generators.generar_reporte_producto(request, formato, fecha_inicio, fecha_fin)
-            
-        elif reporte == "ventas_sucursal":
-            return generators.generar_reporte_sucursal(request, formato, fecha_inicio, fecha_fin)
-            
-        elif reporte == "ventas_vendedor":
-            return generators.generar_reporte_vendedor(request, formato, fecha_inicio, fecha_fin)
-            
-        elif reporte == "ingresos_metodo_pago":
-            return generators.generar_reporte_metodo_pago(request, formato, fecha_inicio, fecha_fin)
-            
-        else:
+        # 4. Ser el "Operador" y llamar a la "Fábrica" (ORM + PDF/Excel: síncrono)
+        generadores = {
+            "ventas_producto": generators.generar_reporte_producto,
+            "ventas_sucursal": generators.generar_reporte_sucursal,
+            "ventas_vendedor": generators.generar_reporte_vendedor,
+            "ingresos_metodo_pago": generators.generar_reporte_metodo_pago,
+        }
+        generar = generadores.get(reporte)
+        if generar is None:
             return Response({"error": f"El reporte '{reporte}' no es un tipo de reporte válido."}, status=400)
-    
-class AnalizarVentasProductoView(APIView):
+
+        return await en_bd(generar, request, formato, fecha_inicio, fecha_fin)
+
+
+class EstadisticasInterpreteNLPView(APIView):
+    """
+    Devuelve cuántos prompts resolvieron las reglas locales vs. Gemini.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(obtener_estadisticas_interprete())
+
+
+class AnalizarVentasProductoView(AsyncAPIView):
     """
     Toma un rango de fechas, consulta las ventas por producto,
     y le pide a Gemini que analice esos datos.
     """
-    permission_classes = [IsAdminUser]
+    permission_classes = [IsAdminUser, requiere_funcion("permite_reportes_ia")]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "llm"
 
     # El prompt de "Analista" que le daremos a Gemini
     PROMPT_ANALISTA = """
@@ -249,7 +294,29 @@ class AnalizarVentasProductoView(APIView):
     Responde en un formato de texto simple y amigable.
     """
 
-    def get(self, request, *args, **kwargs):
+    @staticmethod
+    def datos_reporte(empresa_id, fecha_inicio, fecha_fin):
+        """Ventas por producto del rango como string JSON (None si no hay datos)."""
+        datos_reporte = DetalleVenta.objects.using(alias_analitica(empresa_id)).filter(
+            venta__empresa_id=empresa_id,
+            venta__estado='Completado',
+            venta__fecha__range=[fecha_inicio, fecha_fin],
+        ).values(
+            'producto__nombre', 'producto__sku'
+        ).annotate(
+            cantidad_total=Sum('cantidad'),
+            ingresos_totales=Sum('subtotal')
+        ).order_by('-ingresos_totales')
+
+        # ¡Importante! Convertimos el QuerySet (que no es JSON) a una lista
+        # y luego a un string de JSON.
+        lista_datos = list(datos_reporte)
+        if not lista_datos:
+            return None
+        return json.dumps(lista_datos, default=str) # default=str por si hay decimales
+
+    @con_semaforo("llm")
+    async def get(self, request, *args, **kwargs):
         
         # --- 1. Obtener Fechas (Lógica de tus otras vistas) ---
         fecha_inicio_str = request.query_params.get('fecha_inicio', None)
@@ -266,37 +333,13 @@ class AnalizarVentasProductoView(APIView):
                 fecha_fin = timezone.now().date()
                 fecha_inicio = fecha_fin - datetime.timedelta(days=30)
 
-        # --- 2. Hacer la Consulta (Copiado de tu generador) ---
-        base_query = Venta.objects.filter(
-            estado='Completado',
-            empresa=request.user.empresa
-        )
-        ventas_filtradas = base_query.filter(fecha__range=[fecha_inicio, fecha_fin])
-        
-        if not ventas_filtradas.exists():
+        # --- 2 y 3. Consulta y conversión a JSON (ORM: fuera del loop) ---
+        datos_json_str = await en_bd(self.datos_reporte, request.user.empresa_id, fecha_inicio, fecha_fin)
+        if datos_json_str is None:
             return Response({"error": "No se encontraron ventas para este rango."}, status=404)
 
-        ventas_ids = ventas_filtradas.values_list('id', flat=True)
-        datos_reporte = DetalleVenta.objects.filter(
-            venta__id__in=ventas_ids
-        ).values(
-            'producto__nombre', 'producto__sku'
-        ).annotate(
-            cantidad_total=Sum('cantidad'),
-            ingresos_totales=Sum('subtotal')
-        ).order_by('-ingresos_totales')
-
-        if not datos_reporte:
-            return Response({"error": "Sin datos de detalle de venta para analizar."}, status=404)
-
-        # --- 3. Convertir Datos a JSON ---
-        # ¡Importante! Convertimos el QuerySet (que no es JSON) a una lista
-        # y luego a un string de JSON.
-        lista_datos = list(datos_reporte)
-        datos_json_str = json.dumps(lista_datos, default=str) # default=str por si hay decimales
-
         # --- 4. Llamar al "Cerebro Analista" ---
-        resultado = analyze_data_with_gemini(datos_json_str, self.PROMPT_ANALISTA)
+        resultado = await analyze_data_with_gemini_async(datos_json_str, self.PROMPT_ANALISTA)
         
         # --- 5. Devolver el Análisis ---
         if "error" in resultado:
@@ -0,0 +1,77 @@
+# smartsales/db.py
+# Manejo de conexiones a PostgreSQL según DB_CONEXIONES:
+#
+#  - "pool" (por defecto): pool nativo de Django 5.1+ con psycopg 3. Cada
+#    worker mantiene entre DB_POOL_MIN y DB_POOL_MAX conexiones abiertas y
+#    cada request toma una prestada. Es el modo necesario bajo ASGI: ahí cada
+#    request corre su código síncrono en un hilo nuevo, y CONN_MAX_AGE no
+#    reutiliza nada.
+#  - "persistente": una conexión por hilo que vive CONN_MAX_AGE segundos,
+#    verificada con CONN_HEALTH_CHECKS antes de reutilizarla.
+#  - "pgbouncer": PgBouncer hace el pooling (modo transaction). Sin cursores
+#    del lado del servidor ni prepared statements, que no sobreviven a un
+#    cambio de conexión en el servidor.
+#
+# Conexiones totales contra Postgres ≈ workers × DB_POOL_MAX. Con
+# DB_CONEXIONES_TOTALES se reparte ese presupuesto entre WEB_CONCURRENCY
+# workers en lugar de fijar DB_POOL_MAX a mano.
+#
+# `python manage.py benchmark_conexiones` mide cuánto se ahorra por request.
+
+import importlib.util
+import warnings
+
+MODOS = ("pool", "persistente", "pgbouncer")
+
+
+def _psycopg3():
+    return importlib.util.find_spec("psycopg") is not None
+
+
+def pool_disponible():
+    """El pool nativo necesita psycopg 3 con psycopg_pool."""
+    return _psycopg3() and importlib.util.find_spec("psycopg_pool") is not None
+
+
+def tamanio_pool(pool_max, total=None, workers=1):
+    """Máximo de conexiones por worker: DB_POOL_MAX, o el total repartido entre los workers."""
+    if total:
+        return max(1, total // max(1, workers))
+    return pool_max
+
+
+def configurar_conexiones(db, modo="pool", conn_max_age=600, health_checks=True,
+                          pool_min=2, pool_max=10, pool_timeout=10):
+    """Devuelve `db` (un dict de DATABASES) con las opciones de conexión del modo."""
+    if modo not in MODOS:
+        raise ValueError(f"DB_CONEXIONES debe ser uno de {MODOS}, no {modo!r}")
+
+    db = dict(db)
+    db["OPTIONS"] = dict(db.get("OPTIONS") or {})
+    db["CONN_HEALTH_CHECKS"] = health_checks
+
+    # SQLite (desarrollo/tests): solo conexiones persistentes
+    if "postgresql" not in db.get("ENGINE", ""):
+        db["CONN_MAX_AGE"] = conn_max_age
+        return db
+
+    if modo == "pool" and not pool_disponible():
+        warnings.warn("DB_CONEXIONES=pool requiere psycopg[pool]; se usan conexiones persistentes.")
+        modo = "persistente"
+
+    if modo == "pool":
+        # El pool y CONN_MAX_AGE son excluyentes: al cerrar, la conexión vuelve al pool
+        db["CONN_MAX_AGE"] = 0
+        db["OPTIONS"]["pool"] = {
+            "min_size": min(pool_min, pool_max),
+            "max_size": pool_max,
+            "timeout": pool_timeout,  # segundos esperando una conexión libre
+        }
+    elif modo == "persistente":
+        db["CONN_MAX_AGE"] = conn_max_age
+    else:  # pgbouncer
+        db["CONN_MAX_AGE"] = conn_max_age
+        db["DISABLE_SERVER_SIDE_CURSORS"] = True
+        if _psycopg3():
+            db["OPTIONS"]["prepare_threshold"] = None  # psycopg 3: sin prepared statements
+    return db
@@ -0,0 +1,31 @@
+# smartsales/db_routers.py
+# Router para la réplica de lectura "analytics" (ver utils/replica.py).
+#
+#  - Las lecturas van a "default" salvo que el código pida .using("analytics").
+#  - Las escrituras SIEMPRE van a "default", aunque el objeto se haya leído
+#    de la réplica.
+#  - Las migraciones solo corren en la primaria; la réplica las recibe por
+#    replicación (o, en tests, es un espejo: TEST["MIRROR"] = "default").
+
+ANALITICA = "analytics"
+PRIMARIA = "default"
+
+
+class AnaliticaRouter:
+
+    def db_for_read(self, model, **hints):
+        return None
+
+    def db_for_write(self, model, **hints):
+        return PRIMARIA
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mismos datos en ambas bases
+        if {obj1._state.db, obj2._state.db} <= {PRIMARIA, ANALITICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == ANALITICA:
+            return False
+        return None
@@ -5,6 +5,8 @@ import dj_database_url
 from datetime import timedelta
 import os
 
+from .db import configurar_conexiones, tamanio_pool
+
 # ============================================================
 # BASE CONFIG
 # ============================================================
@@ -65,6 +67,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "utils.tenant.TenantMiddleware",
+    "utils.replica.EscrituraRecienteMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -95,41 +99,137 @@ TEMPLATES = [
 # WSGI / ASGI
 # ============================================================
 
+# Producción corre en ASGI (Procfile: gunicorn + workers de uvicorn) para que
+# las vistas async (utils/async_views.py) esperen a Gemini/Stripe sin ocupar
+# un proceso. WSGI queda para `runserver` y despliegues sin uvicorn.
 WSGI_APPLICATION = "smartsales.wsgi.application"
 ASGI_APPLICATION = 'smartsales.asgi.application'
 
 # ============================================================
-# CHANNELS (SIN REDIS PARA RENDER)
+# CHANNELS (Redis si hay CHANNELS_REDIS_URL; si no, en memoria)
 # ============================================================
+# El layer en memoria solo sirve con un proceso: con varios workers se
+# necesita Redis para que un group_send llegue a todos los websockets.
+
+CHANNELS_REDIS_URL = config("CHANNELS_REDIS_URL", default=None)
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+if CHANNELS_REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [CHANNELS_REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        }
     }
-}
 
 # ============================================================
-# DATABASE (Render usa DATABASE_URL)
+# CACHE (Redis si hay REDIS_URL; si no, memoria local del proceso)
 # ============================================================
 
-DATABASE_URL = config("DATABASE_URL", default=None)
+REDIS_URL = config("REDIS_URL", default=None)
 
-if DATABASE_URL:
-    DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+# Workers del servidor (Procfile); el pool de conexiones y el cache del catálogo lo usan
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=2, cast=int)
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
     }
 else:
-    DATABASES = {
+    CACHES = {
         "default": {
-            "ENGINE": "django.db.backends.postgresql",
-            "NAME": config("DB_NAME"),
-            "USER": config("DB_USER"),
-            "PASSWORD": config("DB_PASSWORD"),
-            "HOST": config("DB_HOST"),
-            "PORT": config("DB_PORT"),
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "smartsales",
         }
     }
 
+# Segundos que vive una respuesta cacheada del catálogo (products/cache.py)
+CATALOGO_CACHE_TIMEOUT = config("CATALOGO_CACHE_TIMEOUT", default=300, cast=int)
+# Con LocMem cada worker tiene su propio cache y la invalidación no llega a los
+# demás: sin Redis el cache del catálogo solo se activa con un único worker
+CATALOGO_CACHE_ACTIVO = config(
+    "CATALOGO_CACHE_ACTIVO", default=bool(REDIS_URL) or WEB_CONCURRENCY <= 1, cast=bool
+)
+
+# Segundos que vive un comparativo del dashboard (prediccion/comparativo.py)
+ANALITICA_CACHE_TIMEOUT = config("ANALITICA_CACHE_TIMEOUT", default=300, cast=int)
+
+# Segundos mínimos entre recálculos de insights con días pendientes
+# (prediccion/insights.py); el comando actualizar_insights los refresca por cron
+INSIGHTS_REFRESCO = config("INSIGHTS_REFRESCO", default=300, cast=int)
+# "async": el recálculo pedido por un endpoint corre en un hilo aparte; "sync" para tests / scripts
+INSIGHTS_MODO = config("INSIGHTS_MODO", default="async")
+
+# Stock (sucursales/stock_service.py): minutos que dura una reserva de carrito
+# y segundos que se cachea la disponibilidad por producto/sucursal
+STOCK_RESERVA_MINUTOS = config("STOCK_RESERVA_MINUTOS", default=15, cast=int)
+STOCK_CACHE_TIMEOUT = config("STOCK_CACHE_TIMEOUT", default=30, cast=int)
+
+# ============================================================
+# DATABASE (Render usa DATABASE_URL)
+# ============================================================
+
+DATABASE_URL = config("DATABASE_URL", default=None)
+
+if DATABASE_URL:
+    _db = dj_database_url.parse(DATABASE_URL)
+else:
+    _db = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": config("DB_NAME"),
+        "USER": config("DB_USER"),
+        "PASSWORD": config("DB_PASSWORD"),
+        "HOST": config("DB_HOST"),
+        "PORT": config("DB_PORT"),
+    }
+
+# Conexiones (smartsales/db.py): "pool" | "persistente" | "pgbouncer"
+DB_CONEXIONES = config("DB_CONEXIONES", default="pool")
+DB_POOL_MIN = config("DB_POOL_MIN", default=2, cast=int)  # por worker
+DB_POOL_MAX = config("DB_POOL_MAX", default=10, cast=int)  # por worker
+DB_CONEXIONES_TOTALES = config("DB_CONEXIONES_TOTALES", default=0, cast=int)  # 0 = usar DB_POOL_MAX
+
+DATABASES = {
+    "default": configurar_conexiones(
+        _db,
+        modo=DB_CONEXIONES,
+        conn_max_age=config("CONN_MAX_AGE", default=600, cast=int),
+        health_checks=config("CONN_HEALTH_CHECKS", default=True, cast=bool),
+        pool_min=DB_POOL_MIN,
+        pool_max=tamanio_pool(
+            DB_POOL_MAX, DB_CONEXIONES_TOTALES, WEB_CONCURRENCY
+        ),
+        pool_timeout=config("DB_POOL_TIMEOUT", default=10, cast=int),
+    )
+}
+
+# Réplica de lectura para dashboard/reportes/ML (utils/replica.py). Opcional:
+# sin DATABASE_ANALYTICS_URL todo lee de la primaria. En tests es un espejo de
+# "default"; para probar con dos bases locales basta con apuntar la URL a otra
+# base SQLite/Postgres.
+DATABASE_ANALYTICS_URL = config("DATABASE_ANALYTICS_URL", default=None)
+if DATABASE_ANALYTICS_URL:
+    DATABASES["analytics"] = configurar_conexiones(
+        dj_database_url.parse(DATABASE_ANALYTICS_URL),
+        modo=DB_CONEXIONES,
+        conn_max_age=config("CONN_MAX_AGE", default=600, cast=int),
+        pool_min=1,
+        pool_max=config("DB_ANALYTICS_POOL_MAX", default=4, cast=int),
+    )
+    DATABASES["analytics"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["smartsales.db_routers.AnaliticaRouter"]
+REPLICA_LAG_MAXIMO = config("REPLICA_LAG_MAXIMO", default=10, cast=int)  # segundos
+REPLICA_LAG_CHEQUEO = config("REPLICA_LAG_CHEQUEO", default=5, cast=int)  # cache de la medición
+
 # ============================================================
 # AUTH PASSWORD
 # ============================================================
@@ -174,12 +274,33 @@ AUTH_USER_MODEL = "users.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "utils.authentication.TenantJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "EXCEPTION_HANDLER": "utils.exceptions.custom_exception_handler",
 }
 
+# Segundos que cada worker guarda rol/privilegios/plan en memoria (utils/tenant.py)
+TENANT_CACHE_TTL = config("TENANT_CACHE_TTL", default=60, cast=int)
+
+# Roles que no cuentan para max_usuarios del plan (tenants/quotas.py)
+CUOTA_ROLES_EXCLUIDOS = ("CUSTOMER",)
+
+# Endpoints caros (utils/throttling.py): tasa por empresa y trabajos simultáneos,
+# por nombre de plan ("default" para los planes no listados)
+THROTTLE_PLANES = {
+    "default": {"llm": "10/min", "reportes": "20/min", "ml": "3/hour"},
+}
+CONCURRENCIA_PLANES = {
+    "default": {"llm": 2, "reportes": 3, "ml": 1},
+}
+SEMAFORO_TTL = config("SEMAFORO_TTL", default=300, cast=int)  # segundos que vive un cupo no liberado
+# Igual que CATALOGO_CACHE_ACTIVO: con LocMem y varios workers cada uno cuenta
+# aparte, así que los límites se reparten entre WEB_CONCURRENCY
+THROTTLE_CACHE_COMPARTIDO = config(
+    "THROTTLE_CACHE_COMPARTIDO", default=bool(REDIS_URL) or WEB_CONCURRENCY <= 1, cast=bool
+)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=6),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
@@ -220,5 +341,17 @@ SWAGGER_SETTINGS = {
 # ============================================================
 
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY')
+STRIPE_TIMEOUT = config('STRIPE_TIMEOUT', default=15, cast=float)  # segundos
+STRIPE_REINTENTOS = config('STRIPE_REINTENTOS', default=2, cast=int)
 ONESIGNAL_REST_API_KEY = config('ONESIGNAL_REST_API_KEY')
 ONESIGNAL_APP_ID = config('ONESIGNAL_APP_ID')
+
+# Gemini (products/nlp_parser.py, reports/nlp_utils.py)
+GEMINI_TIMEOUT = config('GEMINI_TIMEOUT', default=30, cast=float)  # segundos
+
+# Despacho de push (notifications/push_dispatcher.py)
+ONESIGNAL_API_URL = config('ONESIGNAL_API_URL', default='https://onesignal.com/api/v1/notifications')
+PUSH_MODO = config('PUSH_MODO', default='async')  # "sync" para tests / scripts
+PUSH_LOTE = config('PUSH_LOTE', default=2000, cast=int)  # player_ids por request
+PUSH_VENTANA_SEGUNDOS = config('PUSH_VENTANA_SEGUNDOS', default=0.5, cast=float)
+NOTIFICACION_LOTE = config('NOTIFICACION_LOTE', default=1000, cast=int)  # filas por bulk_create en envíos masivos
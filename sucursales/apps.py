@@ -5,3 +5,6 @@ from django.apps import AppConfig
 class SucursalesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sucursales'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,197 @@
+# sucursales/importacion_stock.py
+# Importación/ajuste masivo de stock por sucursal (CSV o JSON).
+#
+# Cada fila trae: sku, sucursal (id o nombre) y `stock` (valor absoluto)
+# o `delta` (suma/resta sobre el stock actual).
+# Los SKU y sucursales se resuelven en una consulta cada uno y todo se
+# escribe con un único bulk_create(update_conflicts=True) por lotes.
+
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from products.models import Producto
+from .models import StockSucursal, Sucursal
+from .stock_service import invalidar_disponibilidad
+
+BATCH_SIZE = 1000
+MAXIMO_ENTERO = 2 ** 63 - 1  # bigint de la base
+
+
+# ===========================================
+# 🔵 Lectura de archivos
+# ===========================================
+def leer_filas(contenido, formato="csv"):
+    """
+    Devuelve una lista de dicts a partir de bytes/str en CSV o JSON.
+    El JSON puede ser una lista de filas o {"filas": [...]}.
+    """
+    if isinstance(contenido, bytes):
+        contenido = contenido.decode("utf-8-sig")
+
+    if formato == "json":
+        datos = json.loads(contenido)
+        if isinstance(datos, dict):
+            datos = datos.get("filas", [])
+        if not isinstance(datos, list):
+            raise ValueError("se esperaba una lista de filas")
+        return datos
+
+    lector = csv.DictReader(io.StringIO(contenido))
+    return [{(k or "").strip().lower(): (v or "").strip() for k, v in fila.items()} for fila in lector]
+
+
+def validar_filas(filas):
+    """Errores por fila de las que no son objetos (JSON mal armado); [] si todas lo son."""
+    return [
+        {"fila": num, "sku": None, "error": "La fila debe ser un objeto con sku, sucursal y stock/delta"}
+        for num, fila in enumerate(filas, start=1)
+        if not isinstance(fila, dict)
+    ]
+
+
+def _entero(valor):
+    """int, o None si viene vacío. "2.7" es un error: nunca se trunca."""
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, bool):
+        raise ValueError(valor)
+    try:
+        numero = Decimal(str(valor).strip())
+    except InvalidOperation:
+        raise ValueError(valor)
+    if not numero.is_finite() or numero != numero.to_integral_value() or abs(numero) > MAXIMO_ENTERO:
+        raise ValueError(valor)
+    return int(numero)
+
+
+# ===========================================
+# 🔵 Importación
+# ===========================================
+def importar_stock(empresa, filas):
+    """
+    Aplica las filas al stock de la empresa.
+
+    Devuelve un reporte:
+        {"filas": n, "aplicadas": n, "registros": n, "errores": [{"fila", "sku", "error"}]}
+    Las filas con error se omiten; el resto se aplica en una sola transacción.
+    """
+    errores = validar_filas(filas)
+    invalidas = {e["fila"] for e in errores}
+
+    def error(num, fila, mensaje):
+        errores.append({"fila": num, "sku": fila.get("sku"), "error": mensaje})
+
+    # 1) Resolver SKUs y sucursales (una consulta cada uno)
+    skus = {str(f.get("sku", "")).strip() for f in filas if isinstance(f, dict) and f.get("sku")}
+    productos = dict(
+        Producto.objects.filter(empresa=empresa, sku__in=skus).values_list("sku", "id")
+    )
+    sucursales = {}
+    for pk, nombre in Sucursal.objects.filter(empresa=empresa).values_list("id", "nombre"):
+        sucursales[str(pk)] = pk
+        sucursales[nombre.strip().lower()] = pk
+
+    # 2) Validar filas y agrupar por (producto, sucursal)
+    absolutos = {}
+    deltas = {}
+    for num, fila in enumerate(filas, start=1):
+        if num in invalidas:
+            continue
+        sku = str(fila.get("sku", "")).strip()
+        producto_id = productos.get(sku)
+        if producto_id is None:
+            error(num, fila, "SKU no encontrado")
+            continue
+        sucursal_id = sucursales.get(str(fila.get("sucursal", "")).strip().lower())
+        if sucursal_id is None:
+            error(num, fila, "Sucursal no encontrada")
+            continue
+        try:
+            stock = _entero(fila.get("stock"))
+            delta = _entero(fila.get("delta"))
+        except (TypeError, ValueError):
+            error(num, fila, "stock/delta debe ser un número entero")
+            continue
+        if (stock is None) == (delta is None):
+            error(num, fila, "Debe indicar 'stock' o 'delta' (solo uno)")
+            continue
+        if stock is not None and stock < 0:
+            error(num, fila, "El stock no puede ser negativo")
+            continue
+
+        clave = (producto_id, sucursal_id)
+        if stock is not None:
+            # Un valor absoluto reemplaza lo anterior del mismo archivo
+            absolutos[clave] = stock
+            deltas.pop(clave, None)
+        else:
+            deltas.setdefault(clave, []).append((num, fila, delta))
+
+    with transaction.atomic():
+        # 3) Deltas sobre el stock actual (filas bloqueadas mientras se calculan)
+        actuales = {}
+        claves_delta = [c for c in deltas if c not in absolutos]
+        if claves_delta:
+            existentes = (
+                StockSucursal.objects.select_for_update()
+                .filter(
+                    empresa=empresa,
+                    producto_id__in={p for p, _ in claves_delta},
+                    sucursal_id__in={s for _, s in claves_delta},
+                )
+                .values_list("producto_id", "sucursal_id", "stock")
+            )
+            actuales = {(p, s): stock for p, s, stock in existentes}
+
+        finales = dict(absolutos)
+        for clave, movimientos in deltas.items():
+            # Si el archivo trae antes un valor absoluto, el delta se suma sobre ese
+            valor = finales.get(clave, actuales.get(clave, 0))
+            aplicado = False
+            for num, fila, delta in movimientos:
+                if valor + delta < 0:
+                    error(num, fila, f"El ajuste deja stock negativo (actual {valor}, delta {delta})")
+                    continue
+                valor += delta
+                aplicado = True
+            if aplicado:
+                finales[clave] = valor
+
+        # 4) Upsert en lotes
+        objetos = [
+            StockSucursal(empresa=empresa, producto_id=p, sucursal_id=s, stock=stock)
+            for (p, s), stock in finales.items()
+        ]
+        StockSucursal.objects.bulk_create(
+            objetos,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["empresa", "producto", "sucursal"],
+            update_fields=["stock"],
+        )
+
+        por_sucursal = {}
+        for p, s in finales:
+            por_sucursal.setdefault(s, []).append(p)
+        for sucursal_id, producto_ids in por_sucursal.items():
+            invalidar_disponibilidad(empresa.id, sucursal_id, producto_ids)
+
+    filas_con_error = {e["fila"] for e in errores}
+    return {
+        "filas": len(filas),
+        "aplicadas": len(filas) - len(filas_con_error),
+        "registros": len(objetos),
+        "errores": sorted(errores, key=lambda e: e["fila"]),
+    }
+
+
+def resumen_bitacora(reporte, origen):
+    """Texto para el único registro de bitácora de la importación."""
+    return (
+        f"Importó stock desde {origen}: {reporte['aplicadas']}/{reporte['filas']} filas aplicadas, "
+        f"{reporte['registros']} registros de stock actualizados, {len(reporte['errores'])} con error"
+    )
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_initial'),
+        ('products', '0003_producto_texto_busqueda'),
+        ('sucursales', '0002_initial'),
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('expira_en', models.DateTimeField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='cart.cart')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tenants.empresa')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_stock', to='products.producto')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='sucursales.sucursal')),
+            ],
+            options={
+                'db_table': 'reserva_stock',
+                'indexes': [models.Index(fields=['sucursal', 'producto', 'expira_en'], name='reserva_stock_vigente_idx')],
+                'unique_together': {('cart', 'sucursal', 'producto')},
+            },
+        ),
+    ]
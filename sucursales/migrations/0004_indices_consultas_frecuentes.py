@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:41
+
+from django.db import migrations, models
+
+from utils.migraciones import AddIndexConcurrentlyPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('products', '0004_indices_consultas_frecuentes'),
+        ('sucursales', '0003_reservastock'),
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyPostgres(
+            model_name='stocksucursal',
+            index=models.Index(fields=['empresa', 'sucursal', 'producto'], name='stock_emp_suc_prod_idx'),
+        ),
+    ]
@@ -69,11 +69,40 @@ class StockSucursal(models.Model):
     sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE)
 
     class Meta: 
-        unique_together = ('producto', 'sucursal')
         verbose_name = 'Stock en Sucursal'
         verbose_name_plural = 'Stock en Sucursales'
         unique_together = ('empresa', 'producto', 'sucursal')
+        indexes = [
+            # Stock de una sucursal (listados, disponibilidad, descuento de stock);
+            # el unique (empresa, producto, sucursal) pone producto antes que sucursal
+            # y no sirve para filtrar solo por sucursal
+            models.Index(fields=['empresa', 'sucursal', 'producto'], name='stock_emp_suc_prod_idx'),
+        ]
     
     def __str__(self):
         return f"{self.producto.nombre} - {self.sucursal.nombre} - {self.stock}"
-    
\ No newline at end of file
+
+
+class ReservaStock(models.Model):
+    """
+    Reserva temporal de stock hecha por un carrito.
+    Mientras no venza, esas unidades no están disponibles para otros clientes.
+    """
+    empresa = models.ForeignKey('tenants.Empresa', on_delete=models.CASCADE, null=True, blank=True)
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, related_name='reservas')
+    producto = models.ForeignKey('products.Producto', on_delete=models.CASCADE, related_name='reservas_stock')
+    cart = models.ForeignKey('cart.Cart', on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField()
+    expira_en = models.DateTimeField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'reserva_stock'
+        unique_together = ('cart', 'sucursal', 'producto')
+        indexes = [
+            models.Index(fields=['sucursal', 'producto', 'expira_en'], name='reserva_stock_vigente_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reserva {self.cantidad} x {self.producto_id} en {self.sucursal_id} (cart {self.cart_id})"
+
@@ -0,0 +1,30 @@
+# sucursales/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from cart.models import CartItem
+from .models import StockSucursal, ReservaStock
+from .stock_service import invalidar_disponibilidad
+
+
+# ---
+# La disponibilidad cacheada queda vieja cuando el stock se edita
+# desde el CRUD / admin (los descuentos por venta invalidan por su cuenta).
+# ---
+@receiver(post_save, sender=StockSucursal)
+@receiver(post_delete, sender=StockSucursal)
+def invalidar_stock(sender, instance, **kwargs):
+    invalidar_disponibilidad(instance.empresa_id, instance.sucursal_id, [instance.producto_id])
+
+
+# ---
+# Quitar un producto del carrito libera su reserva.
+# ---
+@receiver(post_delete, sender=CartItem)
+def liberar_reserva_item(sender, instance, **kwargs):
+    reservas = ReservaStock.objects.filter(cart_id=instance.cart_id, producto_id=instance.producto_id)
+    sucursales = list(reservas.values_list("sucursal_id", flat=True))
+    if sucursales:
+        reservas.delete()
+        for sucursal_id in sucursales:
+            invalidar_disponibilidad(instance.empresa_id, sucursal_id, [instance.producto_id])
@@ -0,0 +1,212 @@
+# sucursales/stock_service.py
+# Servicio de stock por sucursal.
+#
+#  - Disponibilidad = stock físico - reservas vigentes de carritos.
+#    Se cachea por (empresa, sucursal, producto) para que la tienda la
+#    consulte sin tocar la base de datos.
+#  - Reservas: un carrito aparta unidades por unos minutos (ReservaStock).
+#  - Descuentos de stock: un UPDATE condicional por venta
+#    (WHERE stock >= n + reservado por otros), así dos ventas simultáneas
+#    nunca dejan el stock en negativo.
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from utils.exceptions import StockInsuficienteException
+from .models import ReservaStock, StockSucursal
+
+
+def _minutos_reserva():
+    return getattr(settings, "STOCK_RESERVA_MINUTOS", 15)
+
+
+def _timeout_cache():
+    return getattr(settings, "STOCK_CACHE_TIMEOUT", 30)
+
+
+def _clave(empresa_id, sucursal_id, producto_id):
+    return f"stock:disponible:{empresa_id}:{sucursal_id}:{producto_id}"
+
+
+# ===========================================
+# 🔵 Reservas vigentes
+# ===========================================
+def _reservas_vigentes(sucursal_id, producto_id=None, excluir_cart=None):
+    qs = ReservaStock.objects.filter(sucursal_id=sucursal_id, expira_en__gt=timezone.now())
+    if producto_id is not None:
+        qs = qs.filter(producto_id=producto_id)
+    if excluir_cart is not None:
+        qs = qs.exclude(cart_id=excluir_cart)
+    return qs
+
+
+def _subquery_reservado(sucursal_id, excluir_cart=None):
+    """
+    Unidades reservadas del producto de cada fila de StockSucursal
+    (subconsulta correlacionada, 0 si no hay reservas).
+    """
+    total = (
+        _reservas_vigentes(sucursal_id, excluir_cart=excluir_cart)
+        .filter(producto_id=OuterRef("producto_id"))
+        .values("producto_id")
+        .annotate(total=Sum("cantidad"))
+        .values("total")
+    )
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+
+# ===========================================
+# 🔵 Disponibilidad (cacheada)
+# ===========================================
+def _calcular_disponibilidad(empresa_id, sucursal_id, producto_ids, excluir_cart=None):
+    filas = (
+        StockSucursal.objects.filter(
+            empresa_id=empresa_id, sucursal_id=sucursal_id, producto_id__in=producto_ids
+        )
+        .annotate(reservado=_subquery_reservado(sucursal_id, excluir_cart))
+        .values_list("producto_id", "stock", "reservado")
+    )
+    resultado = {pk: 0 for pk in producto_ids}
+    for producto_id, stock, reservado in filas:
+        resultado[producto_id] = max(stock - reservado, 0)
+    return resultado
+
+
+def disponibilidad(empresa_id, sucursal_id, producto_ids):
+    """{producto_id: unidades disponibles}. Lee del cache y solo calcula lo que falta."""
+    producto_ids = [int(pk) for pk in producto_ids]
+    claves = {_clave(empresa_id, sucursal_id, pk): pk for pk in producto_ids}
+    en_cache = cache.get_many(list(claves))
+
+    resultado = {claves[clave]: valor for clave, valor in en_cache.items()}
+    faltantes = [pk for pk in producto_ids if pk not in resultado]
+    if faltantes:
+        calculados = _calcular_disponibilidad(empresa_id, sucursal_id, faltantes)
+        cache.set_many(
+            {_clave(empresa_id, sucursal_id, pk): valor for pk, valor in calculados.items()},
+            timeout=_timeout_cache(),
+        )
+        resultado.update(calculados)
+    return resultado
+
+
+def disponible(empresa_id, sucursal_id, producto_id):
+    return disponibilidad(empresa_id, sucursal_id, [producto_id])[int(producto_id)]
+
+
+def invalidar_disponibilidad(empresa_id, sucursal_id, producto_ids):
+    """Borra la disponibilidad cacheada cuando la transacción actual se confirme."""
+    claves = [_clave(empresa_id, sucursal_id, pk) for pk in producto_ids]
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+# ===========================================
+# 🔵 Reservas de carrito
+# ===========================================
+def reservar(cart, sucursal_id, producto_id, cantidad, minutos=None):
+    """
+    Aparta `cantidad` unidades (total, no incremental) para el carrito.
+    Lanza StockInsuficienteException si no alcanzan.
+    """
+    empresa_id = cart.empresa_id
+    with transaction.atomic():
+        # Bloquea la fila de stock: las reservas del mismo producto se serializan
+        stock = (
+            StockSucursal.objects.select_for_update()
+            .filter(empresa_id=empresa_id, sucursal_id=sucursal_id, producto_id=producto_id)
+            .values_list("stock", flat=True)
+            .first()
+        )
+        reservado_otros = (
+            _reservas_vigentes(sucursal_id, producto_id, excluir_cart=cart.id)
+            .aggregate(total=Sum("cantidad"))["total"]
+            or 0
+        )
+        libre = (stock or 0) - reservado_otros
+        if cantidad > libre:
+            raise StockInsuficienteException(
+                f"Stock insuficiente. Disponible: {max(libre, 0)}, solicitado: {cantidad}"
+            )
+
+        reserva, _ = ReservaStock.objects.update_or_create(
+            cart=cart,
+            sucursal_id=sucursal_id,
+            producto_id=producto_id,
+            defaults={
+                "empresa_id": empresa_id,
+                "cantidad": cantidad,
+                "expira_en": timezone.now() + timedelta(minutes=minutos or _minutos_reserva()),
+            },
+        )
+        invalidar_disponibilidad(empresa_id, sucursal_id, [producto_id])
+    return reserva
+
+
+def liberar_reservas(cart, producto_id=None):
+    """Elimina las reservas del carrito (todas o las de un producto)."""
+    qs = ReservaStock.objects.filter(cart=cart)
+    if producto_id is not None:
+        qs = qs.filter(producto_id=producto_id)
+    afectadas = list(qs.values_list("sucursal_id", "producto_id"))
+    if not afectadas:
+        return 0
+    qs.delete()
+    for sucursal_id, pk in afectadas:
+        invalidar_disponibilidad(cart.empresa_id, sucursal_id, [pk])
+    return len(afectadas)
+
+
+def limpiar_reservas_vencidas():
+    """Borra reservas vencidas (ya no cuentan, solo ocupan espacio)."""
+    return ReservaStock.objects.filter(expira_en__lte=timezone.now()).delete()[0]
+
+
+# ===========================================
+# 🔵 Descuento atómico de stock
+# ===========================================
+def descontar_stock(empresa_id, sucursal_id, items, cart=None):
+    """
+    Descuenta stock para una venta. `items` = [(producto_id, cantidad), ...].
+    Es UN solo UPDATE condicional para todas las líneas
+    (WHERE stock >= cantidad + reservado por otros carritos); si alguna
+    no alcanza se revierte y se lanza StockInsuficienteException.
+    """
+    cantidades = {}
+    for producto_id, cantidad in items:
+        cantidades[int(producto_id)] = cantidades.get(int(producto_id), 0) + int(cantidad)
+    if not cantidades:
+        return
+
+    excluir = cart.id if cart is not None else None
+    cantidad = Case(
+        *[When(producto_id=pk, then=Value(n)) for pk, n in cantidades.items()],
+        output_field=IntegerField(),
+    )
+
+    with transaction.atomic():
+        actualizados = StockSucursal.objects.filter(
+            empresa_id=empresa_id,
+            sucursal_id=sucursal_id,
+            producto_id__in=list(cantidades),
+            stock__gte=_subquery_reservado(sucursal_id, excluir) + cantidad,
+        ).update(stock=F("stock") - cantidad)
+
+        if actualizados != len(cantidades):
+            libres = _calcular_disponibilidad(empresa_id, sucursal_id, list(cantidades), excluir)
+            faltantes = [
+                f"producto {pk} (disponible: {libres[pk]}, solicitado: {n})"
+                for pk, n in cantidades.items()
+                if libres[pk] < n
+            ]
+            # El raise revierte las líneas que sí se descontaron
+            raise StockInsuficienteException(f"Stock insuficiente para {', '.join(faltantes)}")
+
+        if cart is not None:
+            ReservaStock.objects.filter(cart=cart, sucursal_id=sucursal_id).delete()
+        invalidar_disponibilidad(empresa_id, sucursal_id, list(cantidades))
@@ -1,3 +1,157 @@
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from cart.models import Cart
+from products.models import Producto
+from sucursales import stock_service
+from sucursales.models import ReservaStock, StockSucursal, Sucursal
+from tenants.models import Empresa
+from users.models import User
+from utils.exceptions import StockInsuficienteException
+
+
+class StockServiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Stock", nit="STOCK-001")
+        cls.usuario = User.objects.create_user(email="stock@test.com", password="x", empresa=cls.empresa)
+        cls.otro = User.objects.create_user(email="otro@test.com", password="x", empresa=cls.empresa)
+        cls.sucursal = Sucursal.objects.create(empresa=cls.empresa, nombre="Central")
+        cls.producto = Producto.objects.create(empresa=cls.empresa, nombre="Tv", precio_venta=100)
+
+    def setUp(self):
+        cache.clear()
+        self.stock = StockSucursal.objects.create(
+            empresa=self.empresa, sucursal=self.sucursal, producto=self.producto, stock=5
+        )
+        self.cart = Cart.objects.create(empresa=self.empresa, usuario=self.usuario)
+        self.cart_otro = Cart.objects.create(empresa=self.empresa, usuario=self.otro)
+
+    def _disponible(self):
+        return stock_service.disponible(self.empresa.id, self.sucursal.id, self.producto.id)
+
+    def test_descuento_no_deja_stock_negativo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            stock_service.descontar_stock(self.empresa.id, self.sucursal.id, [(self.producto.id, 4)])
+        with self.assertRaises(StockInsuficienteException):
+            stock_service.descontar_stock(self.empresa.id, self.sucursal.id, [(self.producto.id, 2)])
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.stock, 1)
+
+    def test_reserva_bloquea_a_otros_carritos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            stock_service.reservar(self.cart, self.sucursal.id, self.producto.id, 3)
+        self.assertEqual(self._disponible(), 2)
+
+        with self.assertRaises(StockInsuficienteException):
+            stock_service.reservar(self.cart_otro, self.sucursal.id, self.producto.id, 3)
+        with self.assertRaises(StockInsuficienteException):
+            stock_service.descontar_stock(self.empresa.id, self.sucursal.id, [(self.producto.id, 3)])
+
+        # El dueño de la reserva sí puede comprarla y la reserva se consume
+        with self.captureOnCommitCallbacks(execute=True):
+            stock_service.descontar_stock(
+                self.empresa.id, self.sucursal.id, [(self.producto.id, 3)], cart=self.cart
+            )
+        self.assertFalse(ReservaStock.objects.filter(cart=self.cart).exists())
+        self.assertEqual(self._disponible(), 2)
+
+    def test_disponibilidad_se_cachea_e_invalida(self):
+        self.assertEqual(self._disponible(), 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._disponible(), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.stock = 8
+            self.stock.save()
+        self.assertEqual(self._disponible(), 8)
+
+    def test_venta_fallida_revierte_todo(self):
+        otro = Producto.objects.create(empresa=self.empresa, nombre="Radio", precio_venta=10)
+        StockSucursal.objects.create(empresa=self.empresa, sucursal=self.sucursal, producto=otro, stock=1)
+        with self.assertRaises(StockInsuficienteException):
+            with transaction.atomic():
+                stock_service.descontar_stock(
+                    self.empresa.id, self.sucursal.id, [(self.producto.id, 2), (otro.id, 5)]
+                )
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.stock, 5)
+
+
+class ImportacionStockTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Import", nit="IMPORT-001")
+        cls.central = Sucursal.objects.create(empresa=cls.empresa, nombre="Central")
+        cls.norte = Sucursal.objects.create(empresa=cls.empresa, nombre="Norte")
+        cls.tv = Producto.objects.create(empresa=cls.empresa, nombre="Tv", sku="TV-1", precio_venta=100)
+        cls.radio = Producto.objects.create(empresa=cls.empresa, nombre="Radio", sku="RA-1", precio_venta=10)
+
+    def test_csv_con_stock_y_delta(self):
+        from sucursales.importacion_stock import importar_stock, leer_filas
+
+        StockSucursal.objects.create(empresa=self.empresa, sucursal=self.norte, producto=self.tv, stock=10)
+        contenido = (
+            "sku,sucursal,stock,delta\n"
+            "TV-1,Central,7,\n"
+            f"TV-1,{self.norte.id},,-3\n"
+            "RA-1,norte,,4\n"
+            "XX-9,Central,1,\n"
+            "RA-1,Central,,-1\n"
+        )
+        with self.assertNumQueries(6):
+            reporte = importar_stock(self.empresa, leer_filas(contenido))
+
+        self.assertEqual(reporte["aplicadas"], 3)
+        self.assertEqual([e["fila"] for e in reporte["errores"]], [4, 5])
+        stock = {
+            (s.producto_id, s.sucursal_id): s.stock
+            for s in StockSucursal.objects.filter(empresa=self.empresa)
+        }
+        self.assertEqual(stock, {
+            (self.tv.id, self.central.id): 7,
+            (self.tv.id, self.norte.id): 7,
+            (self.radio.id, self.norte.id): 4,
+        })
+
+    def test_decimales_son_error_y_no_se_truncan(self):
+        from sucursales.importacion_stock import importar_stock
+
+        reporte = importar_stock(self.empresa, [
+            {"sku": "TV-1", "sucursal": "Central", "stock": "2.7"},
+            {"sku": "RA-1", "sucursal": "Central", "stock": 3.0},
+            {"sku": "RA-1", "sucursal": "Norte", "delta": "1e400"},
+            {"sku": "TV-1", "sucursal": "Norte", "stock": True},
+        ])
+        self.assertEqual([e["fila"] for e in reporte["errores"]], [1, 3, 4])
+        self.assertEqual(list(StockSucursal.objects.values_list("producto_id", "stock")), [(self.radio.id, 3)])
+
+    def test_json_con_filas_que_no_son_objetos(self):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        from sucursales.importacion_stock import leer_filas
+        from sucursales.views import StockSucursalViewSet
+        from users.models import Role
+
+        usuario = User.objects.create_user(
+            email="import@test.com", password="x", empresa=self.empresa,
+            role=Role.objects.create(empresa=self.empresa, name="ADMIN"),
+        )
+        vista = StockSucursalViewSet.as_view({"post": "importar"})
+
+        def importar(datos):
+            request = APIRequestFactory().post("/api/stock-sucursal/importar/", datos, format="json")
+            force_authenticate(request, user=usuario)
+            return vista(request)
+
+        response = importar({"filas": [{"sku": "TV-1", "sucursal": "Central", "stock": 1}, "TV-1", 5]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["fila"] for e in response.data["errores"]], [2, 3])
+        self.assertEqual(importar({"filas": "TV-1"}).status_code, 400)
+        self.assertFalse(StockSucursal.objects.exists())
+
+        with self.assertRaises(ValueError):
+            leer_filas('{"filas": "TV-1"}', "json")
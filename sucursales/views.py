@@ -1,7 +1,14 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.parsers import JSONParser, MultiPartParser
 from utils.viewsets import SoftDeleteViewSet
+from utils.logging_utils import log_action
 from utils.permissions import ModulePermission
 from .models import Departamento, Direccion, Sucursal, StockSucursal
+from . import stock_service
+from .importacion_stock import leer_filas, importar_stock, resumen_bitacora, validar_filas
 from .serializers import (
     DepartamentoSerializer,
     DireccionSerializer,
@@ -29,6 +36,76 @@ class SucursalViewSet(SoftDeleteViewSet):
 
 
 class StockSucursalViewSet(SoftDeleteViewSet):
-    queryset = StockSucursal.objects.all().order_by("sucursal__nombre")
+    queryset = StockSucursal.objects.select_related("producto", "sucursal", "empresa").order_by("sucursal__nombre")
     serializer_class = StockSucursalSerializer
     module_name = "StockSucursal"
+    cursor_ordering = ("sucursal_id", "id")
+
+    @action(detail=False, methods=["get"], url_path="disponibilidad", permission_classes=[AllowAny])
+    def disponibilidad(self, request):
+        """
+        Unidades disponibles (stock - reservas) por producto en una sucursal:
+        /stocksucursales/disponibilidad/?sucursal=1&productos=3,5,8
+        """
+        sucursal_id = request.query_params.get("sucursal")
+        productos = request.query_params.get("productos", "")
+        try:
+            producto_ids = [int(pk) for pk in productos.split(",") if pk.strip()][:200]
+            sucursal_id = int(sucursal_id)
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "sucursal y productos (ids separados por coma) son requeridos."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user = request.user
+        empresa_id = user.empresa_id if user.is_authenticated else 1  # tienda pública
+        datos = stock_service.disponibilidad(empresa_id, sucursal_id, producto_ids)
+        return Response({str(pk): unidades for pk, unidades in datos.items()})
+
+    @action(detail=False, methods=["post"], url_path="importar", parser_classes=[MultiPartParser, JSONParser])
+    def importar(self, request):
+        """
+        Carga/ajuste masivo de stock:
+          - multipart con `archivo` (.csv o .json), o
+          - JSON {"filas": [{"sku": ..., "sucursal": ..., "stock"|"delta": ...}]}
+        Devuelve el reporte con los errores por fila.
+        """
+        empresa = getattr(request.user, "empresa", None)
+        if empresa is None:
+            return Response({"detail": "El usuario no tiene empresa."}, status=status.HTTP_400_BAD_REQUEST)
+
+        archivo = request.FILES.get("archivo")
+        try:
+            if archivo:
+                formato = "json" if archivo.name.lower().endswith(".json") else "csv"
+                filas = leer_filas(archivo.read(), formato)
+                origen = archivo.name
+            else:
+                filas = request.data.get("filas", [])
+                if not isinstance(filas, list):
+                    return Response({"detail": "`filas` debe ser una lista."}, status=status.HTTP_400_BAD_REQUEST)
+                origen = "JSON"
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"detail": f"Archivo inválido: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not filas:
+            return Response({"detail": "No se enviaron filas."}, status=status.HTTP_400_BAD_REQUEST)
+
+        errores = validar_filas(filas)
+        if errores:
+            return Response(
+                {"detail": "Hay filas con formato inválido.", "errores": errores},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        reporte = importar_stock(empresa, filas)
+        log_action(
+            user=request.user,
+            modulo=self.module_name,
+            accion="EDITAR",
+            descripcion=resumen_bitacora(reporte, origen),
+            request=request,
+        )
+        return Response(reporte, status=status.HTTP_200_OK)
+
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsoEmpresa',
+            fields=[
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='uso', serialize=False, to='tenants.empresa')),
+                ('usuarios', models.IntegerField(default=0)),
+                ('productos', models.IntegerField(default=0)),
+                ('ventas_mes', models.IntegerField(default=0)),
+                ('mes', models.DateField(help_text='Primer día del mes al que corresponde ventas_mes')),
+                ('reconciliado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Uso de la empresa',
+                'verbose_name_plural': 'Uso de las empresas',
+                'db_table': 'uso_empresa',
+            },
+        ),
+    ]
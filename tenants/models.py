@@ -40,3 +40,25 @@ class Plan(models.Model):
     def __str__(self):
         return f"{self.nombre} (${self.precio_mensual}/mes)" 
     
+
+
+class UsoEmpresa(models.Model):
+    """
+    Contadores de uso de cada empresa frente a los límites de su plan.
+    Se actualizan con F() al crear/eliminar y se reconcilian con COUNT(*)
+    periódicamente (ver tenants/quotas.py y el comando reconciliar_cuotas).
+    """
+    empresa = models.OneToOneField(Empresa, on_delete=models.CASCADE, primary_key=True, related_name='uso')
+    usuarios = models.IntegerField(default=0)
+    productos = models.IntegerField(default=0)
+    ventas_mes = models.IntegerField(default=0)
+    mes = models.DateField(help_text="Primer día del mes al que corresponde ventas_mes")
+    reconciliado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'uso_empresa'
+        verbose_name = 'Uso de la empresa'
+        verbose_name_plural = 'Uso de las empresas'
+
+    def __str__(self):
+        return f"{self.empresa_id}: {self.usuarios} usuarios, {self.productos} productos, {self.ventas_mes} ventas"
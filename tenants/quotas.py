@@ -0,0 +1,200 @@
+# tenants/quotas.py
+# Cuotas del plan: límites (max_usuarios, max_productos, max_ventas_mensuales)
+# y funciones habilitadas (permite_reportes_ia, prediccion_ventas, ...).
+#
+#  - El uso de cada empresa vive en UsoEmpresa: una fila por empresa que se
+#    actualiza con F() cuando se crea/desactiva algo (tenants/signals.py).
+#  - Verificar un cupo es O(1): límites del plan desde el cache del worker
+#    (utils/tenant.py) + lectura de UsoEmpresa por PK. Nunca un COUNT(*).
+#  - reconciliar() recalcula los contadores con un COUNT agrupado por empresa;
+#    corre al crear la fila, al cambiar de mes y desde el comando
+#    `python manage.py reconciliar_cuotas` (cron).
+#  - Empresas sin plan, o límites en NULL, no tienen restricción.
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from rest_framework import permissions
+
+from utils.exceptions import PlanLimitException
+from utils.tenant import limites_plan, obtener_tenant, plan_de_empresa
+from .models import UsoEmpresa
+
+# recurso -> (campo en UsoEmpresa, límite en Plan, nombre para el mensaje)
+RECURSOS = {
+    "usuarios": ("usuarios", "max_usuarios", "usuarios"),
+    "productos": ("productos", "max_productos", "productos"),
+    "ventas": ("ventas_mes", "max_ventas_mensuales", "ventas este mes"),
+}
+
+
+def roles_excluidos():
+    # Los clientes de la tienda no cuentan como usuarios del plan
+    return getattr(settings, "CUOTA_ROLES_EXCLUIDOS", ("CUSTOMER",))
+
+
+def _mes_actual():
+    return timezone.localdate().replace(day=1)
+
+
+# ===========================================
+# 🔵 Reconciliación (COUNT agrupado)
+# ===========================================
+def contar(empresa_ids):
+    """{empresa_id: {"usuarios", "productos", "ventas_mes"}} con tres consultas agrupadas."""
+    from products.models import Producto
+    from users.models import User
+    from ventas.models import Venta
+
+    mes = _mes_actual()
+    conteos = {pk: {"usuarios": 0, "productos": 0, "ventas_mes": 0} for pk in empresa_ids}
+
+    consultas = {
+        "usuarios": User.objects.filter(is_active=True, esta_activo=True)
+        .exclude(role__name__in=roles_excluidos()),
+        "productos": Producto.objects.filter(esta_activo=True),
+        "ventas_mes": Venta.objects.filter(fecha__date__gte=mes),
+    }
+    for campo, qs in consultas.items():
+        filas = (
+            qs.filter(empresa_id__in=empresa_ids)
+            .order_by()
+            .values("empresa_id")
+            .annotate(total=Count("id"))
+            .values_list("empresa_id", "total")
+        )
+        for empresa_id, total in filas:
+            conteos[empresa_id][campo] = total
+    return conteos
+
+
+def reconciliar(empresa_ids=None):
+    """Recalcula los contadores (todas las empresas si no se indican). Devuelve cuántas filas."""
+    from tenants.models import Empresa
+
+    if empresa_ids is None:
+        empresa_ids = list(Empresa.objects.values_list("id", flat=True))
+    empresa_ids = list(empresa_ids)
+    if not empresa_ids:
+        return 0
+
+    mes = _mes_actual()
+    ahora = timezone.now()
+    filas = [
+        UsoEmpresa(empresa_id=pk, mes=mes, reconciliado_en=ahora, **valores)
+        for pk, valores in contar(empresa_ids).items()
+    ]
+    UsoEmpresa.objects.bulk_create(
+        filas,
+        update_conflicts=True,
+        unique_fields=["empresa"],
+        update_fields=["usuarios", "productos", "ventas_mes", "mes", "reconciliado_en"],
+    )
+    return len(filas)
+
+
+def obtener_uso(empresa_id):
+    """Fila de uso de la empresa (se crea/reconcilia si falta o cambió el mes)."""
+    uso = UsoEmpresa.objects.filter(empresa_id=empresa_id).first()
+    if uso is None or uso.mes != _mes_actual():
+        reconciliar([empresa_id])
+        uso = UsoEmpresa.objects.get(empresa_id=empresa_id)
+    return uso
+
+
+# ===========================================
+# 🔵 Contadores incrementales
+# ===========================================
+def incrementar(empresa_id, recurso, n=1, reconciliar_si_falta=True):
+    """Suma (o resta, con n negativo) al contador con un UPDATE ... SET x = x + n."""
+    if not empresa_id or not n:
+        return
+    campo = RECURSOS[recurso][0]
+    filtro = {"empresa_id": empresa_id}
+    if recurso == "ventas":
+        filtro["mes"] = _mes_actual()
+
+    if not UsoEmpresa.objects.filter(**filtro).update(**{campo: F(campo) + n}) and reconciliar_si_falta:
+        # Sin fila (o de otro mes): el COUNT ya incluye el cambio que se está registrando
+        reconciliar([empresa_id])
+
+
+def incrementar_al_confirmar(empresa_id, recurso, n=1):
+    """
+    incrementar() después del COMMIT. Desde las señales: el UPDATE bloquea la
+    única fila de UsoEmpresa de la empresa, y dentro de la transacción de una
+    venta la tendría tomada mientras se insertan detalles y se descuenta stock
+    (todas las ventas de la empresa quedarían en fila). Si la transacción se
+    revierte no se cuenta nada; reconciliar_cuotas corrige cualquier desvío.
+    Sin fila de uso no se reconcilia aquí: varios callbacks de la misma
+    transacción sumarían sobre un COUNT que ya los incluye. La próxima lectura
+    (obtener_uso) la crea con el COUNT.
+    """
+    if empresa_id and n:
+        transaction.on_commit(lambda: incrementar(empresa_id, recurso, n, reconciliar_si_falta=False))
+
+
+# ===========================================
+# 🔵 Verificación
+# ===========================================
+def limites_empresa(empresa_id):
+    plan_id = plan_de_empresa(empresa_id) if empresa_id else None
+    return limites_plan(plan_id) if plan_id else None
+
+
+def verificar_cupo(empresa_id, recurso, n=1):
+    """Lanza PlanLimitException si crear `n` más de `recurso` supera el plan."""
+    plan = limites_empresa(empresa_id)
+    if not plan:
+        return
+    campo, campo_limite, etiqueta = RECURSOS[recurso]
+    limite = plan.get(campo_limite)
+    if limite is None:
+        return
+
+    actual = getattr(obtener_uso(empresa_id), campo)
+    if actual + n > limite:
+        raise PlanLimitException(
+            f"Su plan {plan['nombre']} permite {limite} {etiqueta} (uso actual: {actual})."
+        )
+
+
+def exigir_funcion(empresa_id, bandera):
+    """Lanza PlanLimitException si el plan de la empresa no incluye la función."""
+    plan = limites_empresa(empresa_id)
+    if plan and not plan.get(bandera):
+        raise PlanLimitException(f"Su plan {plan['nombre']} no incluye esta función.")
+
+
+# ===========================================
+# 🔵 Permisos DRF
+# ===========================================
+class CupoPlanPermission(permissions.BasePermission):
+    """
+    En `create` verifica el cupo de `view.recurso_cupo` ("usuarios",
+    "productos" o "ventas"). El resto de acciones pasa sin consultar nada.
+    """
+
+    acciones = ("create",)
+
+    def has_permission(self, request, view):
+        recurso = getattr(view, "recurso_cupo", None)
+        if recurso and getattr(view, "action", None) in self.acciones:
+            verificar_cupo(obtener_tenant(request).empresa_id, recurso)
+        return True
+
+
+def requiere_funcion(bandera):
+    """
+    Permiso que exige una bandera del plan, p. ej.
+    @permission_classes([IsAuthenticated, requiere_funcion("prediccion_ventas")])
+    """
+
+    class FuncionPlanPermission(permissions.BasePermission):
+        def has_permission(self, request, view):
+            exigir_funcion(obtener_tenant(request).empresa_id, bandera)
+            return True
+
+    FuncionPlanPermission.__name__ = f"FuncionPlan_{bandera}"
+    return FuncionPlanPermission
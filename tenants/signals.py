@@ -0,0 +1,79 @@
+# tenants/signals.py
+# Mantiene los contadores de UsoEmpresa al día sin COUNT(*) (ver tenants/quotas.py).
+# bulk_create no dispara estas señales: quien lo use suma con quotas.incrementar().
+# Las señales suman al confirmar la transacción (quotas.incrementar_al_confirmar).
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import Producto
+from users.models import User
+from utils.tenant import datos_rol
+from ventas.models import Venta
+from . import quotas
+
+
+def _estado_usuario(user):
+    return (user.is_active and user.esta_activo, user.role_id)
+
+
+def _usuario_cuenta(estado):
+    activo, role_id = estado
+    if not activo:
+        return False
+    nombre_rol = datos_rol(role_id)[0] if role_id else None
+    return nombre_rol not in quotas.roles_excluidos()
+
+
+def _estado_producto(producto):
+    return producto.esta_activo
+
+
+def _producto_cuenta(estado):
+    return estado
+
+
+# sender -> (recurso, estado relevante de la instancia, ¿ese estado cuenta en el cupo?)
+CUENTA = {
+    User: ("usuarios", _estado_usuario, _usuario_cuenta),
+    Producto: ("productos", _estado_producto, _producto_cuenta),
+}
+
+
+@receiver(post_init, sender=User)
+@receiver(post_init, sender=Producto)
+def recordar_estado(sender, instance, **kwargs):
+    # Solo se guarda el estado al cargar (sin consultas); al guardar se compara
+    # para saber si la fila entra o sale del cupo
+    instance._estado_cupo = CUENTA[sender][1](instance) if instance.pk else None
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Producto)
+def actualizar_contador(sender, instance, created, **kwargs):
+    recurso, estado_de, cuenta = CUENTA[sender]
+    estado = estado_de(instance)
+    anterior = None if created else getattr(instance, "_estado_cupo", estado)
+    if estado != anterior:
+        antes = cuenta(anterior) if anterior is not None else False
+        ahora = cuenta(estado)
+        if ahora != antes:
+            quotas.incrementar_al_confirmar(instance.empresa_id, recurso, 1 if ahora else -1)
+    instance._estado_cupo = estado
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Producto)
+def descontar_contador(sender, instance, **kwargs):
+    recurso, estado_de, cuenta = CUENTA[sender]
+    estado = getattr(instance, "_estado_cupo", None)
+    if estado is not None and cuenta(estado):
+        quotas.incrementar_al_confirmar(instance.empresa_id, recurso, -1)
+
+
+@receiver(post_save, sender=Venta)
+def contar_venta(sender, instance, created, **kwargs):
+    # Solo cuentan las ventas del mes en curso (las cargas históricas no)
+    if created and instance.fecha and timezone.localdate(instance.fecha) >= quotas._mes_actual():
+        quotas.incrementar_al_confirmar(instance.empresa_id, "ventas")
@@ -1,3 +1,113 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
 
-# Create your tests here.
+from products.importacion import importar_catalogo
+from products.models import Producto
+from users.models import Role, User
+from utils import tenant as tenant_ctx
+from utils.exceptions import PlanLimitException
+from ventas.models import Venta
+from . import quotas
+from .models import Empresa, Plan, UsoEmpresa
+
+
+class CuotasPlanTests(TestCase):
+    """Contadores incrementales de uso y verificación O(1) contra el plan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = Plan.objects.create(
+            nombre="Mini", max_usuarios=2, max_productos=3, max_ventas_mensuales=1,
+            prediccion_ventas=False,
+        )
+        cls.empresa = Empresa.objects.create(nombre="Empresa Cuotas", nit="CUOTA-001", plan=cls.plan)
+        cls.admin = User.objects.create_user(
+            email="admin@cuotas.com", password="x", empresa=cls.empresa,
+            role=Role.objects.create(empresa=cls.empresa, name="ADMIN"),
+        )
+        cls.cliente_rol = Role.objects.create(empresa=cls.empresa, name="CUSTOMER")
+
+    def setUp(self):
+        tenant_ctx.limpiar_cache()
+
+    def test_contadores_siguen_altas_bajas_y_desactivaciones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            p1 = Producto.objects.create(empresa=self.empresa, nombre="A", precio_venta=1)
+            Producto.objects.create(empresa=self.empresa, nombre="B", precio_venta=1)
+        self.assertEqual(quotas.obtener_uso(self.empresa.id).productos, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            p1.esta_activo = False
+            p1.save()
+        self.assertEqual(quotas.obtener_uso(self.empresa.id).productos, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            p1 = Producto.objects.get(id=p1.id)
+            p1.delete()  # ya estaba inactivo: no descuenta otra vez
+        self.assertEqual(quotas.obtener_uso(self.empresa.id).productos, 1)
+
+        # Los clientes no cuentan como usuarios del plan
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(
+                email="cli@cuotas.com", password="x", empresa=self.empresa, role=self.cliente_rol
+            )
+        self.assertEqual(quotas.obtener_uso(self.empresa.id).usuarios, 1)
+
+    def test_venta_cuenta_al_confirmar(self):
+        from django.db import transaction
+
+        quotas.reconciliar([self.empresa.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as ctx:
+                Venta.objects.create(empresa=self.empresa, usuario=self.admin, fecha=timezone.now(), total=10)
+            # Dentro de la transacción de la venta no se toca la fila de UsoEmpresa
+            self.assertFalse(any("uso_empresa" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(quotas.obtener_uso(self.empresa.id).ventas_mes, 1)
+
+        # Una venta revertida no se cuenta
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Venta.objects.create(empresa=self.empresa, usuario=self.admin, fecha=timezone.now(), total=10)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(quotas.obtener_uso(self.empresa.id).ventas_mes, 1)
+
+    def test_verificar_cupo_no_cuenta_filas(self):
+        quotas.reconciliar([self.empresa.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            for nombre in "ABC":
+                Producto.objects.create(empresa=self.empresa, nombre=nombre, precio_venta=1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            with self.assertRaises(PlanLimitException):
+                quotas.verificar_cupo(self.empresa.id, "productos")
+        self.assertFalse(any("COUNT" in q["sql"].upper() for q in ctx.captured_queries))
+
+    def test_reconciliar_corrige_desvios(self):
+        Venta.objects.create(empresa=self.empresa, usuario=self.admin, fecha=timezone.now(), total=10)
+        UsoEmpresa.objects.filter(empresa=self.empresa).update(ventas_mes=50, productos=7)
+
+        quotas.reconciliar([self.empresa.id])
+        uso = UsoEmpresa.objects.get(empresa=self.empresa)
+        self.assertEqual((uso.ventas_mes, uso.productos), (1, 0))
+
+    def test_importacion_se_detiene_en_el_limite(self):
+        filas = [{"nombre": f"P{i}", "precio_venta": "1"} for i in range(5)]
+        reporte = importar_catalogo(self.empresa, filas, chunk_size=2)
+
+        self.assertEqual(reporte["creados"], 2)
+        self.assertIn("Mini", reporte["errores"][-1]["error"])
+        self.assertEqual(quotas.obtener_uso(self.empresa.id).productos, 2)
+
+    def test_funcion_no_incluida_en_el_plan(self):
+        from prediccion.views import retrain_model
+
+        request = APIRequestFactory().post("/api/prediccion/retrain/")
+        force_authenticate(request, user=self.admin)
+        response = retrain_model(request)
+        self.assertEqual(response.status_code, 403)
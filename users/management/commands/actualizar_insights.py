@@ -0,0 +1,37 @@
+# users/management/commands/actualizar_insights.py
+# Refresca los insights de ventas guardados (prediccion/insights.py).
+#
+#   python manage.py actualizar_insights              # días pendientes de todas las empresas
+#   python manage.py actualizar_insights --completo   # reconstruye el rollup diario
+#
+# Pensado para cron: así los endpoints de insights casi nunca recalculan.
+from django.core.management.base import BaseCommand
+
+from prediccion.insights import actualizar_insights
+from tenants.models import Empresa
+
+
+class Command(BaseCommand):
+    help = "Recalcula el rollup diario de ventas y los insights guardados por empresa."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, action="append",
+                            help="ID de empresa (repetible). Sin él, todas.")
+        parser.add_argument("--completo", action="store_true",
+                            help="Recalcula todo el histórico, no solo los días pendientes.")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.order_by("id")
+        if options.get("empresa"):
+            empresas = empresas.filter(id__in=options["empresa"])
+
+        total = 0
+        for empresa_id in empresas.values_list("id", flat=True):
+            datos = actualizar_insights(empresa_id, completo=options["completo"])
+            total += 1
+            if datos:
+                self.stdout.write(
+                    f"  Empresa {empresa_id}: {datos['periodo']['dias']} días, "
+                    f"estacionalidad {datos['estacionalidad']}%"
+                )
+        self.stdout.write(self.style.SUCCESS(f"✅ Insights actualizados para {total} empresas."))
@@ -0,0 +1,97 @@
+# users/management/commands/benchmark_conexiones.py
+# Mide cuánto cuesta abrir la conexión a la base de datos en cada request.
+#
+#   python manage.py benchmark_conexiones --requests 200
+#
+# Simula N requests con el mismo ciclo que Django (close_if_unusable_or_obsolete
+# al empezar y al terminar, una consulta liviana en medio) en tres modos:
+#   - nuevas:       CONN_MAX_AGE=0 y sin pool (una conexión por request)
+#   - persistentes: CONN_MAX_AGE + CONN_HEALTH_CHECKS
+#   - pool:         pool nativo de psycopg 3 (solo PostgreSQL)
+# La diferencia entre "nuevas" y los otros modos es la latencia de conexión
+# que se elimina de cada request.
+
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+from smartsales.db import pool_disponible
+
+
+def _conexion(alias, **cambios):
+    """Conexión independiente de la global, con los ajustes modificados."""
+    ajustes = copy.deepcopy(connections.settings[alias])
+    opciones = cambios.pop("OPTIONS", None)
+    ajustes.update(cambios)
+    if opciones is not None:
+        ajustes["OPTIONS"] = opciones
+    return load_backend(ajustes["ENGINE"]).DatabaseWrapper(ajustes, alias)
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+class Command(BaseCommand):
+    help = "Compara la latencia por request con conexiones nuevas, persistentes y con pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests simulados por modo")
+        parser.add_argument("--database", default="default", help="Alias de la base de datos")
+        parser.add_argument("--consulta", default="SELECT 1", help="Consulta de cada request")
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+        if alias not in connections.settings:
+            raise CommandError(f"No existe la base de datos '{alias}'")
+
+        base = connections.settings[alias]
+        opciones_sin_pool = {k: v for k, v in (base.get("OPTIONS") or {}).items() if k != "pool"}
+        modos = {
+            "nuevas": dict(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False, OPTIONS=opciones_sin_pool),
+            "persistentes": dict(CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True, OPTIONS=opciones_sin_pool),
+        }
+        if base["ENGINE"].endswith("postgresql") and pool_disponible():
+            pool = (base.get("OPTIONS") or {}).get("pool") or {"min_size": 2, "max_size": 4}
+            modos["pool"] = dict(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=True, OPTIONS={**opciones_sin_pool, "pool": pool})
+        else:
+            self.stdout.write("(pool omitido: requiere PostgreSQL con psycopg[pool])")
+
+        resultados = {}
+        for nombre, cambios in modos.items():
+            resultados[nombre] = self._medir(_conexion(alias, **cambios), options["requests"], options["consulta"])
+
+        self.stdout.write(f"{'modo':<14}{'media ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for nombre, tiempos in resultados.items():
+            self.stdout.write(
+                f"{nombre:<14}{statistics.mean(tiempos):>10.3f}"
+                f"{_percentil(tiempos, 0.5):>10.3f}{_percentil(tiempos, 0.95):>10.3f}"
+            )
+
+        referencia = _percentil(resultados["nuevas"], 0.5)
+        for nombre in resultados:
+            if nombre != "nuevas":
+                ahorro = referencia - _percentil(resultados[nombre], 0.5)
+                self.stdout.write(self.style.SUCCESS(f"✅ {nombre}: {ahorro:.3f} ms menos por request (p50)"))
+
+    def _medir(self, conexion, n, consulta):
+        tiempos = []
+        try:
+            for _ in range(n):
+                inicio = time.perf_counter()
+                conexion.close_if_unusable_or_obsolete()  # request_started
+                with conexion.cursor() as cursor:
+                    cursor.execute(consulta)
+                    cursor.fetchall()
+                conexion.close_if_unusable_or_obsolete()  # request_finished
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            conexion.close()
+            if getattr(conexion, "pool", None) is not None:
+                conexion.close_pool()
+        return tiempos
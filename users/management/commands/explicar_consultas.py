@@ -0,0 +1,101 @@
+# users/management/commands/explicar_consultas.py
+# Corre EXPLAIN sobre las consultas más frecuentes (dashboard, predicción,
+# reportes y viewsets) y marca las que recorren la tabla completa.
+#
+#   python manage.py explicar_consultas --empresa 1
+#   python manage.py explicar_consultas --empresa 1 --forzar-indices --estricto   # CI
+#
+# En PostgreSQL, con tablas chicas el planificador prefiere un Seq Scan aunque
+# exista el índice; --forzar-indices desactiva enable_seqscan para verificar
+# que cada consulta *puede* resolverse por índice.
+
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from notifications.models import Notificacion
+from products.models import Producto
+from sucursales.models import StockSucursal
+from tenants.models import Empresa
+from ventas.models import DetalleVenta, Pago, Venta
+
+# Seq Scan (PostgreSQL) o "SCAN tabla" sin índice (SQLite)
+SEQ_SCAN = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"\bSCAN (\w+)(?!.*\bINDEX\b)"),
+}
+
+
+def consultas_frecuentes(empresa):
+    """(nombre, queryset) de las consultas que deben resolverse por índice."""
+    hoy = timezone.now()
+    hace_30 = hoy - timedelta(days=30)
+    sucursal_id = (
+        StockSucursal.objects.filter(empresa=empresa).values_list("sucursal_id", flat=True).first() or 0
+    )
+    producto_id = Producto.objects.filter(empresa=empresa).values_list("id", flat=True).first() or 0
+    usuario_id = empresa.usuarios.values_list("id", flat=True).first() or 0
+
+    return [
+        ("dashboard: ventas entregadas", Venta.objects.filter(
+            empresa=empresa, estado="entregado").values("empresa").annotate(total=Sum("total"))),
+        ("reportes: ventas por rango", Venta.objects.filter(
+            empresa=empresa, estado="Completado", fecha__range=[hace_30, hoy])),
+        ("listado de ventas", Venta.objects.filter(empresa=empresa).order_by("-fecha")[:50]),
+        ("reportes: pagos por rango", Pago.objects.filter(
+            empresa=empresa, estado="completado", fecha__range=[hace_30, hoy])),
+        ("predicción: ventas por producto", DetalleVenta.objects.filter(
+            empresa=empresa, producto_id=producto_id).values("venta__fecha", "cantidad")),
+        ("catálogo: productos activos", Producto.objects.filter(
+            empresa=empresa, esta_activo=True).order_by("nombre")[:50]),
+        ("stock de una sucursal", StockSucursal.objects.filter(
+            empresa=empresa, sucursal_id=sucursal_id).order_by("producto_id")[:50]),
+        ("notificaciones no leídas", Notificacion.objects.filter(usuario_id=usuario_id, leida=False)),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Corre EXPLAIN sobre las consultas frecuentes y marca las que hacen recorridos secuenciales."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, required=True, help="ID de la empresa")
+        parser.add_argument("--forzar-indices", action="store_true",
+                            help="PostgreSQL: SET enable_seqscan = off durante el EXPLAIN")
+        parser.add_argument("--estricto", action="store_true",
+                            help="Termina con error si alguna consulta hace un recorrido secuencial")
+        parser.add_argument("--verbose-plan", action="store_true", help="Muestra el plan completo")
+
+    def handle(self, *args, **options):
+        empresa = Empresa.objects.filter(id=options["empresa"]).first()
+        if not empresa:
+            raise CommandError(f"No existe la empresa {options['empresa']}")
+
+        patron = SEQ_SCAN.get(connection.vendor)
+        if patron is None:
+            raise CommandError(f"Motor no soportado: {connection.vendor}")
+
+        marcadas = []
+        with transaction.atomic():
+            if options["forzar_indices"] and connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for nombre, qs in consultas_frecuentes(empresa):
+                plan = qs.explain()
+                tablas = sorted(set(patron.findall(plan)))
+                if tablas:
+                    marcadas.append(nombre)
+                    self.stdout.write(self.style.WARNING(f"⚠️  {nombre}: recorrido secuencial en {', '.join(tablas)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"✅ {nombre}"))
+                if options["verbose_plan"] or tablas:
+                    for linea in plan.splitlines():
+                        self.stdout.write(f"      {linea}")
+
+        if marcadas and options["estricto"]:
+            raise CommandError(f"{len(marcadas)} consultas sin índice: {', '.join(marcadas)}")
+        self.stdout.write(f"{len(marcadas)} consultas con recorridos secuenciales.")
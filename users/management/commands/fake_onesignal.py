@@ -0,0 +1,29 @@
+# users/management/commands/fake_onesignal.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.fake_onesignal import OneSignalFalso
+
+
+class Command(BaseCommand):
+    help = "Levanta un OneSignal falso local para probar las notificaciones push sin enviar nada real."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--puerto", type=int, default=8765)
+
+    def handle(self, *args, **options):
+        def al_recibir(payload):
+            self.stdout.write(
+                f"📨 {payload.get('headings', {}).get('en')} -> "
+                f"{len(payload.get('include_player_ids', []))} dispositivos"
+            )
+
+        fake = OneSignalFalso(puerto=options["puerto"], al_recibir=al_recibir).iniciar()
+        self.stdout.write(self.style.SUCCESS(f"OneSignal falso escuchando en {fake.url}"))
+        self.stdout.write("Configura ONESIGNAL_API_URL con esa URL. Ctrl+C para salir.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            fake.detener()
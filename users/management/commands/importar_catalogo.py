@@ -0,0 +1,50 @@
+# users/management/commands/importar_catalogo.py
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bitacora.models import Bitacora
+from products.importacion import CHUNK_SIZE, importar_catalogo, leer_catalogo, resumen_bitacora
+from tenants.models import Empresa
+
+
+class Command(BaseCommand):
+    help = "Importa el catálogo de una empresa desde un .csv o .xlsx (bulk, por lotes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", type=str, help="Ruta al archivo .csv o .xlsx")
+        parser.add_argument("--empresa", type=int, required=True, help="ID de la empresa")
+        parser.add_argument("--lote", type=int, default=CHUNK_SIZE, help="Filas por lote")
+
+    def handle(self, *args, **options):
+        ruta = Path(options["archivo"])
+        if not ruta.exists():
+            raise CommandError(f"No existe el archivo {ruta}")
+
+        empresa = Empresa.objects.filter(id=options["empresa"]).first()
+        if not empresa:
+            raise CommandError(f"No existe la empresa {options['empresa']}")
+
+        def progreso(procesadas, creados):
+            self.stdout.write(f"  ... {procesadas} filas procesadas, {creados} productos creados")
+
+        with ruta.open("rb") as archivo:
+            reporte = importar_catalogo(
+                empresa, leer_catalogo(archivo, ruta.name), chunk_size=options["lote"], progreso=progreso
+            )
+
+        Bitacora.objects.create(
+            empresa=empresa,
+            modulo="Producto",
+            accion="CREAR",
+            descripcion=resumen_bitacora(reporte, ruta.name),
+        )
+
+        for err in reporte["errores"][:50]:
+            self.stdout.write(self.style.WARNING(f"Fila {err['fila']} ({err['sku']}): {err['error']}"))
+        if len(reporte["errores"]) > 50:
+            self.stdout.write(self.style.WARNING(f"... y {len(reporte['errores']) - 50} errores más"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {reporte['creados']}/{reporte['filas']} productos importados."
+        ))
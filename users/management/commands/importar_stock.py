@@ -0,0 +1,51 @@
+# users/management/commands/importar_stock.py
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bitacora.models import Bitacora
+from sucursales.importacion_stock import leer_filas, importar_stock, resumen_bitacora
+from tenants.models import Empresa
+
+
+class Command(BaseCommand):
+    help = "Importa/ajusta stock por sucursal desde un CSV o JSON (sku, sucursal, stock|delta)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", type=str, help="Ruta al archivo .csv o .json")
+        parser.add_argument("--empresa", type=int, required=True, help="ID de la empresa")
+
+    def handle(self, *args, **options):
+        ruta = Path(options["archivo"])
+        if not ruta.exists():
+            raise CommandError(f"No existe el archivo {ruta}")
+
+        empresa = Empresa.objects.filter(id=options["empresa"]).first()
+        if not empresa:
+            raise CommandError(f"No existe la empresa {options['empresa']}")
+
+        formato = "json" if ruta.suffix.lower() == ".json" else "csv"
+        try:
+            filas = leer_filas(ruta.read_bytes(), formato)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Archivo inválido: {e}")
+        self.stdout.write(f"Procesando {len(filas)} filas...")
+
+        reporte = importar_stock(empresa, filas)
+
+        Bitacora.objects.create(
+            empresa=empresa,
+            modulo="StockSucursal",
+            accion="EDITAR",
+            descripcion=resumen_bitacora(reporte, ruta.name),
+        )
+
+        for err in reporte["errores"][:50]:
+            self.stdout.write(self.style.WARNING(f"Fila {err['fila']} ({err['sku']}): {err['error']}"))
+        if len(reporte["errores"]) > 50:
+            self.stdout.write(self.style.WARNING(f"... y {len(reporte['errores']) - 50} errores más"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {reporte['aplicadas']}/{reporte['filas']} filas aplicadas, "
+            f"{reporte['registros']} registros de stock actualizados."
+        ))
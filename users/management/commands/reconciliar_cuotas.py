@@ -0,0 +1,34 @@
+# users/management/commands/reconciliar_cuotas.py
+from django.core.management.base import BaseCommand
+
+from tenants import quotas
+from tenants.models import UsoEmpresa
+
+
+class Command(BaseCommand):
+    help = "Recalcula los contadores de uso del plan (usuarios, productos, ventas del mes) por empresa."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, action="append",
+                            help="ID de empresa (repetible). Sin él, todas.")
+
+    def handle(self, *args, **options):
+        empresa_ids = options.get("empresa")
+        antes = {
+            u.empresa_id: (u.usuarios, u.productos, u.ventas_mes)
+            for u in UsoEmpresa.objects.filter(**({"empresa_id__in": empresa_ids} if empresa_ids else {}))
+        }
+
+        total = quotas.reconciliar(empresa_ids)
+
+        corregidas = 0
+        for uso in UsoEmpresa.objects.filter(empresa_id__in=list(antes)):
+            if antes[uso.empresa_id] != (uso.usuarios, uso.productos, uso.ventas_mes):
+                corregidas += 1
+                self.stdout.write(
+                    f"  Empresa {uso.empresa_id}: {antes[uso.empresa_id]} -> "
+                    f"{(uso.usuarios, uso.productos, uso.ventas_mes)}"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} empresas reconciliadas ({corregidas} contadores tenían diferencias)."
+        ))
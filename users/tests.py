@@ -1,3 +1,288 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import Throttled
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notifications.views import NotificacionViewSet
+from smartsales.db import configurar_conexiones, tamanio_pool
+from smartsales.db_routers import AnaliticaRouter
+from tenants.models import Empresa, Plan
+from utils import replica
+from utils import tenant as tenant_ctx
+from utils import throttling
+from utils.throttling import SemaforoTenant, TokenBucketThrottle
+from .models import Module, Permission, Role, User
+
+
+class TenantContextTests(TestCase):
+    """Usuario, rol, privilegios y plan se resuelven una vez; lo fijo queda cacheado por worker."""
+
+    @classmethod
+    def setUpTestData(cls):
+        plan = Plan.objects.create(nombre="Básico Tenant", max_productos=10)
+        cls.empresa = Empresa.objects.create(nombre="Empresa Tenant", nit="TENANT-001", plan=plan)
+        cls.rol = Role.objects.create(empresa=cls.empresa, name="VENDEDOR")
+        modulo = Module.objects.create(name="Notificacion")
+        cls.permiso = Permission.objects.create(empresa=cls.empresa, role=cls.rol, module=modulo, can_view=True)
+        cls.usuario = User.objects.create_user(
+            email="tenant@test.com", password="x", empresa=cls.empresa, role=cls.rol
+        )
+
+    def setUp(self):
+        tenant_ctx.limpiar_cache()
+
+    def _listar(self, metodo="get"):
+        token = AccessToken.for_user(self.usuario)
+        request = getattr(APIRequestFactory(), metodo)(
+            "/api/notificaciones/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        vista = NotificacionViewSet.as_view({"get": "list", "post": "create"})
+        with CaptureQueriesContext(connection) as ctx:
+            response = vista(request)
+        return response, len(ctx.captured_queries)
+
+    def test_segundo_request_solo_consulta_usuario_y_datos(self):
+        primera, _ = self._listar()
+        self.assertEqual(primera.status_code, 200)
+
+        # 1 consulta de autenticación (usuario + rol + empresa + plan) + 1 del listado
+        segunda, queries = self._listar()
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(queries, 2)
+
+    def test_contexto_expone_plan_y_privilegios(self):
+        request = APIRequestFactory().get("/")
+        request.user = User.objects.select_related("role", "empresa__plan").get(id=self.usuario.id)
+        contexto = tenant_ctx.obtener_tenant(request)
+
+        self.assertEqual(contexto.role_nombre, "VENDEDOR")
+        self.assertEqual(contexto.plan["max_productos"], 10)
+        self.assertTrue(contexto.puede("Notificacion", "view"))
+        self.assertFalse(contexto.puede("Notificacion", "create"))
+
+    def test_cambio_de_privilegios_invalida_el_cache(self):
+        self._listar()
+        response, _ = self._listar("post")
+        self.assertEqual(response.status_code, 403)
+
+        self.permiso.can_create = True
+        self.permiso.save()
+        response, _ = self._listar("post")
+        self.assertNotEqual(response.status_code, 403)
+
+
+@override_settings(THROTTLE_CACHE_COMPARTIDO=True)
+class ThrottlingTests(TestCase):
+    """Límite de tasa por empresa y semáforo de trabajos simultáneos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Límite", nit="LIMITE-001")
+        cls.otra = Empresa.objects.create(nombre="Empresa Vecina", nit="LIMITE-002")
+        cls.usuario = User.objects.create_user(email="limite@test.com", password="x", empresa=cls.empresa)
+        cls.vecino = User.objects.create_user(email="vecino@test.com", password="x", empresa=cls.otra)
+
+    def setUp(self):
+        cache.clear()
+
+    def _vista(self):
+        class VistaCara(APIView):
+            throttle_classes = [TokenBucketThrottle]
+            throttle_scope = "llm"
+
+            def get(self, request):
+                return Response({"ok": True})
+
+        return VistaCara.as_view()
+
+    def _get(self, usuario):
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, user=usuario)
+        return self._vista()(request)
+
+    @override_settings(THROTTLE_PLANES={"default": {"llm": "3/min"}})
+    def test_tasa_por_empresa(self):
+        codigos = [self._get(self.usuario).status_code for _ in range(4)]
+        self.assertEqual(codigos, [200, 200, 200, 429])
+        # Otra empresa tiene su propia cubeta
+        self.assertEqual(self._get(self.vecino).status_code, 200)
+
+    @override_settings(CONCURRENCIA_PLANES={"default": {"llm": 1}})
+    def test_semaforo_limita_trabajos_simultaneos(self):
+        request = APIRequestFactory().get("/")
+        request.user = self.usuario
+        with SemaforoTenant(request, "llm"):
+            with self.assertRaises(Throttled):
+                SemaforoTenant(request, "llm").adquirir()
+        # Al salir se libera el cupo
+        with SemaforoTenant(request, "llm"):
+            pass
+
+    def test_ventana_atomica_con_requests_simultaneos(self):
+        throttle = TokenBucketThrottle()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            admitidos = list(pool.map(lambda _: throttle._ventana_fija("llm:empresa:x", 5, 60)[0], range(40)))
+        self.assertEqual(admitidos.count(True), 5)
+        admitido, espera = throttle._ventana_fija("llm:empresa:x", 5, 60)
+        self.assertFalse(admitido)
+        self.assertTrue(0 < espera <= 60)
+
+    @override_settings(
+        THROTTLE_CACHE_COMPARTIDO=False, WEB_CONCURRENCY=2,
+        THROTTLE_PLANES={"default": {"llm": "4/min"}}, CONCURRENCIA_PLANES={"default": {"llm": 3}},
+    )
+    def test_sin_cache_compartido_reparte_los_limites(self):
+        throttling._avisado = False
+        with self.assertLogs("utils.throttling", "WARNING"):
+            codigos = [self._get(self.usuario).status_code for _ in range(3)]
+        self.assertEqual(codigos, [200, 200, 429])
+        request = APIRequestFactory().get("/")
+        request.user = self.usuario
+        self.assertEqual(SemaforoTenant(request, "llm").limite, 1)
+
+    @override_settings(CONCURRENCIA_PLANES={"default": {"llm": 2}}, SEMAFORO_TTL=300)
+    def test_semaforo_renueva_el_vencimiento(self):
+        request = APIRequestFactory().get("/")
+        request.user = self.usuario
+        semaforo = SemaforoTenant(request, "llm")
+        with patch.object(cache, "touch") as touch:
+            semaforo.adquirir()
+        touch.assert_called_once_with(semaforo.clave, 300)
+        semaforo.liberar()
+
+
+class ConfiguracionConexionesTests(TestCase):
+    """Opciones de DATABASES según DB_CONEXIONES (smartsales/db.py)."""
+
+    POSTGRES = {"ENGINE": "django.db.backends.postgresql", "NAME": "smartsales"}
+
+    def test_persistente_con_health_checks(self):
+        db = configurar_conexiones(self.POSTGRES, modo="persistente", conn_max_age=300)
+        self.assertEqual(db["CONN_MAX_AGE"], 300)
+        self.assertTrue(db["CONN_HEALTH_CHECKS"])
+        self.assertNotIn("pool", db["OPTIONS"])
+
+    def test_pgbouncer_sin_cursores_de_servidor(self):
+        db = configurar_conexiones(self.POSTGRES, modo="pgbouncer")
+        self.assertTrue(db["DISABLE_SERVER_SIDE_CURSORS"])
+
+    def test_pool_excluye_conexiones_persistentes(self):
+        with patch("smartsales.db.pool_disponible", return_value=True):
+            db = configurar_conexiones(self.POSTGRES, modo="pool", pool_min=2, pool_max=8)
+        self.assertEqual(db["CONN_MAX_AGE"], 0)
+        self.assertEqual(db["OPTIONS"]["pool"]["max_size"], 8)
+
+    def test_presupuesto_total_repartido_por_worker(self):
+        self.assertEqual(tamanio_pool(10, total=40, workers=4), 10)
+        self.assertEqual(tamanio_pool(10, total=0, workers=4), 10)
+        self.assertEqual(tamanio_pool(10, total=3, workers=4), 1)
+
+    def test_modo_invalido(self):
+        with self.assertRaises(ValueError):
+            configurar_conexiones(self.POSTGRES, modo="otro")
+
+    def test_benchmark(self):
+        salida = StringIO()
+        call_command("benchmark_conexiones", requests=5, stdout=salida)
+        self.assertIn("persistentes", salida.getvalue())
+
+
+class ExplicarConsultasTests(TestCase):
+    """Smoke test de explicar_consultas: corre EXPLAIN sobre todas las consultas frecuentes."""
+
+    def test_explica_todas_las_consultas(self):
+        empresa = Empresa.objects.create(nombre="Empresa Explain", nit="EXPLAIN-001")
+        salida = StringIO()
+        call_command("explicar_consultas", empresa=empresa.id, stdout=salida)
+        texto = salida.getvalue()
+        self.assertIn("listado de ventas", texto)
+        self.assertIn("stock de una sucursal", texto)
+        self.assertIn("consultas con recorridos secuenciales.", texto)
+
+    def test_empresa_inexistente(self):
+        with self.assertRaises(CommandError):
+            call_command("explicar_consultas", empresa=999999, stdout=StringIO())
+
+
+class ReplicaAnaliticaTests(TestCase):
+    """Ruteo a la réplica "analytics" y vuelta a la primaria (utils/replica.py)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_router_escribe_siempre_en_primaria(self):
+        router = AnaliticaRouter()
+        self.assertEqual(router.db_for_write(Empresa), "default")
+        self.assertIsNone(router.db_for_read(Empresa))
+        self.assertFalse(router.allow_migrate("analytics", "ventas"))
+        self.assertIsNone(router.allow_migrate("default", "ventas"))
+
+    def test_sin_replica_todo_va_a_la_primaria(self):
+        with patch("utils.replica.replica_configurada", return_value=False):
+            self.assertEqual(replica.alias_analitica(1), "default")
+
+    @override_settings(REPLICA_LAG_MAXIMO=10)
+    def test_vuelve_a_primaria_segun_retraso_y_escrituras(self):
+        with patch("utils.replica.replica_configurada", return_value=True), \
+                patch("utils.replica.retraso_replica") as retraso:
+            retraso.return_value = 0.5
+            self.assertEqual(replica.alias_analitica(1), "analytics")
+
+            retraso.return_value = 30  # réplica atrasada
+            self.assertEqual(replica.alias_analitica(1), "default")
+
+            retraso.return_value = None  # réplica caída
+            self.assertEqual(replica.alias_analitica(1), "default")
+
+            retraso.return_value = 0.5
+            replica.marcar_escritura(1)  # la empresa 1 acaba de escribir
+            self.assertEqual(replica.alias_analitica(1), "default")
+            self.assertEqual(replica.alias_analitica(2), "analytics")
+
+    def test_middleware_marca_escrituras_exitosas(self):
+        empresa = Empresa.objects.create(nombre="Empresa Réplica", nit="REPLICA-001")
+        usuario = User.objects.create_user(email="replica@test.com", password="x", empresa=empresa)
+        middleware = replica.EscrituraRecienteMiddleware(lambda request: HttpResponse(status=201))
+
+        with patch("utils.replica.replica_configurada", return_value=True):
+            request = RequestFactory().get("/")
+            request.user = usuario
+            middleware(request)
+            self.assertIsNone(cache.get(f"replica:escritura:{empresa.id}"))
+
+            request = RequestFactory().post("/")
+            request.user = usuario
+            middleware(request)
+            self.assertTrue(cache.get(f"replica:escritura:{empresa.id}"))
+
+
+@skipUnless(replica.replica_configurada(), "DATABASE_ANALYTICS_URL no configurada")
+class ReplicaEspejoTests(TransactionTestCase):
+    """
+    Con la réplica configurada (en tests, espejo de "default"). Transaccional:
+    la réplica usa otra conexión y solo ve datos confirmados.
+    """
+
+    databases = {"default", "analytics"} if replica.replica_configurada() else {"default"}
+
+    def test_lee_de_analytics_y_escribe_en_primaria(self):
+        Empresa.objects.create(nombre="Empresa Espejo", nit="ESPEJO-001")
+        empresa = Empresa.objects.using("analytics").get(nit="ESPEJO-001")
+        self.assertEqual(empresa._state.db, "analytics")
+
+        empresa.nombre = "Empresa Espejo 2"
+        with CaptureQueriesContext(connections["default"]) as ctx:
+            empresa.save()
+        self.assertTrue(ctx.captured_queries)
@@ -13,6 +13,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User, Role, Module, Permission
 from .serializers import UserSerializer, RoleSerializer, ModuleSerializer, PermissionSerializer, ChangePasswordSerializer  
 from utils.permissions import ModulePermission
+from tenants.quotas import CupoPlanPermission, verificar_cupo, roles_excluidos
 from rest_framework.views import APIView
 from utils.viewsets import SoftDeleteViewSet
 from notifications.push_service import send_onesignal_notification
@@ -46,7 +47,8 @@ class UserViewSet(SoftDeleteViewSet):
     queryset = User.objects.all().order_by('id')
     serializer_class = UserSerializer
     module_name = "User"
-    permission_classes = [ModulePermission]
+    permission_classes = [ModulePermission, CupoPlanPermission]
+    recurso_cupo = "usuarios"
 
     @action(detail=False, methods=['post'], url_path='registrar')
     def create_user(self, request):
@@ -71,6 +73,10 @@ class UserViewSet(SoftDeleteViewSet):
             return Response({"detail": "El usuario actual no pertenece a ninguna empresa."},
                             status=status.HTTP_400_BAD_REQUEST)
 
+        # Cupo de usuarios del plan (los clientes de la tienda no cuentan)
+        if role.name not in roles_excluidos():
+            verificar_cupo(empresa.id, "usuarios")
+
         user = User.objects.create_user(
             email=data['email'],
             password=data['password'],
@@ -0,0 +1,52 @@
+# utils/async_db.py
+# Acceso a la base de datos y a clientes bloqueantes desde vistas async.
+#
+#  - El ORM de Django es síncrono: desde una corrutina se usa en_bd(), que lo
+#    corre con sync_to_async(thread_sensitive=True). Bajo ASGI todo el código
+#    síncrono de un mismo request comparte hilo (y conexión), igual que en WSGI.
+#  - Nunca evaluar un QuerySet ni acceder a una FK perezosa directamente dentro
+#    de la corrutina: Django lanza SynchronousOnlyOperation.
+#  - Los clientes HTTP sin versión async se corren con en_hilo(), en el pool de
+#    hilos (thread_sensitive=False) y con timeout, para no bloquear el loop.
+#
+#   productos = await en_bd(lambda: list(qs[:50]))
+#   datos = await en_bd(lambda: ProductoSerializer(productos, many=True).data)
+
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+
+
+def en_bd(funcion, *args, **kwargs):
+    """Corre `funcion` (ORM, serializers, generadores) en el hilo síncrono del request."""
+    return sync_to_async(funcion, thread_sensitive=True)(*args, **kwargs)
+
+
+def bd_async(funcion):
+    """
+    Decorador: versión async de una función que usa el ORM.
+
+    @bd_async
+    def ventas_del_mes(empresa_id): ...
+
+    filas = await ventas_del_mes(empresa_id)
+    """
+    @functools.wraps(funcion)
+    async def envoltura(*args, **kwargs):
+        return await en_bd(funcion, *args, **kwargs)
+    return envoltura
+
+
+async def en_hilo(funcion, *args, timeout=None, **kwargs):
+    """
+    Corre una llamada bloqueante de E/S (SDK sin cliente async) en el pool de
+    hilos. Lanza asyncio.TimeoutError si tarda más de `timeout` segundos.
+    """
+    llamada = sync_to_async(funcion, thread_sensitive=False)(*args, **kwargs)
+    return await asyncio.wait_for(llamada, timeout)
+
+
+async def con_timeout(corrutina, timeout):
+    """await con límite de tiempo para clientes async (Gemini, Stripe)."""
+    return await asyncio.wait_for(corrutina, timeout)
@@ -0,0 +1,52 @@
+# utils/async_views.py
+# APIView con handlers async (post/get con `async def`).
+#
+# DRF ejecuta las vistas de forma síncrona; esta base hace que Django la trate
+# como vista async (bajo ASGI no ocupa un hilo mientras espera a Gemini o
+# Stripe). Autenticación, permisos, throttles y el manejo de excepciones son
+# los de DRF y corren con en_bd(), porque consultan la base de datos.
+#
+# Bajo WSGI (gunicorn sync, tests) Django la ejecuta con async_to_sync, así
+# que el mismo código sirve en ambos modos.
+
+import asyncio
+
+from rest_framework.views import APIView
+
+from .async_db import en_bd
+
+
+class AsyncAPIView(APIView):
+    """
+    class MiVista(AsyncAPIView):
+        async def post(self, request):
+            datos = await en_bd(lambda: list(...))
+            ...
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await en_bd(self.initial, request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                # OPTIONS y 405 son los handlers síncronos de DRF
+                response = await en_bd(handler, request, *args, **kwargs)
+
+        except Exception as exc:
+            response = await en_bd(self.handle_exception, exc)
+
+        self.response = await en_bd(self.finalize_response, request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,38 @@
+# utils/authentication.py
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que trae al usuario con su rol, empresa y plan en UNA
+    consulta; así request.user.role / .empresa / .empresa.plan (y
+    request.tenant) ya no generan consultas extra en vistas y permisos.
+    """
+
+    relaciones = ("role", "empresa", "empresa__plan")
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken("El token no contiene una identificación de usuario") from e
+
+        user = (
+            self.user_model.objects.select_related(*self.relaciones)
+            .filter(**{api_settings.USER_ID_FIELD: user_id})
+            .first()
+        )
+        if user is None:
+            raise AuthenticationFailed("Usuario no encontrado", code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("Usuario inactivo", code="user_inactive")
+
+        if getattr(api_settings, "CHECK_REVOKE_TOKEN", False):
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed("La contraseña del usuario cambió.", code="password_changed")
+
+        return user
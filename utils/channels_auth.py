@@ -0,0 +1,37 @@
+# utils/channels_auth.py
+# Autenticación de websockets con los mismos tokens de SimpleJWT que usa la API.
+# El navegador no permite headers en el handshake, así que el access token
+# viaja en el query string: ws/...?token=<access>.
+
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from utils.authentication import TenantJWTAuthentication
+
+
+@database_sync_to_async
+def _usuario_desde_token(raw_token):
+    auth = TenantJWTAuthentication()
+    try:
+        token = auth.get_validated_token(raw_token)
+        return auth.get_user(token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware:
+    """Pone scope["user"] a partir de ?token=; sin token válido queda AnonymousUser."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        params = parse_qs(scope.get("query_string", b"").decode())
+        token = (params.get("token") or [None])[0]
+        scope = dict(scope)
+        scope["user"] = await _usuario_desde_token(token) if token else AnonymousUser()
+        return await self.app(scope, receive, send)
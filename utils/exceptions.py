@@ -31,3 +31,15 @@ def custom_exception_handler(exc, context):
         )
 
     return response
+
+
+class StockInsuficienteException(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Stock insuficiente."
+    default_code = "stock_insuficiente"
+
+
+class PlanLimitException(APIException):
+    status_code = status.HTTP_403_FORBIDDEN
+    default_detail = "Se alcanzó el límite de su plan."
+    default_code = "plan_limit"
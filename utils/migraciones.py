@@ -0,0 +1,24 @@
+# utils/migraciones.py
+# Operaciones de migración compartidas.
+#
+# AddIndexConcurrentlyPostgres: en PostgreSQL crea el índice con
+# CREATE INDEX CONCURRENTLY, que no bloquea las escrituras de tablas calientes
+# (venta, detalle_venta, pago, producto, stock). En otros motores (SQLite en
+# desarrollo/tests) es un AddIndex normal. La migración debe declarar
+# atomic = False.
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrentlyPostgres(AddIndexConcurrently):
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
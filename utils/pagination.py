@@ -0,0 +1,39 @@
+# utils/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) para los listados de SoftDeleteViewSet.
+    El costo de cada página no depende de qué tan lejos esté del inicio.
+
+    Orden usado:
+      1. `cursor_ordering` del ViewSet, si lo define.
+      2. El order_by del queryset, si su primer campo es propio del modelo.
+      3. "-id".
+    Siempre se agrega "id" como último criterio: con un orden no único
+    (nombre, -rank) las filas empatadas se saltarían o repetirían entre páginas.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = "-id"
+
+    def get_ordering(self, request, queryset, view):
+        return self._con_desempate(self._orden_base(queryset, view))
+
+    def _orden_base(self, queryset, view):
+        ordering = getattr(view, "cursor_ordering", None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+        actual = queryset.query.order_by
+        if actual and all(isinstance(campo, str) for campo in actual) and "__" not in actual[0]:
+            return tuple(actual)
+        return (self.ordering,)
+
+    @staticmethod
+    def _con_desempate(ordering):
+        if any(campo.lstrip("-") in ("id", "pk") for campo in ordering):
+            return ordering
+        return ordering + ("-id" if ordering[0].startswith("-") else "id",)
@@ -1,6 +1,7 @@
 # utils/permissions.py
 from rest_framework import permissions
 from .exceptions import PermissionDeniedException
+from .tenant import obtener_tenant
 
 class ModulePermission(permissions.BasePermission):
     """
@@ -21,7 +22,8 @@ class ModulePermission(permissions.BasePermission):
         print("[DEBUG] Entrando a ModulePermission.has_permission()")
         try:
             user = request.user
-            print(f"[DEBUG USER] Authenticated={user.is_authenticated}, Email={getattr(user, 'email', None)}, Role={getattr(user.role, 'name', None)}")
+            # Rol y privilegios salen del contexto del tenant (cacheado por worker)
+            tenant = obtener_tenant(request)
 
             module_name = getattr(view, 'module_name', None)
             action = getattr(view, 'action', None)
@@ -38,7 +40,7 @@ class ModulePermission(permissions.BasePermission):
                     required_permission = "delete"
                     
             print(f"[DEBUG USER] Authenticated={user.is_authenticated}, Email={getattr(user, 'email', None)}")
-            print(f"[DEBUG ROLE] Role={getattr(user.role, 'name', None)}")
+            print(f"[DEBUG ROLE] Role={tenant.role_nombre}")
             print(f"[DEBUG MODULE] module_name={module_name}, action={action}, required_permission={required_permission}")
             # Usuario no autenticado
         
@@ -46,20 +48,17 @@ class ModulePermission(permissions.BasePermission):
                 raise PermissionDeniedException()
 
             # Admin tiene todos los permisos
-            if getattr(user.role, 'name', None) == "ADMIN":
+            if tenant.es_admin:
                 return True
 
             # Validar módulo, acción y rol
-            if not module_name or not user.role or not required_permission:
+            if not module_name or not tenant.role_id or not required_permission:
                 raise PermissionDeniedException()
 
 
-            print(f"[DEBUG PERMISSION] User={user.email}, Role={user.role.name if user.role else None}, Module={module_name}, Action={required_permission}")
+            print(f"[DEBUG PERMISSION] User={user.email}, Role={tenant.role_nombre}, Module={module_name}, Action={required_permission}")
             # Revisa si el rol del usuario tiene ese permiso en el módulo
-            if not user.role.privileges.filter(
-                module__name=module_name,
-                **{f'can_{required_permission}': True}
-            ).exists():
+            if not tenant.puede(module_name, required_permission):
                 raise PermissionDeniedException()
             
 
@@ -0,0 +1,140 @@
+# utils/replica.py
+# Lecturas pesadas (dashboard, reportes, extracción para ML) contra la réplica
+# de lectura "analytics" (DATABASE_ANALYTICS_URL), para que no compitan con
+# las escrituras del checkout en la primaria.
+#
+#  - Las consultas de analítica usan explícitamente .using(db_analitica(request)).
+#  - Sin réplica configurada, db_analitica() devuelve "default".
+#  - Vuelve a la primaria si:
+#      * la empresa escribió hace menos de REPLICA_LAG_MAXIMO segundos
+#        (EscrituraRecienteMiddleware marca cada POST/PUT/PATCH/DELETE exitoso),
+#      * la réplica está atrasada más de REPLICA_LAG_MAXIMO segundos, o
+#      * la réplica no responde.
+#    El retraso medido se cachea REPLICA_LAG_CHEQUEO segundos.
+#
+# El ruteo de escrituras y migraciones está en smartsales/db_routers.py.
+
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+from .tenant import obtener_tenant
+
+logger = logging.getLogger(__name__)
+
+ANALITICA = "analytics"
+PRIMARIA = "default"
+
+# Segundos desde la última transacción aplicada en la réplica (0 si está al día)
+SQL_RETRASO_POSTGRES = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_configurada():
+    return ANALITICA in settings.DATABASES
+
+
+def _lag_maximo():
+    return getattr(settings, "REPLICA_LAG_MAXIMO", 10)
+
+
+def _clave_escritura(empresa_id):
+    return f"replica:escritura:{empresa_id}"
+
+
+# ===========================================
+# 🔵 Escrituras recientes y retraso de la réplica
+# ===========================================
+def marcar_escritura(empresa_id):
+    """Las lecturas de analítica de la empresa van a la primaria durante REPLICA_LAG_MAXIMO segundos."""
+    if empresa_id and replica_configurada():
+        cache.set(_clave_escritura(empresa_id), True, timeout=_lag_maximo())
+
+
+def retraso_replica():
+    """Segundos de retraso de la réplica (None si no responde). Cacheado unos segundos."""
+    retraso = cache.get("replica:retraso")
+    if retraso is not None:
+        return None if retraso < 0 else retraso
+
+    try:
+        if connections[ANALITICA].vendor == "postgresql":
+            with connections[ANALITICA].cursor() as cursor:
+                cursor.execute(SQL_RETRASO_POSTGRES)
+                retraso = float(cursor.fetchone()[0])
+        else:
+            # SQLite u otros motores (pruebas locales): sin replicación que medir
+            retraso = 0.0
+    except DatabaseError as e:
+        logger.warning("Réplica de analítica no disponible: %s", e)
+        retraso = -1.0  # se cachea como "caída"
+
+    cache.set("replica:retraso", retraso, timeout=getattr(settings, "REPLICA_LAG_CHEQUEO", 5))
+    return None if retraso < 0 else retraso
+
+
+# ===========================================
+# 🔵 Elección del alias
+# ===========================================
+def alias_analitica(empresa_id=None):
+    """"analytics" si la réplica sirve para esta empresa ahora; si no, "default"."""
+    if not replica_configurada():
+        return PRIMARIA
+    if empresa_id and cache.get(_clave_escritura(empresa_id)):
+        return PRIMARIA
+
+    retraso = retraso_replica()
+    if retraso is None or retraso > _lag_maximo():
+        return PRIMARIA
+    return ANALITICA
+
+
+def db_analitica(request):
+    return alias_analitica(obtener_tenant(request).empresa_id)
+
+
+class EscrituraRecienteMiddleware:
+    """
+    Marca a la empresa del usuario después de cada escritura exitosa, para que
+    sus próximos reportes lean de la primaria mientras la réplica se pone al día.
+    """
+
+    METODOS_LECTURA = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._es_escritura(request, response):
+            self._marcar(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._es_escritura(request, response) and replica_configurada():
+            # request.user puede ser perezoso (sesión): se resuelve fuera del loop
+            await sync_to_async(self._marcar)(request)
+        return response
+
+    def _es_escritura(self, request, response):
+        return request.method not in self.METODOS_LECTURA and response.status_code < 400
+
+    def _marcar(self, request):
+        # DRF deja en request.user el usuario autenticado por JWT
+        marcar_escritura(getattr(getattr(request, "user", None), "empresa_id", None))
@@ -0,0 +1,44 @@
+# utils/serializers.py
+# Sparse fieldsets para los listados:
+#   ?fields=id,total,fecha   -> solo esos campos
+#   ?expand=detalles         -> incluye campos pesados (Meta.expandable_fields)
+# En los listados, los campos de Meta.expandable_fields se omiten salvo que se pidan.
+from rest_framework.serializers import ListSerializer
+
+
+def _param_lista(request, nombre):
+    valor = request.query_params.get(nombre, "")
+    return {campo.strip() for campo in valor.split(",") if campo.strip()}
+
+
+def campos_expandidos(request):
+    """Campos pedidos con ?expand= (para decidir qué prefetch hacer)."""
+    if request is None:
+        return set()
+    return _param_lista(request, "expand")
+
+
+def campo_incluido(request, action, nombre):
+    """True si un campo expandible se va a serializar en esta petición."""
+    return action != "list" or nombre in campos_expandidos(request)
+
+
+def aplicar_campos_dispersos(serializer, request, action):
+    """Recorta los campos del serializer según ?fields= y ?expand=."""
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+
+    meta = getattr(serializer, "Meta", None)
+    expandibles = getattr(meta, "expandable_fields", ())
+    campos = serializer.fields
+
+    for nombre in expandibles:
+        if not campo_incluido(request, action, nombre):
+            campos.pop(nombre, None)
+
+    solo = _param_lista(request, "fields")
+    if solo:
+        for nombre in list(campos.keys()):
+            if nombre not in solo:
+                campos.pop(nombre)
+    return serializer
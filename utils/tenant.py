@@ -0,0 +1,200 @@
+# utils/tenant.py
+# Contexto del tenant de cada request: usuario, empresa, rol, privilegios y plan.
+#
+#  - Se resuelve UNA vez por request y queda en request.tenant.
+#  - Las partes que casi nunca cambian (nombre y privilegios del rol, límites
+#    del plan, plan de la empresa) se cachean por worker con TTL corto
+#    (TENANT_CACHE_TTL). Al editar Role/Permission/Plan/Empresa se limpia la
+#    entrada del worker actual; los demás la renuevan al vencer el TTL.
+#  - El usuario llega ya con role/empresa/plan por select_related desde
+#    TenantJWTAuthentication (utils/authentication.py).
+
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from cachetools import TTLCache
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+
+CAMPOS_PLAN = (
+    "nombre",
+    "max_usuarios",
+    "max_productos",
+    "max_ventas_mensuales",
+    "almacenamiento_gb",
+    "permite_reportes_ia",
+    "permite_exportar_excel",
+    "permite_notificaciones_push",
+    "prediccion_ventas",
+    "esta_activo",
+)
+
+_TTL = getattr(settings, "TENANT_CACHE_TTL", 60)
+_roles = TTLCache(maxsize=1024, ttl=_TTL)  # role_id -> (nombre, frozenset(privilegios))
+_planes = TTLCache(maxsize=256, ttl=_TTL)  # plan_id -> dict de límites
+_plan_de_empresa = TTLCache(maxsize=4096, ttl=_TTL)  # empresa_id -> plan_id
+_lock = threading.Lock()
+
+
+def _cacheado(cache, clave, cargar):
+    with _lock:
+        if clave in cache:
+            return cache[clave]
+    valor = cargar()
+    with _lock:
+        cache[clave] = valor
+    return valor
+
+
+def limpiar_cache():
+    with _lock:
+        _roles.clear()
+        _planes.clear()
+        _plan_de_empresa.clear()
+
+
+# ===========================================
+# 🔵 Partes cacheadas por worker
+# ===========================================
+def datos_rol(role_id):
+    """(nombre, {(módulo, acción), ...}) del rol."""
+    def cargar():
+        from users.models import Permission, Role
+
+        nombre = Role.objects.filter(id=role_id).values_list("name", flat=True).first()
+        privilegios = set()
+        for modulo, *flags in Permission.objects.filter(role_id=role_id).values_list(
+            "module__name", "can_view", "can_create", "can_update", "can_delete"
+        ):
+            for accion, permitido in zip(("view", "create", "update", "delete"), flags):
+                if permitido:
+                    privilegios.add((modulo, accion))
+        return nombre, frozenset(privilegios)
+
+    return _cacheado(_roles, role_id, cargar)
+
+
+def limites_plan(plan_id):
+    """dict con los límites y banderas del plan (None si no existe)."""
+    def cargar():
+        from tenants.models import Plan
+
+        return Plan.objects.filter(id=plan_id).values(*CAMPOS_PLAN).first()
+
+    return _cacheado(_planes, plan_id, cargar)
+
+
+def plan_de_empresa(empresa_id):
+    def cargar():
+        from tenants.models import Empresa
+
+        return Empresa.objects.filter(id=empresa_id).values_list("plan_id", flat=True).first()
+
+    return _cacheado(_plan_de_empresa, empresa_id, cargar)
+
+
+# ===========================================
+# 🔵 Contexto del request
+# ===========================================
+class TenantContext:
+    """Lo que las vistas y permisos necesitan saber del usuario actual."""
+
+    def __init__(self, usuario):
+        self.usuario = usuario
+        self.autenticado = bool(usuario and usuario.is_authenticated)
+        self.empresa_id = getattr(usuario, "empresa_id", None) if self.autenticado else None
+        self.role_id = getattr(usuario, "role_id", None) if self.autenticado else None
+
+        if self.role_id:
+            self.role_nombre, self.privilegios = datos_rol(self.role_id)
+        else:
+            self.role_nombre, self.privilegios = None, frozenset()
+
+        self.plan_id = None
+        if self.empresa_id:
+            # Si la empresa ya vino por select_related no se consulta nada
+            empresa = usuario._state.fields_cache.get("empresa")
+            self.plan_id = empresa.plan_id if empresa is not None else plan_de_empresa(self.empresa_id)
+        self.plan = limites_plan(self.plan_id) if self.plan_id else None
+
+    @property
+    def empresa(self):
+        return self.usuario.empresa if self.empresa_id else None
+
+    @property
+    def es_super_admin(self):
+        return self.autenticado and (self.usuario.is_superuser or self.role_nombre == "SUPER_ADMIN")
+
+    @property
+    def es_admin(self):
+        return self.role_nombre == "ADMIN"
+
+    def puede(self, modulo, accion):
+        return (modulo, accion) in self.privilegios
+
+    def __repr__(self):
+        return f"<TenantContext usuario={getattr(self.usuario, 'pk', None)} empresa={self.empresa_id} rol={self.role_nombre}>"
+
+
+def obtener_tenant(request):
+    """
+    request.tenant si el middleware ya lo puso; si no (tests con
+    APIRequestFactory, comandos) lo resuelve y lo deja en el request.
+    """
+    base = getattr(request, "_request", request)
+    tenant = getattr(base, "tenant", None)
+    if tenant is None or getattr(tenant, "usuario", None) is not request.user:
+        tenant = TenantContext(request.user)
+        base.tenant = tenant
+    return tenant
+
+
+class TenantMiddleware:
+    """
+    Expone request.tenant. Es perezoso: la autenticación JWT ocurre dentro de
+    la vista de DRF, así que el contexto se arma la primera vez que se usa.
+
+    Sirve en modo sync y async: bajo ASGI no obliga a Django a pasar la cadena
+    por async_to_sync (las vistas async no ocupan un hilo).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.tenant = SimpleLazyObject(lambda: TenantContext(request.user))
+        return self.get_response(request)
+
+
+# ===========================================
+# 🔵 Invalidación local
+# ===========================================
+@receiver([post_save, post_delete], sender="users.Role")
+def _invalidar_rol(sender, instance, **kwargs):
+    with _lock:
+        _roles.pop(instance.id, None)
+
+
+@receiver([post_save, post_delete], sender="users.Permission")
+def _invalidar_privilegios(sender, instance, **kwargs):
+    with _lock:
+        _roles.pop(instance.role_id, None)
+
+
+@receiver([post_save, post_delete], sender="tenants.Plan")
+def _invalidar_plan(sender, instance, **kwargs):
+    with _lock:
+        _planes.pop(instance.id, None)
+
+
+@receiver([post_save, post_delete], sender="tenants.Empresa")
+def _invalidar_empresa(sender, instance, **kwargs):
+    with _lock:
+        _plan_de_empresa.pop(instance.id, None)
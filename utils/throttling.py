@@ -0,0 +1,265 @@
+# utils/throttling.py
+# Límites para endpoints caros (LLM, PDF/Excel, entrenamiento de modelos).
+#
+#  - TokenBucketThrottle: throttle de DRF por empresa y scope. La tasa depende
+#    del plan de la empresa (THROTTLE_PLANES). Con Redis es una cubeta de
+#    tokens atómica (script Lua); con otros caches, una ventana fija con
+#    add/incr, que también es atómica.
+#  - SemaforoTenant: tope de trabajos pesados SIMULTÁNEOS por empresa, con un
+#    contador en el cache (incr/decr). El contador vence a los SEMAFORO_TTL
+#    segundos del último cupo tomado por si un worker muere sin liberarlo.
+#  - Sin cache compartido entre workers (LocMem con WEB_CONCURRENCY > 1, ver
+#    THROTTLE_CACHE_COMPARTIDO) cada worker cuenta aparte: los límites se
+#    reparten entre los workers para no multiplicarse.
+#
+# Así una empresa no puede ocupar todos los workers con reportes o IA.
+
+import asyncio
+import functools
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+from rest_framework.throttling import BaseThrottle
+
+from .tenant import obtener_tenant
+
+DURACIONES = {"s": 1, "sec": 1, "m": 60, "min": 60, "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+
+# Valores por defecto si settings no define THROTTLE_PLANES / CONCURRENCIA_PLANES
+TASAS_DEFAULT = {"llm": "10/min", "reportes": "20/min", "ml": "3/hour"}
+CONCURRENCIA_DEFAULT = {"llm": 2, "reportes": 3, "ml": 1}
+
+logger = logging.getLogger(__name__)
+_avisado = False
+
+# Cubeta de tokens atómica en Redis: recarga, descuenta y guarda en un paso.
+# Devuelve {1|0, tokens restantes}.
+LUA_CUBETA = """
+local capacidad = tonumber(ARGV[1])
+local recarga = tonumber(ARGV[2])
+local ahora = tonumber(ARGV[3])
+local datos = redis.call("HMGET", KEYS[1], "tokens", "ultimo")
+local tokens = tonumber(datos[1]) or capacidad
+local ultimo = tonumber(datos[2]) or ahora
+tokens = math.min(capacidad, tokens + math.max(0, ahora - ultimo) * recarga)
+if tokens < 1 then
+    return {0, tostring(tokens)}
+end
+redis.call("HSET", KEYS[1], "tokens", tokens - 1, "ultimo", ahora)
+redis.call("EXPIRE", KEYS[1], ARGV[4])
+return {1, tostring(tokens - 1)}
+"""
+
+
+def _parsear_tasa(tasa):
+    """ "10/min" -> (10 solicitudes, 60 segundos) """
+    num, periodo = tasa.split("/")
+    return int(num), DURACIONES[periodo.strip().lower()]
+
+
+def _nombre_plan(request):
+    tenant = obtener_tenant(request)
+    return (tenant.plan or {}).get("nombre") if tenant.autenticado else None
+
+
+def _config_plan(nombre_setting, default, request, scope):
+    """Valor del plan de la empresa para el scope, o el de "default"."""
+    por_plan = getattr(settings, nombre_setting, {})
+    plan = _nombre_plan(request)
+    for clave in (plan, "default"):
+        if clave in por_plan and scope in por_plan[clave]:
+            return por_plan[clave][scope]
+    return default.get(scope)
+
+
+def _por_worker(limite):
+    """
+    Límite que aplica cada worker. Con cache compartido es el del plan; si no,
+    se reparte entre WEB_CONCURRENCY workers (mínimo 1) y se avisa una vez.
+    """
+    global _avisado
+    if getattr(settings, "THROTTLE_CACHE_COMPARTIDO", True):
+        return limite
+    workers = max(1, getattr(settings, "WEB_CONCURRENCY", 1))
+    if workers > 1 and not _avisado:
+        _avisado = True
+        logger.warning(
+            "[THROTTLE] Cache no compartido entre %s workers: los límites se reparten por worker. "
+            "Configure REDIS_URL para límites exactos.", workers
+        )
+    return max(1, limite // workers)
+
+
+def _identidad(request):
+    """Empresa del usuario; si no tiene (anónimo, superadmin), el usuario o la IP."""
+    tenant = obtener_tenant(request)
+    if tenant.empresa_id:
+        return f"empresa:{tenant.empresa_id}"
+    if tenant.autenticado:
+        return f"usuario:{request.user.pk}"
+    return f"ip:{BaseThrottle().get_ident(request)}"
+
+
+# ===========================================
+# 🔵 Cubeta de tokens (tasa)
+# ===========================================
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Uso: throttle_classes = [TokenBucketThrottle] y throttle_scope = "llm" en la vista.
+    La cubeta tiene capacidad N y se rellena a N/periodo tokens por segundo,
+    así que admite ráfagas cortas sin pasar la tasa promedio.
+    """
+
+    scope_attr = "throttle_scope"
+    scope = None  # para vistas de función (ver tasa_por_scope)
+
+    def allow_request(self, request, view):
+        self.espera = None
+        scope = getattr(view, self.scope_attr, None) or self.scope
+        tasa = _config_plan("THROTTLE_PLANES", TASAS_DEFAULT, request, scope) if scope else None
+        if not tasa:
+            return True
+
+        capacidad, periodo = _parsear_tasa(tasa)
+        capacidad = _por_worker(capacidad)
+        identidad = f"{scope}:{_identidad(request)}"
+
+        backend = caches["default"]
+        if isinstance(backend, RedisCache):
+            admitido, self.espera = self._cubeta_redis(backend, identidad, capacidad, periodo)
+        else:
+            admitido, self.espera = self._ventana_fija(identidad, capacidad, periodo)
+        return admitido
+
+    def _cubeta_redis(self, backend, identidad, capacidad, periodo):
+        clave = backend.make_and_validate_key(f"throttle:tb:{identidad}")
+        cliente = backend._cache.get_client(clave, write=True)
+        recarga = capacidad / periodo  # tokens por segundo
+        admitido, tokens = cliente.eval(LUA_CUBETA, 1, clave, capacidad, recarga, time.time(), periodo)
+        if int(admitido):
+            return True, None
+        return False, (1 - float(tokens)) / recarga
+
+    def _ventana_fija(self, identidad, capacidad, periodo):
+        # incr es atómico: dos requests simultáneos nunca leen el mismo conteo
+        clave = f"throttle:fw:{identidad}"
+        ahora = time.time()
+        cache.add(f"{clave}:inicio", ahora, timeout=periodo)
+        cache.add(clave, 0, timeout=periodo)
+        try:
+            usados = cache.incr(clave)
+        except ValueError:
+            # La ventana venció entre add() e incr()
+            cache.add(clave, 1, timeout=periodo)
+            usados = 1
+        if usados <= capacidad:
+            return True, None
+        inicio = cache.get(f"{clave}:inicio", ahora)
+        return False, max(0.0, inicio + periodo - ahora)
+
+    def wait(self):
+        return self.espera
+
+
+def tasa_por_scope(scope):
+    """
+    Throttle con scope fijo para vistas de función:
+    @throttle_classes([tasa_por_scope("ml")])
+    """
+    return type(f"TokenBucketThrottle_{scope}", (TokenBucketThrottle,), {"scope": scope})
+
+
+# ===========================================
+# 🔵 Semáforo de concurrencia por empresa
+# ===========================================
+class SemaforoTenant:
+    """
+    with SemaforoTenant(request, "reportes"):
+        ...trabajo pesado...
+    Lanza Throttled (429) si la empresa ya tiene el máximo de trabajos en curso.
+    """
+
+    def __init__(self, request, scope):
+        self.scope = scope
+        self.limite = _config_plan("CONCURRENCIA_PLANES", CONCURRENCIA_DEFAULT, request, scope)
+        if self.limite:
+            self.limite = _por_worker(self.limite)
+        self.clave = f"throttle:sem:{scope}:{_identidad(request)}"
+        self.tomado = False
+
+    def adquirir(self):
+        if not self.limite:
+            return
+        ttl = getattr(settings, "SEMAFORO_TTL", 300)
+        cache.add(self.clave, 0, timeout=ttl)
+        try:
+            en_curso = cache.incr(self.clave)
+        except ValueError:
+            # La clave venció entre add() e incr()
+            cache.add(self.clave, 1, timeout=ttl)
+            en_curso = 1
+        # Cada cupo tomado renueva el vencimiento: con trabajos en curso el
+        # contador no puede expirar y admitir más de `limite`
+        cache.touch(self.clave, ttl)
+        if en_curso > self.limite:
+            self._decrementar()
+            raise Throttled(
+                wait=5,
+                detail=f"Ya hay {self.limite} trabajos de este tipo en curso para su empresa. Intente en unos segundos.",
+            )
+        self.tomado = True
+
+    def liberar(self):
+        if self.tomado:
+            self._decrementar()
+            self.tomado = False
+
+    def _decrementar(self):
+        try:
+            cache.decr(self.clave)
+        except ValueError:
+            pass
+
+    def __enter__(self):
+        self.adquirir()
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+
+    async def __aenter__(self):
+        await sync_to_async(self.adquirir)()
+        return self
+
+    async def __aexit__(self, *exc):
+        await sync_to_async(self.liberar)()
+
+
+def con_semaforo(scope):
+    """
+    Decorador para vistas de función (debajo de @api_view) o métodos de APIView,
+    síncronos o async (utils/async_views.py).
+    """
+    def decorador(funcion):
+        if asyncio.iscoroutinefunction(funcion):
+            @functools.wraps(funcion)
+            async def envoltura_async(*args, **kwargs):
+                request = args[0] if isinstance(args[0], Request) else args[1]
+                semaforo = await sync_to_async(SemaforoTenant)(request, scope)
+                async with semaforo:
+                    return await funcion(*args, **kwargs)
+            return envoltura_async
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            with SemaforoTenant(request, scope):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
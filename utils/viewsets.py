@@ -2,12 +2,24 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.permissions import SAFE_METHODS
 from utils.permissions import ModulePermission
 from utils.logging_utils import log_action
+from utils.pagination import KeysetPagination
+from utils.serializers import aplicar_campos_dispersos
+from utils.tenant import obtener_tenant
 
 
 class SoftDeleteViewSet(viewsets.ModelViewSet):
     permission_classes = [ModulePermission]
+    pagination_class = KeysetPagination
+
+    def get_serializer(self, *args, **kwargs):
+        """Aplica ?fields= / ?expand= en las lecturas."""
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.request is not None and self.request.method in SAFE_METHODS:
+            aplicar_campos_dispersos(serializer, self.request, self.action)
+        return serializer
 
     def get_queryset(self):
         """
@@ -15,19 +27,19 @@ class SoftDeleteViewSet(viewsets.ModelViewSet):
         excepto para el SUPER_ADMIN (acceso global).
         """
         queryset = self.queryset
-        user = self.request.user
+        # Empresa y rol ya resueltos para este request (sin cargar user.empresa)
+        tenant = obtener_tenant(self.request)
 
         # 🔹 Si el modelo tiene campo empresa
         if hasattr(self.queryset.model, "empresa"):
-            empresa = getattr(user, "empresa", None)
 
             # 🌍 Caso 1: SUPER ADMIN o superusuario → no filtrar
-            if user.is_authenticated and (user.is_superuser or getattr(user.role, "name", "") == "SUPER_ADMIN"):
+            if tenant.es_super_admin:
                 pass  # ve todo el sistema
 
             # 🏢 Caso 2: ADMIN o usuario con empresa → solo su empresa
-            elif empresa:
-                queryset = queryset.filter(empresa=empresa)
+            elif tenant.empresa_id:
+                queryset = queryset.filter(empresa_id=tenant.empresa_id)
 
             # 🚫 Caso 3: sin empresa ni permisos → nada
             else:
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sucursales', '0003_reservastock'),
+        ('tenants', '0001_initial'),
+        ('ventas', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='venta',
+            constraint=models.UniqueConstraint(condition=models.Q(('clave_idempotencia__isnull', False)), fields=('empresa', 'clave_idempotencia'), name='venta_clave_idempotencia_uniq'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+from utils.migraciones import AddIndexConcurrentlyPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('products', '0004_indices_consultas_frecuentes'),
+        ('sucursales', '0004_indices_consultas_frecuentes'),
+        ('tenants', '0001_initial'),
+        ('ventas', '0002_venta_clave_idempotencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyPostgres(
+            model_name='detalleventa',
+            index=models.Index(fields=['empresa', 'producto'], name='detventa_emp_producto_idx'),
+        ),
+        AddIndexConcurrentlyPostgres(
+            model_name='pago',
+            index=models.Index(fields=['empresa', 'estado', 'fecha'], name='pago_emp_estado_fecha_idx'),
+        ),
+        AddIndexConcurrentlyPostgres(
+            model_name='venta',
+            index=models.Index(fields=['empresa', 'estado', 'fecha'], name='venta_emp_estado_fecha_idx'),
+        ),
+        AddIndexConcurrentlyPostgres(
+            model_name='venta',
+            index=models.Index(fields=['empresa', '-fecha'], name='venta_emp_fecha_idx'),
+        ),
+    ]
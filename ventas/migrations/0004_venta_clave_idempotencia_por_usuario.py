@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 15:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sucursales', '0004_indices_consultas_frecuentes'),
+        ('tenants', '0002_uso_empresa'),
+        ('ventas', '0003_indices_consultas_frecuentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='venta',
+            name='venta_clave_idempotencia_uniq',
+        ),
+        migrations.AddConstraint(
+            model_name='venta',
+            constraint=models.UniqueConstraint(condition=models.Q(('clave_idempotencia__isnull', False)), fields=('empresa', 'usuario', 'clave_idempotencia'), name='venta_usuario_clave_idem_uniq'),
+        ),
+    ]
@@ -34,6 +34,10 @@ class Pago(models.Model):
     class Meta: 
         db_table = 'pago'
         ordering = ['-fecha']
+        indexes = [
+            # Reporte de pagos: empresa + estado + rango de fechas
+            models.Index(fields=['empresa', 'estado', 'fecha'], name='pago_emp_estado_fecha_idx'),
+        ]
     def __str__(self):
         metodo_nombre = self.metodo.nombre if self.metodo else "Sin método"
         return f"{metodo_nombre} - {self.monto} - {self.estado}"
@@ -78,11 +82,27 @@ class Venta(models.Model):
         ('cancelado','Cancelado')
     ], default='pendiente')
     esta_activo = models.BooleanField(default=True)
+    # Clave enviada por el cliente en el checkout: un reintento del MISMO usuario
+    # devuelve la misma venta (dos clientes pueden generar la misma clave)
+    clave_idempotencia = models.CharField(max_length=64, null=True, blank=True)
 
     class Meta:
         db_table = 'venta'
         ordering = ['-fecha']
         unique_together = ('empresa', 'numero_nota')
+        indexes = [
+            # Dashboard, predicción y reportes: empresa + estado + rango de fechas
+            models.Index(fields=['empresa', 'estado', 'fecha'], name='venta_emp_estado_fecha_idx'),
+            # Listado de la empresa ordenado por fecha (ordering = -fecha)
+            models.Index(fields=['empresa', '-fecha'], name='venta_emp_fecha_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['empresa', 'usuario', 'clave_idempotencia'],
+                condition=models.Q(clave_idempotencia__isnull=False),
+                name='venta_usuario_clave_idem_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"Venta #{self.id} - {self.usuario.email} - {self.total} - {self.estado}"
@@ -107,6 +127,10 @@ class DetalleVenta(models.Model):
     class Meta:
         db_table = 'detalle_venta'
         unique_together = ('empresa', 'venta', 'producto')
+        indexes = [
+            # Ventas por producto (predicción por producto, top de productos)
+            models.Index(fields=['empresa', 'producto'], name='detventa_emp_producto_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         self.subtotal = self.cantidad * self.precio_unitario
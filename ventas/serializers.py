@@ -124,6 +124,8 @@ class VentaSerializer(serializers.ModelSerializer):
             "empresa_nombre",
             "detalles",
         ]
+        # Pesados: en los listados solo se incluyen con ?expand=detalles,pago_detalle
+        expandable_fields = ["detalles", "pago_detalle"]
 
     def validate(self, data):
         empresa = data.get("empresa")
@@ -141,5 +143,6 @@ class VentaSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
-        rep["estado"] = instance.estado.capitalize()
+        if "estado" in rep:
+            rep["estado"] = instance.estado.capitalize()
         return rep
@@ -1,3 +1,103 @@
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
 
-# Create your tests here.
+from products.models import Producto
+from sucursales.models import StockSucursal, Sucursal
+from tenants.models import Empresa
+from users.models import Role, User
+from ventas.models import DetalleVenta, Venta
+from ventas.views import VentaViewSet
+
+
+class VentaListadoTests(TestCase):
+    """Listado de ventas: paginado por cursor y con detalles solo bajo ?expand=."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Ventas", nit="VENTAS-001")
+        rol = Role.objects.create(empresa=cls.empresa, name="ADMIN")
+        cls.usuario = User.objects.create_user(
+            email="ventas@test.com", password="x", empresa=cls.empresa, role=rol
+        )
+        sucursal = Sucursal.objects.create(empresa=cls.empresa, nombre="Central")
+        producto = Producto.objects.create(empresa=cls.empresa, nombre="Tv", precio_venta=100)
+        for _ in range(5):
+            venta = Venta.objects.create(
+                empresa=cls.empresa, usuario=cls.usuario, sucursal=sucursal,
+                fecha=timezone.now(), total=100,
+            )
+            DetalleVenta.objects.create(
+                empresa=cls.empresa, venta=venta, producto=producto,
+                cantidad=1, precio_unitario=100, subtotal=100,
+            )
+
+    def _listar(self, url):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=self.usuario)
+        response = VentaViewSet.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_detalles_son_opcionales(self):
+        data = self._listar("/api/ventas/")
+        self.assertNotIn("detalles", data["results"][0])
+        self.assertNotIn("pago_detalle", data["results"][0])
+
+        data = self._listar("/api/ventas/?expand=detalles")
+        self.assertEqual(len(data["results"][0]["detalles"]), 1)
+
+    def test_fields_limita_columnas(self):
+        data = self._listar("/api/ventas/?fields=id,total")
+        self.assertEqual(set(data["results"][0]), {"id", "total"})
+
+    def test_paginacion_por_cursor(self):
+        primera = self._listar("/api/ventas/?page_size=2")
+        self.assertEqual(len(primera["results"]), 2)
+        self.assertIsNotNone(primera["next"])
+
+        vistos = [v["id"] for v in primera["results"]]
+        siguiente = primera["next"]
+        while siguiente:
+            pagina = self._listar(siguiente.replace("http://testserver", ""))
+            vistos += [v["id"] for v in pagina["results"]]
+            siguiente = pagina["next"]
+        self.assertEqual(sorted(vistos), sorted(Venta.objects.values_list("id", flat=True)))
+
+
+class RegistrarVentaTests(TestCase):
+    """registrar_venta valida ids y cantidades antes de tocar la base."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre="Empresa Registro", nit="REG-001")
+        rol = Role.objects.create(empresa=cls.empresa, name="ADMIN")
+        cls.usuario = User.objects.create_user(
+            email="registro@test.com", password="x", empresa=cls.empresa, role=rol
+        )
+        cls.sucursal = Sucursal.objects.create(empresa=cls.empresa, nombre="Central")
+        cls.producto = Producto.objects.create(empresa=cls.empresa, nombre="Tv", precio_venta=100)
+        StockSucursal.objects.create(empresa=cls.empresa, producto=cls.producto, sucursal=cls.sucursal, stock=10)
+
+    def _registrar(self, *detalles):
+        request = APIRequestFactory().post(
+            "/api/ventas/registrar/",
+            {"sucursal": self.sucursal.id, "detalles": list(detalles)},
+            format="json",
+        )
+        force_authenticate(request, user=self.usuario)
+        return VentaViewSet.as_view({"post": "registrar_venta"})(request)
+
+    def test_id_como_texto(self):
+        response = self._registrar({"producto": str(self.producto.id), "cantidad": "2"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(StockSucursal.objects.get(producto=self.producto).stock, 8)
+
+    def test_cantidades_invalidas(self):
+        for cantidad in (-1, 0, "dos", 1.5, None):
+            with self.subTest(cantidad=cantidad):
+                response = self._registrar({"producto": self.producto.id, "cantidad": cantidad})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._registrar({"producto": "x", "cantidad": 1}).status_code, 400)
+        self.assertFalse(Venta.objects.exists())
+        self.assertEqual(StockSucursal.objects.get(producto=self.producto).stock, 10)
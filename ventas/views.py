@@ -7,12 +7,21 @@ from rest_framework.response import Response
 from utils.viewsets import SoftDeleteViewSet
 from utils.permissions import ModulePermission
 from utils.logging_utils import log_action
+from utils.serializers import campo_incluido
+from utils.async_db import con_timeout
+from utils.async_views import AsyncAPIView
+from tenants.quotas import CupoPlanPermission, verificar_cupo
 from rest_framework.views import APIView
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Prefetch
 import logging
+from decimal import Decimal
 
 logger = logging.getLogger(__name__)
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+stripe.max_network_retries = settings.STRIPE_REINTENTOS
 
 from .models import Metodo_pago, Pago, Venta, DetalleVenta
 from .serializers import (
@@ -22,7 +31,17 @@ from .serializers import (
     DetalleVentaSerializer,
 )
 from products.models import Producto
-from sucursales.models import Sucursal, StockSucursal
+from sucursales.models import Sucursal
+from sucursales import stock_service
+from products.pricing import tabla_precios
+from cart.models import Cart
+
+def _entero(valor):
+    """int estricto para ids/cantidades del request: rechaza bool, decimales y texto."""
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ValueError(valor)
+    return int(valor)
+
 
 # ---------------------------------------------------------------------
 # 🔹 ViewSet: Métodos de Pago
@@ -49,6 +68,19 @@ class VentaViewSet(SoftDeleteViewSet):
     queryset = Venta.objects.all().order_by("-fecha")
     serializer_class = VentaSerializer
     module_name = "Venta"
+    permission_classes = [ModulePermission, CupoPlanPermission]
+    recurso_cupo = "ventas"
+
+    def get_queryset(self):
+        qs = super().get_queryset().select_related("usuario", "empresa")
+        # Solo se cargan las relaciones pesadas si se van a serializar
+        if campo_incluido(self.request, self.action, "pago_detalle"):
+            qs = qs.select_related("pago__metodo", "pago__empresa")
+        if campo_incluido(self.request, self.action, "detalles"):
+            qs = qs.prefetch_related(
+                Prefetch("detalles", queryset=DetalleVenta.objects.select_related("producto", "empresa"))
+            )
+        return qs
 
     @action(detail=True, methods=["get"], url_path="detalles")
     def obtener_detalles(self, request, pk=None):
@@ -73,6 +105,25 @@ class VentaViewSet(SoftDeleteViewSet):
         detalles = data.get("detalles", [])
         if not detalles:
             return Response({"detail": "Debe incluir al menos un producto."}, status=400)
+
+        # Producto y cantidad enteros (in_bulk usa pk int) y cantidad >= 1
+        items = []
+        for det in detalles:
+            try:
+                producto_id = _entero(det.get("producto"))
+                cantidad = _entero(det.get("cantidad"))
+            except (AttributeError, TypeError, ValueError):
+                return Response(
+                    {"detail": "Cada detalle debe tener 'producto' y 'cantidad' enteros."}, status=400
+                )
+            if cantidad < 1:
+                return Response(
+                    {"detail": f"La cantidad del producto ID {producto_id} debe ser al menos 1."}, status=400
+                )
+            items.append((producto_id, cantidad))
+
+        # Cupo mensual de ventas del plan (lectura O(1) del contador)
+        verificar_cupo(empresa.id if empresa else None, "ventas")
         
         sucursal_id = data.get("sucursal")
         try:
@@ -83,73 +134,73 @@ class VentaViewSet(SoftDeleteViewSet):
                 status=400
             )
         canal_venta = data.get("canal", "POS") # 'POS' como default si no se envía
-        # Crear el pago si viene incluido
-        pago_data = data.get("pago")
-        pago_instance = None
-        if pago_data:
-            pago_serializer = PagoSerializer(data=pago_data)
-            pago_serializer.is_valid(raise_exception=True)
-            pago_instance = pago_serializer.save(empresa=empresa)
-            
-        # Crear la venta
-        venta = Venta.objects.create(
-            empresa=empresa,
-            usuario=user,
-            sucursal=sucursal,
-            canal=canal_venta,
-            pago=pago_instance,
-            total=data.get("total", 0),
-            estado=data.get("estado", "pendiente"),
-        )
-
-        # Crear los detalles Y ACTUALIZAR STOCK
-        for det in detalles:
-            producto_id = det.get("producto")
-            cantidad = det.get("cantidad")
-            precio = det.get("precio_unitario")
 
-            try:
-                producto = Producto.objects.get(id=producto_id, empresa=empresa)
-            except Producto.DoesNotExist:
+        # Productos de la venta en una sola consulta
+        ids = [producto_id for producto_id, _ in items]
+        productos = Producto.objects.filter(empresa=empresa).in_bulk(ids)
+
+        # Carrito (opcional): sus reservas de stock se consumen con la venta
+        cart = None
+        if data.get("cart"):
+            cart = Cart.objects.filter(id=data.get("cart"), usuario=user).first()
+
+        # Precios calculados en el servidor (descuentos vigentes de la sucursal);
+        # el total y los precio_unitario que envíe el cliente se ignoran
+        precios = tabla_precios(empresa.id if empresa else None, sucursal.id, producto_ids=ids)
+        lineas = []
+        for producto_id, cantidad in items:
+            producto = productos.get(producto_id)
+            if producto is None:
                 return Response(
                     {"detail": f"Producto ID {producto_id} no encontrado o pertenece a otra empresa."},
                     status=404,
                 )
 
-            # ✅ CREAR DETALLE DE VENTA
-            DetalleVenta.objects.create(
+            fila = precios.get(producto.id)
+            precio = fila[1] if fila else producto.precio_venta
+            lineas.append(DetalleVenta(
                 empresa=empresa,
-                venta=venta,
                 producto=producto,
                 cantidad=cantidad,
                 precio_unitario=precio,
-                subtotal=cantidad * float(precio),
+                subtotal=cantidad * precio,  # bulk_create no pasa por save()
+            ))
+        total = sum((linea.subtotal for linea in lineas), Decimal("0"))
+
+        # Todo o nada: si una línea falla, no queda ni pago, ni venta, ni stock descontado
+        with transaction.atomic():
+            # Crear el pago si viene incluido
+            pago_data = data.get("pago")
+            pago_instance = None
+            if pago_data:
+                pago_serializer = PagoSerializer(data=pago_data)
+                pago_serializer.is_valid(raise_exception=True)
+                pago_instance = pago_serializer.save(empresa=empresa)
+
+            # Crear la venta
+            venta = Venta.objects.create(
+                empresa=empresa,
+                usuario=user,
+                sucursal=sucursal,
+                canal=canal_venta,
+                pago=pago_instance,
+                fecha=timezone.now(),
+                total=total,
+                estado=data.get("estado", "pendiente"),
             )
 
-            # ✅ ACTUALIZAR STOCK EN LA SUCURSAL ESPECÍFICA
-            try:
-                stock_item = StockSucursal.objects.get(
-                    empresa=empresa,
-                    producto=producto,
-                    sucursal=sucursal  # ← MISMA SUCURSAL DE LA VENTA
-                )
-                
-                # Verificar que haya suficiente stock
-                if stock_item.stock < cantidad:
-                    return Response(
-                        {"detail": f"Stock insuficiente para {producto.nombre}. Stock disponible: {stock_item.stock}, solicitado: {cantidad}"},
-                        status=400
-                    )
-                
-                # Reducir el stock
-                stock_item.stock -= cantidad
-                stock_item.save()
-                
-            except StockSucursal.DoesNotExist:
-                return Response(
-                    {"detail": f"Producto {producto.nombre} no tiene stock registrado en la sucursal {sucursal.nombre}"},
-                    status=400
-                )
+            # Crear los detalles
+            for linea in lineas:
+                linea.venta = venta
+            DetalleVenta.objects.bulk_create(lineas)
+
+            # ✅ ACTUALIZAR STOCK EN LA SUCURSAL DE LA VENTA (UPDATE ... WHERE stock >= n)
+            stock_service.descontar_stock(
+                empresa.id if empresa else None,
+                sucursal.id,
+                [(linea.producto_id, linea.cantidad) for linea in lineas],
+                cart=cart,
+            )
 
         log_action(
             user=user,
@@ -165,9 +216,10 @@ class VentaViewSet(SoftDeleteViewSet):
 # ---------------------------------------------------------------------
 # ventas/views.py
 class DetalleVentaViewSet(SoftDeleteViewSet):
-    queryset = DetalleVenta.objects.all().order_by("venta__id")
+    queryset = DetalleVenta.objects.select_related("producto", "empresa").order_by("venta__id")
     serializer_class = DetalleVentaSerializer
     module_name = "DetalleVenta"
+    cursor_ordering = ("venta_id", "id")
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -205,9 +257,13 @@ class DetalleVentaViewSet(SoftDeleteViewSet):
 
 
 
-class CrearStripePaymentIntentView(APIView):
+class CrearStripePaymentIntentView(AsyncAPIView):
+    """
+    Crea el PaymentIntent con el cliente async de Stripe (httpx): bajo ASGI
+    la espera a Stripe no ocupa un worker.
+    """
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         # 1. Recibimos los productos del carrito (igual que en tu Node.js)
         productos = request.data.get('productos', [])
 
@@ -231,10 +287,13 @@ class CrearStripePaymentIntentView(APIView):
 
         # 3. Le pedimos a Stripe que prepare la transacción
         try:
-            payment_intent = stripe.PaymentIntent.create(
-                amount=int(total * 100), # Stripe usa centavos (ej: $10.50 son 1050)
-                currency='bob', # O 'usd', 'eur', etc.
-                automatic_payment_methods={'enabled': True},
+            payment_intent = await con_timeout(
+                stripe.PaymentIntent.create_async(
+                    amount=int(total * 100), # Stripe usa centavos (ej: $10.50 son 1050)
+                    currency='bob', # O 'usd', 'eur', etc.
+                    automatic_payment_methods={'enabled': True},
+                ),
+                settings.STRIPE_TIMEOUT,
             )
 
             # 4. Le devolvemos la "llave" a React
@@ -242,6 +301,13 @@ class CrearStripePaymentIntentView(APIView):
                 'clientSecret': payment_intent.client_secret
             }, status=status.HTTP_201_CREATED)
 
+        except TimeoutError:
+            logger.error("Stripe no respondió en %ss al crear el PaymentIntent", settings.STRIPE_TIMEOUT)
+            return Response(
+                {'error': "El proveedor de pagos no respondió a tiempo. Intente nuevamente."},
+                status=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+
         except Exception as e:
             logger.error(f"Error al crear PaymentIntent de Stripe: {e}")
             return Response(